@@ -0,0 +1,282 @@
+"""Versioned JSON API (/api/v1).
+
+Reads use column-projected rows from DataManager, never ORM objects, and
+responses are encoded with orjson when it is installed."""
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from werkzeug.exceptions import HTTPException
+
+from data_manager import SORT_OPTIONS, COLLECTION_FIELDS, MOVIE_FIELDS
+from models import db, Movie
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = 100
+
+
+# ── Helpers ────────────────────────────────────────────
+
+def _services():
+    return current_app.extensions["moviehub"]
+
+
+def _dm():
+    return _services().dm
+
+
+def json_response(data, status: int = 200) -> Response:
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=datetime.isoformat)
+    return Response(body, status=status, mimetype="application/json")
+
+
+def error(message: str, status: int) -> Response:
+    return json_response({"error": message}, status)
+
+
+def _row(row, fields) -> dict:
+    return {name: getattr(row, name) for name in fields}
+
+
+def _fields(allowed) -> list:
+    """Parse ?fields=a,b,c; all allowed fields when absent."""
+    raw = request.args.get("fields")
+    if not raw:
+        return list(allowed)
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _body() -> dict:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object.")
+    return data
+
+
+@api.errorhandler(ValueError)
+def bad_request(e):
+    return error(str(e), 400)
+
+
+@api.errorhandler(HTTPException)
+def http_error(e):
+    return error(e.description, e.code)
+
+
+@api.errorhandler(SQLAlchemyError)
+def db_error(e):
+    db.session.rollback()
+    current_app.logger.exception("API DB error path=%s", request.path)
+    return error("Database error.", 500)
+
+
+# ── Users ──────────────────────────────────────────────
+
+@api.get("/users")
+def list_users():
+    return json_response({"items": _dm().get_user_stats()})
+
+
+@api.post("/users")
+def create_user():
+    name = str(_body().get("name", "")).strip()
+    if not name:
+        return error("User name is required.", 400)
+    if _dm().user_exists(name):
+        return error(f"A profile named '{name}' already exists.", 409)
+    try:
+        user = _dm().create_user(name)
+    except IntegrityError:
+        db.session.rollback()
+        return error(f"A profile named '{name}' already exists.", 409)
+    current_app.logger.info("API user created name=%r", name)
+    return json_response({"id": user.id, "name": user.name}, 201)
+
+
+@api.get("/users/<int:user_id>")
+def get_user(user_id):
+    stats = _dm().get_user_stats(user_id)
+    if not stats:
+        return error("User not found.", 404)
+    return json_response(stats[0])
+
+
+@api.get("/users/<int:user_id>/stats")
+def get_user_collection_stats(user_id):
+    stats = _dm().get_collection_stats(user_id)
+    if stats is None:
+        return error("User not found.", 404)
+    return json_response(stats)
+
+
+@api.delete("/users/<int:user_id>")
+def delete_user(user_id):
+    if not _dm().delete_user(user_id):
+        return error("User not found.", 404)
+    current_app.logger.info("API user deleted user_id=%s", user_id)
+    return Response(status=204)
+
+
+# ── Collections ────────────────────────────────────────
+
+@api.get("/users/<int:user_id>/movies")
+def list_movies(user_id):
+    fields = _fields(COLLECTION_FIELDS)
+    sort = request.args.get("sort", "added")
+    if sort not in SORT_OPTIONS:
+        raise ValueError(f"Unknown sort option: {sort}")
+    status = request.args.get("status", "")
+    limit = min(request.args.get("limit", DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE)
+
+    rows, next_cursor = _dm().get_movies_page(
+        user_id,
+        sort=sort,
+        descending=request.args.get("order") == "desc",
+        watched=True if status == "watched" else None,
+        want_to_watch=True if status == "want" else None,
+        genre=request.args.get("genre") or None,
+        decade=request.args.get("decade", type=int),
+        after=request.args.get("after") or None,
+        limit=max(limit, 1),
+        fields=fields,
+    )
+    return json_response({"items": [_row(r, fields) for r in rows], "next_cursor": next_cursor})
+
+
+@api.post("/users/<int:user_id>/movies")
+def add_movie(user_id):
+    data = _body()
+    title = str(data.get("title", "")).strip()
+    imdb_id = str(data.get("imdb_id", "")).strip()
+    if not title and not imdb_id:
+        return error("Provide a title or an imdb_id.", 400)
+    if not _dm().get_user_stats(user_id):
+        return error("User not found.", 404)
+
+    # Not known locally: answer 202 with a pending item, enriched in the background
+    pending = _services().queue_movie(user_id, title=title or None, imdb_id=imdb_id or None)
+    if pending:
+        row = _dm().get_collection_item(user_id, pending.id)
+        return json_response(_row(row, COLLECTION_FIELDS), 202)
+
+    fetch_movie = _services().fetch_movie
+    movie = fetch_movie(imdb_id=imdb_id) if imdb_id else fetch_movie(title)
+    if movie is None:
+        return error("Movie not found or OMDb unavailable.", 404)
+    if _dm().movie_exists_for_user(user_id, movie.imdb_id):
+        return error("That movie is already in this user's list.", 409)
+
+    movie = _dm().add_movie(movie, user_id)
+    _services().queue_details(movie)
+    current_app.logger.info("API movie added user_id=%s imdb_id=%s", user_id, movie.imdb_id)
+    row = _dm().get_collection_item(user_id, movie.id)
+    return json_response(_row(row, COLLECTION_FIELDS), 201)
+
+
+@api.get("/users/<int:user_id>/movies/<int:movie_id>")
+def get_movie(user_id, movie_id):
+    fields = _fields(COLLECTION_FIELDS)
+    row = _dm().get_collection_item(user_id, movie_id, fields)
+    if row is None:
+        return error("Movie not found for this user.", 404)
+    return json_response(_row(row, fields))
+
+
+@api.patch("/users/<int:user_id>/movies/<int:movie_id>")
+def update_movie(user_id, movie_id):
+    """Update status fields (watched, want_to_watch, user_rating) and/or title."""
+    data = _body()
+    title = data.pop("title", None)
+    changes = data
+
+    if "user_rating" in changes and changes["user_rating"] is not None:
+        rating = changes["user_rating"]
+        if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 10:
+            raise ValueError("user_rating must be an integer between 1 and 10, or null.")
+    for name in ("watched", "want_to_watch"):
+        if name in changes and not isinstance(changes[name], bool):
+            raise ValueError(f"{name} must be true or false.")
+
+    if title is not None:
+        title = str(title).strip()
+        if not title:
+            raise ValueError("title must not be empty.")
+
+    # Status and title change together or not at all
+    if not _dm().update_collection_item(user_id, movie_id, changes, title):
+        return error("Movie not found for this user.", 404)
+
+    row = _dm().get_collection_item(user_id, movie_id)
+    if row is None:
+        return error("Movie not found for this user.", 404)
+    return json_response(_row(row, COLLECTION_FIELDS))
+
+
+@api.delete("/users/<int:user_id>/movies/<int:movie_id>")
+def delete_movie(user_id, movie_id):
+    if not _dm().delete_movie(user_id, movie_id):
+        return error("Movie not found for this user.", 404)
+    return Response(status=204)
+
+
+@api.get("/users/<int:user_id>/search")
+def search_movies(user_id):
+    fields = _fields(COLLECTION_FIELDS)
+    rows = _dm().search_movies(user_id, request.args.get("q", ""), fields=fields)
+    return json_response({"items": [_row(r, fields) for r in rows]})
+
+
+@api.get("/users/<int:user_id>/recommendations")
+def get_recommendations(user_id):
+    fields = _fields(MOVIE_FIELDS)
+    limit = min(request.args.get("limit", 20, type=int), MAX_PAGE_SIZE)
+    rows = _dm().get_recommendations(user_id, limit=limit, fields=fields)
+    return json_response({"items": [{**_row(r, fields), "score": r.score} for r in rows]})
+
+
+# ── Change feed ────────────────────────────────────────
+
+@api.get("/changes")
+def list_changes():
+    """Collection changes after ?since=<next_cursor of the previous call>
+    (0 or absent: from the start), optionally for one ?user_id=. Deleted
+    items come back as {"op": "delete"} tombstones without an item."""
+    since = request.args.get("since", "0")
+    if not since.isdigit():
+        return error("since must be a next_cursor returned by this endpoint.", 400)
+    fields = _fields(COLLECTION_FIELDS)
+    limit = min(request.args.get("limit", DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE)
+    changes, cursor, has_more = _dm().get_changes(
+        int(since), user_id=request.args.get("user_id", type=int), limit=max(limit, 1), fields=fields,
+    )
+    return json_response({"items": changes, "next_cursor": str(cursor), "has_more": has_more})
+
+
+# ── Shared movies ──────────────────────────────────────
+
+@api.get("/movies/<int:movie_id>")
+def get_shared_movie(movie_id):
+    fields = _fields(MOVIE_FIELDS)
+    row = (
+        db.session.query(*(MOVIE_FIELDS[f].label(f) for f in fields))
+        .filter(Movie.id == movie_id)
+        .first()
+    )
+    if row is None:
+        return error("Movie not found.", 404)
+    return json_response(_row(row, fields))
@@ -1,377 +1,101 @@
-import requests
-import os
-import logging
-
-from models import db, User, Movie
-from data_manager import DataManager
-from flask import Flask, render_template, request, redirect, url_for, flash
+"""MovieHub application factory.
+
+    START_BACKGROUND=1 flask --app app run      (finds create_app)
+    START_BACKGROUND=1 gunicorn "app:create_app()"
+    uvicorn asgi:app                            (ASGI server, see asgi.py)
+    python app.py                               (development server)
+
+Each create_app() call builds an independent app: its own config, caches,
+metrics and job queue. Job worker and orphan sweep threads only start
+when START_BACKGROUND is set, so CLI commands and test apps run none.
+Optional heavy pieces (the OMDb HTTP client, Pillow) load on first use
+and the schema is checked on the first request rather than at startup,
+so worker processes and CLI commands boot quickly."""
+import threading
+
+from flask import Flask
 from sqlalchemy.exc import SQLAlchemyError
-from logging.handlers import RotatingFileHandler
-
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY", "dev")
-
-# Log errors and exceptions
-os.makedirs("logs", exist_ok=True)
-
-file_handler = RotatingFileHandler(
-    "logs/moviehub.log",
-    maxBytes=1_000_000,  # 1 MB
-    backupCount=3
-)
-file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(logging.Formatter(
-    "%(asctime)s %(levelname)s [%(name)s] %(message)s"
-))
-
-app.logger.setLevel(logging.INFO)
-app.logger.addHandler(file_handler)
-app.logger.info("MovieHub startup")
-
-# Configuration
-basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(basedir, 'data/movies.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize database and data manager
-db.init_app(app)
-
-OMDB_API_KEY = os.getenv("OMDB_API_KEY")
-
-dm = DataManager()
-
-
-def fetch_movie_from_omdb(title: str) -> Movie | None:
-    if not OMDB_API_KEY:
-        raise RuntimeError("OMDB_API_KEY environment variable is not set.")
-
-    # OMDB request with error handling
-    try:
-        response = requests.get(
-            "https://www.omdbapi.com/",
-            params={"t": title, "apikey": OMDB_API_KEY},
-            timeout=10,
-    )
-        response.raise_for_status()
-        data = response.json()
-    except requests.RequestException:
-        app.logger.warning("OMDb request failed title=%r", title, exc_info=True)
-        return None
-
-    if data.get("Response") == "False":
-        app.logger.info("OMDb not found title=%r error=%r", title, data.get("Error"))
-        return None
-
-    year_str = (data.get("Year") or "").strip()
-
-    year = 0
-    if len(year_str) >= 4 and year_str[:4].isdigit():
-        year = int(year_str[:4])
-
-    runtime = 0
-    if data.get("Runtime") and data["Runtime"] != "N/A":
-        runtime = int(data["Runtime"].split()[0])
-
-    rating = 0.0
-    if data.get("imdbRating") and data["imdbRating"] != "N/A":
-        rating = float(data["imdbRating"])
-
-    imdb_id = data.get("imdbID") or ""
-    imdb_url = f"https://www.imdb.com/title/{imdb_id}/" if imdb_id else ""
 
-    movie = Movie(
-        title=data.get("Title", ""),
-        genre=data.get("Genre", ""),
-        year=year,
-        director = data.get("Director", ""),
-        actors = data.get("Actors", ""),
-        country = data.get("Country", ""),
-        plot = data.get("Plot", ""),
-        runtime=runtime,
-        imdb_rating=rating,
-        poster_url=data.get("Poster", ""),
-        imdb_url=imdb_url,
-        imdb_id=imdb_id,
+import cli
+import migrations
+from api import api
+from config import load_config
+from database import install_sqlite_pragmas
+from logging_setup import configure_logging, parse_sample_rates
+from metrics import RequestMetrics
+from models import db
+from services import MovieHub
+from views import main
+
+
+def create_app(config: dict | None = None) -> Flask:
+    """Build an app. `config` overrides the settings read from the
+    environment (see config.load_config)."""
+    app = Flask(__name__)
+    app.config.update(load_config(config))
+
+    # Logging: JSON lines through a background queue listener
+    configure_logging(
+        app,
+        app.config["LOG_FILE"],
+        fmt=app.config["LOG_FORMAT"],
+        rotation=app.config["LOG_ROTATION"],
+        max_bytes=app.config["LOG_MAX_BYTES"],
+        backup_count=app.config["LOG_BACKUP_COUNT"],
+        sample_rates=parse_sample_rates(app.config["LOG_SAMPLE"], app.config["LOG_SAMPLE_RATE"]),
+        log_requests=app.config["LOG_REQUESTS"],
+        console=app.config["LOG_CONSOLE"],
     )
 
-    app.logger.info("OMDb fetched title=%r imdb_id=%s", data.get("Title"), imdb_id)
-    return movie
-
-
-""" APP ROUTES """
-
-@app.route("/")
-def home():
-    users = dm.get_users()
-
-    cards = []
-    for u in users:
-        movies = dm.get_movies(u.id)
-        count_total = len(movies)
-        count_watched = 0
-        count_want = 0
-        avg_rating = None
-
-        cards.append({
-            "id": u.id,
-            "name": u.name,
-            "total": count_total,
-            "watched": count_watched,
-            "want": count_want,
-            "avg": avg_rating,
-        })
-
-    return render_template("home.html", user_cards=cards)
-
-@app.route('/users', methods=["GET"])
-def list_users():
-    users = dm.get_users()
-    profiles = []
-    for u in users:
-        movies = dm.get_movies(u.id)
-        profiles.append({
-            "id": u.id,
-            "name": u.name,
-            "total": len(movies),
-        })
-    app.logger.info("Profiles page loaded count=%s", len(users))
-    return render_template("users.html", users=profiles)
-
-# Create a user
-@app.route("/users", methods=["POST"])
-def create_user():
-    name = request.form.get("name", "").strip()
-
-    if not name:
-        app.logger.info("Create user failed: empty name")
-        flash("User name is required.", "error")
-        return redirect(url_for("list_users"))
-
-    if dm.user_exists(name):
-        app.logger.info("Create user failed: duplicate name=%r", name)
-        flash(f"A profile named '{name}' already exists.", "error")
-        return redirect(url_for("list_users"))
-
-    dm.create_user(name)
-    app.logger.info("User created name=%r", name)
-    flash(f"User '{name}' created.", "success")
-    return redirect(url_for("list_users"))
-
-
-# Delete user (and their movies - cascade)
-@app.route("/users/<int:user_id>/delete", methods=["POST"])
-def delete_user(user_id):
-    user = User.query.get(user_id)
-
-    if not user:
-        app.logger.info("Delete profile failed: not found user_id=%s", user_id)
-        flash("DELETE:Profile not found.", "error")
-        return redirect(url_for("list_users"))
-
-    name = user.name
-
-    try:
-        dm.delete_user(user_id)
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.logger.exception("DB error deleting profile user_id=%s", user_id)
-        flash("DELETE:Database error while deleting profile.", "error")
-        return redirect(url_for("list_users"))
-
-    app.logger.info("Profile deleted user_id=%s name=%r", user_id, name)
-    flash(f"DELETE:Profile '{name}' deleted.", "success")
-    return redirect(url_for("list_users"))
-
+    db.init_app(app)
+    services = MovieHub(app)
+    app.extensions["moviehub"] = services
 
-# List movies for a user
-@app.route("/users/<int:user_id>/movies", methods=["GET"])
-def list_movies(user_id):
-    user = User.query.get(user_id)
-    if not user:
-        app.logger.info("List movies: user not found user_id=%s", user_id)
-        flash("User not found.", "error")
-        return redirect(url_for("home"))
-
-    movies = dm.get_movies(user_id)
-    return render_template("movies.html", user=user, movies=movies)
-
-
-# Add movie for a user via OMDb
-@app.route("/users/<int:user_id>/movies", methods=["POST"])
-def create_movie(user_id):
-    user = User.query.get(user_id)
-    if not user:
-        app.logger.info("Add movie failed: user not found user_id=%s", user_id)
-        flash("User not found.", "error")
-        return redirect(url_for("home"))
-
-    title = request.form.get("title", "").strip()
-    if not title:
-        app.logger.info("Add movie failed: empty title user_id=%s", user_id)
-        flash("Movie title is required. Enter a movie title.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    movie = fetch_movie_from_omdb(title)
-    if movie is None:
-        app.logger.warning("Add movie failed: OMDb fetch failed user_id=%s title=%r", user_id, title)
-        flash("Movie title not found or OMDB unavailable. Enter another title.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    if dm.movie_exists_for_user(user_id, movie.imdb_id):
-        app.logger.info("Add movie skipped: duplicate user_id=%s imdb_id=%s title=%r", user_id, movie.imdb_id,
-                        movie.title)
-        flash("That movie is already in this user’s list.", "warning")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    try:
-        dm.add_movie(movie, user_id)
-
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.logger.exception("DB error adding movie user_id=%s title=%r imdb_id=%s", user_id, title, movie.imdb_id)
-        flash("Database error occurred while adding the movie.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    app.logger.info("Movie added user_id=%s movie_id=%s imdb_id=%s title=%r", user_id, movie.id, movie.imdb_id,
-                    movie.title)
-    flash(f"Added '{movie.title}'.", "success")
-    return redirect(url_for("list_movies", user_id=user_id))
-
-
-# Update movie title
-@app.route("/users/<int:user_id>/movies/<int:movie_id>/update", methods=["POST"])
-def update_movie(user_id, movie_id):
-    user = User.query.get(user_id)
-    if not user:
-        app.logger.info("Update movie failed: user not found user_id=%s movie_id=%s", user_id, movie_id)
-        flash("User not found.", "error")
-        return redirect(url_for("home"))
-
-    new_title = request.form.get("new_title", "").strip()
-    if not new_title:
-        app.logger.info("Update movie failed: empty new_title user_id=%s movie_id=%s", user_id, movie_id)
-        flash("New title is required. Enter new movie title.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    movie = dm.get_movie_for_user(user_id, movie_id)
-    if not movie:
-        app.logger.info("Update movie failed: movie not found for user user_id=%s movie_id=%s", user_id, movie_id)
-        flash("Movie not found for this user.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    try:
-        dm.update_movie(movie_id, new_title)
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.logger.exception("DB error updating movie user_id=%s movie_id=%s new_title=%r", user_id, movie_id,
-                             new_title)
-        flash("Database error occurred while updating the movie.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    app.logger.info("Movie updated user_id=%s movie_id=%s new_title=%r", user_id, movie_id, new_title)
-    flash("Movie title updated.", "success")
-    return redirect(url_for("list_movies", user_id=user_id))
-
-
-# Delete movies for a user
-@app.route("/users/<int:user_id>/movies/<int:movie_id>/delete", methods=["POST"])
-def delete_movie(user_id, movie_id):
-    user = User.query.get(user_id)
-    if not user:
-        app.logger.info("Delete movie failed: user not found user_id=%s movie_id=%s", user_id, movie_id)
-        flash("User not found.", "error")
-        return redirect(url_for("home"))
-
-    movie = dm.get_movie_for_user(user_id, movie_id)
-    if not movie:
-        app.logger.info("Delete movie failed: movie not found for user user_id=%s movie_id=%s", user_id, movie_id)
-        flash("Movie not found for this user.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    try:
-        ok = dm.delete_movie(user_id, movie_id)
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.logger.exception("DB error deleting movie user_id=%s movie_id=%s", user_id, movie_id)
-        flash("Database error occurred while deleting movie.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    app.logger.info("Movie deleted user_id=%s movie_id=%s ok=%s", user_id, movie_id, ok)
-    flash("Movie deleted." if ok else "Movie not found.", "success" if ok else "error")
-    return redirect(url_for("list_movies", user_id=user_id))
-
-# Mark as Want to Watch
-@app.route("/users/<int:user_id>/movies/<int:movie_id>/want", methods=["POST"])
-def toggle_want_to_watch(user_id, movie_id):
-    user = User.query.get(user_id)
-    if not user:
-        flash("User not found.", "error")
-        return redirect(url_for("home"))
-
-    try:
-        dm.toggle_want_to_watch(user_id, movie_id)
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.logger.exception("DB error toggling want_to_watch user_id=%s movie_id=%s", user_id, movie_id)
-        flash("Database error.", "error")
-
-    return redirect(url_for("list_movies", user_id=user_id))
-
-
-# Mark as Watched
-@app.route("/users/<int:user_id>/movies/<int:movie_id>/watched", methods=["POST"])
-def toggle_watched(user_id, movie_id):
-    user = User.query.get(user_id)
-    if not user:
-        flash("User not found.", "error")
-        return redirect(url_for("home"))
-
-    try:
-        dm.toggle_watched(user_id, movie_id)
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.logger.exception("DB error toggling watched user_id=%s movie_id=%s", user_id, movie_id)
-        flash("Database error.", "error")
-
-    return redirect(url_for("list_movies", user_id=user_id))
-
-
-# Rate Movie
-@app.route("/users/<int:user_id>/movies/<int:movie_id>/rate", methods=["POST"])
-def rate_movie(user_id, movie_id):
-    user = User.query.get(user_id)
-    if not user:
-        flash("User not found.", "error")
-        return redirect(url_for("home"))
-
-    rating_str = request.form.get("rating", "").strip()
-    if not rating_str or not rating_str.isdigit():
-        flash("Invalid rating.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    rating = int(rating_str)
-    if not 1 <= rating <= 10:
-        flash("Rating must be between 1 and 10.", "error")
-        return redirect(url_for("list_movies", user_id=user_id))
-
-    try:
-        dm.rate_movie(user_id, movie_id, rating)
-    except SQLAlchemyError:
-        db.session.rollback()
-        app.logger.exception("DB error rating movie user_id=%s movie_id=%s", user_id, movie_id)
-        flash("Database error.", "error")
-
-    return redirect(url_for("list_movies", user_id=user_id))
-
-
-# 404 handling
-@app.errorhandler(404)
-def page_not_found(e):
-    app.logger.info("404 Not Found path=%s", request.path)
-    return render_template("404.html"), 404
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+        RequestMetrics(services.metrics, app.logger, slow_ms=app.config["SLOW_REQUEST_MS"]).init_app(app, db.engine)
+    _check_schema_on_first_request(app)
+
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+    cli.init_app(app)
+
+    if app.config["START_BACKGROUND"]:
+        services.start_background()
+    app.logger.info("MovieHub startup")
+    return app
+
+
+def _check_schema_on_first_request(app: Flask) -> None:
+    """Look for pending migrations once, on the first request: warn, or
+    apply them when AUTO_MIGRATE is set."""
+    lock = threading.Lock()
+    done = False
+
+    @app.before_request
+    def check_schema():
+        nonlocal done
+        if done:
+            return
+        with lock:
+            if done:
+                return
+            done = True
+            try:
+                pending = [version for version, _, _ in migrations.pending_migrations(db.engine)]
+                if pending and app.config["AUTO_MIGRATE"]:
+                    db.create_all()
+                    app.logger.info("Migrations applied versions=%s", migrations.upgrade(db.engine))
+                elif pending:
+                    app.logger.warning("Schema is behind: pending migrations versions=%s; run db-upgrade", pending)
+            except SQLAlchemyError:
+                db.session.rollback()
+                app.logger.exception("Schema check failed")
 
 
 if __name__ == '__main__':
+    app = create_app({"START_BACKGROUND": True})
     with app.app_context():
         db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+        migrations.upgrade(db.engine)
+    app.run(debug=True)
@@ -0,0 +1,15 @@
+"""ASGI entry point:
+
+    uvicorn asgi:app --port 5000
+
+The app itself stays WSGI: a2wsgi runs each request on a pool of
+ASGI_THREADS threads, so slow requests do not hold up the others.
+(asgiref's WsgiToAsgi would run every request on one shared thread.)
+Async views such as the import page run their own event loop inside
+the request's thread."""
+from a2wsgi import WSGIMiddleware
+
+from app import create_app
+
+flask_app = create_app({"START_BACKGROUND": True})
+app = WSGIMiddleware(flask_app, workers=flask_app.config["ASGI_THREADS"])
@@ -0,0 +1,417 @@
+"""Benchmark the hot routes against a generated database.
+
+    python bench.py                                   # small default dataset
+    python bench.py --users 2000 --movies 50000 --links 500 --requests 500
+    python bench.py --concurrency 8 --out after.json --compare before.json
+    python bench.py --concurrency 16 --omdb-latency 2000 --scenarios add_burst,mixed
+    python bench.py --concurrency 16 --omdb-latency 1000 --scenarios mixed --async-adds
+
+Requests go through the Flask test client, in-process, against a throwaway
+SQLite file in --workdir (reused on later runs with the same sizes). OMDb
+is replaced by a local stub server. With --concurrency > 1 each scenario
+runs from that many threads at once, like a server with that many
+workers. add_burst sends each new title from --concurrency threads at
+once (concurrent lookups of one title share an OMDb request); mixed puts
+one add of a new title among every five collection page loads, showing
+how slow OMDb answers hold up the cheap requests (compare --async-adds);
+import sends ten new titles per request to the async import view.
+--job-workers threads run the enrichment jobs queued by --async-adds
+while a scenario runs, and the scenario only ends once they have
+drained the queue: drain_s is the wait after the last response and
+drained_rps the throughput including it. omdb_calls counts the requests
+the stub served. The JSON report holds latency percentiles, throughput
+and SQL statements per request for every scenario; --compare prints the
+change against an earlier report."""
+import argparse
+import contextvars
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SCENARIOS = [
+    "home", "list_users", "list_movies", "list_movies_sorted", "search",
+    "toggle_watched", "toggle_want", "rate", "add_movie", "add_burst", "mixed", "import", "delete_user",
+]
+# Scenarios that change data and run without warmup requests
+NO_WARMUP = ("add_movie", "add_burst", "mixed", "import", "delete_user")
+# Jobs the bench's workers run (periodic jobs would skew the timings)
+ENRICH_JOBS = ("enrich_movie", "complete_movie")
+# Seconds to wait for the job workers to drain the queue after a scenario
+DRAIN_TIMEOUT = 300
+IMPORT_SIZE = 10
+
+
+# ── OMDb stub ──────────────────────────────────────────
+
+class OmdbStub(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with OmdbStub.lock:
+            OmdbStub.calls += 1
+        query = parse_qs(urlparse(self.path).query)
+        key = (query.get("t") or query.get("i") or [""])[0]
+        if OmdbStub.latency:
+            time.sleep(OmdbStub.latency)
+        imdb_id = key if key.startswith("tt") else f"tt{80_000_000 + zlib.crc32(key.encode()) % 10_000_000}"
+        body = json.dumps({
+            "Title": key.title(), "Year": "2001", "imdbID": imdb_id, "Genre": "Drama",
+            "Director": "Stub", "Actors": "A, B", "Country": "USA", "Plot": "Benchmark movie.",
+            "Runtime": "100 min", "imdbRating": "7.0", "Poster": "N/A", "Response": "True",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(latency_ms: float) -> str:
+    OmdbStub.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OmdbStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/"
+
+
+# ── Statistics ─────────────────────────────────────────
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: list, wall_seconds: float) -> dict:
+    latencies = sorted(ms for ms, _, _ in samples)
+    queries = [q for _, q, _ in samples]
+    errors = sum(1 for _, _, status in samples if status >= 400)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p90": round(percentile(latencies, 90), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+        "queries_per_request": {
+            "mean": round(sum(queries) / len(queries), 2) if queries else 0.0,
+            "max": max(queries, default=0),
+        },
+    }
+
+
+def compare(old: dict, new: dict) -> None:
+    print(f"\n{'scenario':<20}{'p50 ms':>18}{'p95 ms':>18}{'queries':>14}")
+    for name, result in new["scenarios"].items():
+        before = old.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ("p50", "p95"):
+            a, b = before["latency_ms"][key], result["latency_ms"][key]
+            change = f"{(b - a) / a * 100:+.0f}%" if a else "n/a"
+            cells.append(f"{a:>7.1f} → {b:<7.1f}{change:>5}")
+        qa, qb = before["queries_per_request"]["mean"], result["queries_per_request"]["mean"]
+        print(f"{name:<20}{cells[0]:>18}{cells[1]:>18}{qa:>6.1f} → {qb:<5.1f}")
+
+
+# ── Harness ────────────────────────────────────────────
+
+class Bench:
+    def __init__(self, app, args):
+        self.app = app
+        self.args = args
+        self.rng = random.Random(args.seed)
+        # Per-request query counter; a context variable, so SQL run by async
+        # views on asgiref's loop thread is counted too (job threads are not)
+        self._queries = contextvars.ContextVar("bench_queries", default=None)
+        self._lock = threading.Lock()
+        self._counter = 0
+
+        from sqlalchemy import event
+        from models import db
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, "after_cursor_execute", self._count_query)
+
+    def _count_query(self, *args):
+        counter = self._queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def _next(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def load_ids(self) -> None:
+        from models import db, User, UserMovie
+        with self.app.app_context():
+            self.user_ids = [u for (u,) in db.session.query(User.id).order_by(User.id)]
+            sample = (
+                db.session.query(UserMovie.user_id, UserMovie.movie_id)
+                .order_by(db.func.random()).limit(5000).all()
+            )
+        # Users at the end are reserved for delete_user
+        reserve = min(len(self.user_ids) // 4, self.args.requests)
+        self.deletable = self.user_ids[len(self.user_ids) - reserve:]
+        self.user_ids = self.user_ids[:len(self.user_ids) - reserve]
+        keep = set(self.user_ids)
+        self.links = [(u, m) for u, m in sample if u in keep]
+
+    def request_for(self, scenario: str) -> tuple:
+        """(method, path, form data) for one request of a scenario."""
+        rng = self.rng
+        if scenario == "home":
+            return "GET", "/", None
+        if scenario == "list_users":
+            return "GET", "/users", None
+        if scenario == "list_movies":
+            return "GET", f"/users/{rng.choice(self.user_ids)}/movies", None
+        if scenario == "list_movies_sorted":
+            return "GET", f"/users/{rng.choice(self.user_ids)}/movies?sort=imdb_rating&order=desc&status=watched", None
+        if scenario == "search":
+            return "GET", f"/users/{rng.choice(self.user_ids)}/search?q={rng.choice(['night', 'star', 'dark'])}", None
+        if scenario in ("toggle_watched", "toggle_want", "rate"):
+            user_id, movie_id = rng.choice(self.links)
+            if scenario == "rate":
+                return "POST", f"/users/{user_id}/movies/{movie_id}/rate", {"rating": str(rng.randint(1, 10))}
+            action = "watched" if scenario == "toggle_watched" else "want"
+            return "POST", f"/users/{user_id}/movies/{movie_id}/{action}", None
+        if scenario == "add_movie":
+            return "POST", f"/users/{rng.choice(self.user_ids)}/movies", {
+                "title": f"bench movie {self._next()}", "force": "1"}
+        if scenario == "add_burst":
+            burst = self._next() // max(1, self.args.concurrency)
+            return "POST", f"/users/{rng.choice(self.user_ids)}/movies", {
+                "title": f"bench burst {burst}", "force": "1"}
+        if scenario == "mixed":
+            return self.request_for("add_movie" if rng.random() < 0.2 else "list_movies")
+        if scenario == "import":
+            titles = "\n".join(f"bench import {self._next()}" for _ in range(IMPORT_SIZE))
+            return "POST", f"/users/{rng.choice(self.user_ids)}/import", {"titles": titles}
+        if scenario == "delete_user":
+            with self._lock:
+                user_id = self.deletable.pop() if self.deletable else None
+            if user_id is None:
+                return None
+            return "POST", f"/users/{user_id}/delete", None
+        raise ValueError(scenario)
+
+    def one(self, client, scenario: str):
+        spec = self.request_for(scenario)
+        if spec is None:
+            return None
+        method, path, data = spec
+        counter = [0]
+        self._queries.set(counter)
+        start = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, counter[0], response.status_code
+
+    def run(self, scenario: str) -> dict:
+        n, workers = self.args.requests, self.args.concurrency
+        client = self.app.test_client()
+        for _ in range(min(self.args.warmup, n)):
+            if scenario not in NO_WARMUP:
+                self.one(client, scenario)
+
+        def worker(count):
+            c = self.app.test_client()
+            return [s for s in (self.one(c, scenario) for _ in range(count)) if s]
+
+        calls = OmdbStub.calls
+        start = time.perf_counter()
+        if workers <= 1:
+            samples = worker(n)
+        else:
+            shares = [n // workers + (1 if i < n % workers else 0) for i in range(workers)]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                samples = [s for part in pool.map(worker, shares) for s in part]
+        wall = time.perf_counter() - start
+        drain = self.drain()
+        result = summarize(samples, wall)
+        result["drain_s"] = round(drain, 2)
+        result["drained_rps"] = round(len(samples) / (wall + drain), 1)
+        result["omdb_calls"] = OmdbStub.calls - calls
+        return result
+
+    def drain(self) -> float:
+        """Wait until the job workers have run every queued enrichment job.
+        Returns the seconds waited."""
+        from jobs import QUEUED, RUNNING
+        from models import db, Job
+        start = time.perf_counter()
+        with self.app.app_context():
+            while time.perf_counter() - start < DRAIN_TIMEOUT:
+                left = Job.query.filter(Job.kind.in_(ENRICH_JOBS), Job.status.in_((QUEUED, RUNNING))).count()
+                db.session.rollback()  # end the read so the next poll sees new commits
+                if not left:
+                    break
+                time.sleep(0.05)
+            else:
+                print(f"Job queue not drained after {DRAIN_TIMEOUT}s")
+        return time.perf_counter() - start
+
+
+def route_exists(app, scenario: str) -> bool:
+    endpoints = {"toggle_watched": "toggle_watched", "toggle_want": "toggle_want_to_watch", "rate": "rate_movie",
+                 "search": "search_movies", "delete_user": "delete_user", "add_movie": "create_movie",
+                 "add_burst": "create_movie", "mixed": "list_movies", "import": "import_user_movies"}
+    return "main." + endpoints.get(scenario, "home") in app.view_functions
+
+
+def _copy_database(source: str, target: str) -> None:
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--links", type=int, default=200, help="collection size per user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--page-cache", default="none", choices=("none", "memory", "sqlite"))
+    parser.add_argument("--omdb-latency", type=float, default=50, help="stub OMDb delay in ms")
+    parser.add_argument("--async-adds", action="store_true",
+                        help="add placeholders and fetch OMDb data in jobs instead of inline")
+    parser.add_argument("--job-workers", type=int, default=2, help="threads running enrichment jobs")
+    parser.add_argument("--workdir", default=os.path.join("data", "bench"))
+    parser.add_argument("--fresh", action="store_true", help="regenerate the database")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    db_path = os.path.abspath(os.path.join(args.workdir, f"bench-{args.users}-{args.movies}-{args.links}-{args.seed}.db"))
+    if args.fresh and os.path.exists(db_path):
+        os.remove(db_path)
+    # delete_user consumes users, so every run starts from a copy
+    run_path = db_path.replace(".db", "-run.db")
+
+    config = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{run_path}",
+        "OMDB_API_KEY": "bench",
+        "OMDB_BASE_URL": start_stub(args.omdb_latency),
+        "OMDB_CACHE_PATH": os.path.join(args.workdir, "omdb_cache.db"),
+        "PAGE_CACHE_BACKEND": args.page_cache,
+        "PAGE_CACHE_PATH": os.path.join(args.workdir, "page_cache.db"),
+        "POSTER_CACHE_DIR": os.path.join(args.workdir, "posters"),
+        # Request logging would flood the console and run inside the timed loop
+        "LOG_REQUESTS": False,
+        "LOG_CONSOLE": False,
+        "LOG_FILE": os.path.join(args.workdir, "bench.log"),
+        # The bench starts its own workers for ENRICH_JOBS only
+        "JOB_WORKERS": 0,
+        "ASYNC_ADDS": args.async_adds,
+        "OMDB_DAILY_QUOTA": 10 ** 9,
+    }
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    if os.path.exists(db_path):
+        _copy_database(db_path, run_path)
+    from app import create_app
+    from models import db
+    import migrations
+    app = create_app(config)
+    if not os.path.exists(db_path):
+        print(f"Generating {db_path}")
+        from datagen import generate
+        with app.app_context():
+            db.create_all()
+            migrations.upgrade(db.engine)
+            print(generate(args.users, args.movies, args.links, seed=args.seed, progress=print))
+            db.engine.dispose()
+        _copy_database(run_path, db_path)
+    else:
+        # A dataset generated by an older revision gets this revision's schema
+        with app.app_context():
+            db.create_all()
+            migrations.upgrade(db.engine)
+
+    app.extensions["moviehub"].omdb_cache.clear()
+    bench = Bench(app, args)
+    bench.load_ids()
+    job_queue = app.extensions["moviehub"].job_queue
+    job_queue.start(app, args.job_workers, poll_interval=0.05, kinds=ENRICH_JOBS)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "dataset": {"users": args.users, "movies": args.movies, "links": args.links, "seed": args.seed},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "page_cache": args.page_cache,
+            "omdb_latency_ms": args.omdb_latency,
+            "async_adds": args.async_adds,
+            "job_workers": args.job_workers,
+        },
+        "scenarios": {},
+    }
+    for scenario in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        if not route_exists(app, scenario):
+            print(f"{scenario:<20} skipped (route not found)")
+            continue
+        result = bench.run(scenario)
+        report["scenarios"][scenario] = result
+        lat = result["latency_ms"]
+        print(f"{scenario:<20} p50={lat['p50']:>7.2f}ms p95={lat['p95']:>7.2f}ms p99={lat['p99']:>7.2f}ms "
+              f"rps={result['throughput_rps']:>7} queries={result['queries_per_request']['mean']:>5} "
+              f"errors={result['errors']} drain_s={result['drain_s']} drained_rps={result['drained_rps']} "
+              f"omdb_calls={result['omdb_calls']}")
+    job_queue.stop()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""Offline movie catalog from the IMDb bulk datasets (datasets.imdbws.com).
+
+ingest() streams title.basics, title.ratings, title.crew, title.principals
+and name.basics (gzip or plain TSV) line by line into catalog_title /
+catalog_name. The title files are all sorted by tconst, so they are
+merge-joined as they are read and memory stays flat however large the
+dumps are. Rows are upserted in BATCH-sized transactions; each title
+carries a checksum, so a re-import of a newer dump only writes the rows
+that changed.
+
+find() and movie_values() let adds resolve titles and IMDb ids locally;
+the dumps carry no plot, poster or country, so those still come from OMDb
+(MovieHub.queue_details)."""
+import gzip
+import zlib
+from typing import Iterator
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, CatalogTitle, CatalogName
+
+# Dataset files by role, as named on datasets.imdbws.com
+FILES = {
+    "basics": "title.basics.tsv.gz",
+    "ratings": "title.ratings.tsv.gz",
+    "crew": "title.crew.tsv.gz",
+    "principals": "title.principals.tsv.gz",
+    "names": "name.basics.tsv.gz",
+}
+
+# Title types kept from title.basics (episodes alone are most of the file)
+TITLE_TYPES = ("movie", "tvMovie", "tvSeries", "tvMiniSeries", "tvSpecial", "video", "short")
+# Billed actors kept per title, like OMDb's Actors field
+MAX_ACTORS = 4
+ACTOR_CATEGORIES = ("actor", "actress", "self")
+
+# Rows per upsert transaction, and ids per IN (...) list
+BATCH = 10_000
+LOOKUP_CHUNK = 500
+
+NULL = "\\N"
+
+
+# ── Reading the dumps ──────────────────────────────────
+
+def read_tsv(path) -> Iterator[dict]:
+    """Rows of an IMDb TSV dump as dicts, read one line at a time.
+    .gz files are decompressed on the fly; \\N becomes None. The dumps do
+    not quote fields, so lines are split on tabs rather than parsed as CSV."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="\n") as f:
+        header = f.readline().rstrip("\r\n").split("\t")
+        for line in f:
+            values = line.rstrip("\r\n").split("\t")
+            yield {name: (None if value == NULL else value) for name, value in zip(header, values)}
+
+
+def _id_number(imdb_id: str) -> int:
+    """tt0000001 -> 1; the dumps sort by this number, not by the string."""
+    return int(imdb_id[2:])
+
+
+def _grouped(rows: Iterator[dict], key: str = "tconst") -> Iterator[tuple]:
+    """(id number, rows) for consecutive rows sharing `key`. Raises
+    ValueError if the file is not sorted, since the merge relies on it."""
+    current, group = None, []
+    for row in rows:
+        number = _id_number(row[key])
+        if number != current:
+            if group:
+                yield current, group
+            if current is not None and number < current:
+                raise ValueError(f"Dump is not sorted by {key} at {row[key]}")
+            current, group = number, []
+        group.append(row)
+    if group:
+        yield current, group
+
+
+class _Follower:
+    """A sorted side file (ratings, crew, principals) read in step with
+    title.basics: rows(n) skips ahead to title n and returns its rows."""
+
+    def __init__(self, path):
+        self._groups = _grouped(read_tsv(path)) if path else iter(())
+        self._head = next(self._groups, None)
+
+    def rows(self, number: int) -> list:
+        while self._head is not None and self._head[0] < number:
+            self._head = next(self._groups, None)
+        if self._head is not None and self._head[0] == number:
+            return self._head[1]
+        return []
+
+
+def _int(value) -> int | None:
+    return int(value) if value and value.isdigit() else None
+
+
+def merged_titles(paths: dict, title_types=TITLE_TYPES) -> Iterator[dict]:
+    """One record per kept title, joining all title files by tconst.
+    Directors and actors are nconst lists, named in _write_titles."""
+    ratings = _Follower(paths.get("ratings"))
+    crew = _Follower(paths.get("crew"))
+    principals = _Follower(paths.get("principals"))
+    types = set(title_types)
+
+    for number, (basics, *_) in _grouped(read_tsv(paths["basics"])):
+        if basics["titleType"] not in types:
+            continue
+        rating = (ratings.rows(number) or [{}])[0]
+        directors = (crew.rows(number) or [{}])[0].get("directors")
+        cast = sorted(
+            (r for r in principals.rows(number) if r["category"] in ACTOR_CATEGORIES),
+            key=lambda r: int(r["ordering"]),
+        )
+        yield {
+            "imdb_id": basics["tconst"],
+            "title_type": basics["titleType"],
+            "title": basics["primaryTitle"] or basics["originalTitle"] or "",
+            "year": _int(basics["startYear"]),
+            "runtime": _int(basics["runtimeMinutes"]),
+            "genre": ", ".join((basics["genres"] or "").split(",")) if basics["genres"] else "",
+            "imdb_rating": float(rating["averageRating"]) if rating.get("averageRating") else None,
+            "votes": _int(rating.get("numVotes")),
+            "director_ids": directors.split(",") if directors else [],
+            "actor_ids": list(dict.fromkeys(r["nconst"] for r in cast))[:MAX_ACTORS],
+        }
+
+
+# ── Writing the catalog ────────────────────────────────
+
+def _upsert(conn, model, rows, key: str) -> None:
+    """INSERT ... ON CONFLICT (key) DO UPDATE on SQLite / Postgres;
+    other backends delete and re-insert."""
+    module = {"sqlite": sqlite, "postgresql": postgresql}.get(conn.dialect.name)
+    if module is None:
+        column = getattr(model, key)
+        for start in range(0, len(rows), LOOKUP_CHUNK):
+            chunk = rows[start:start + LOOKUP_CHUNK]
+            conn.execute(model.__table__.delete().where(column.in_([r[key] for r in chunk])))
+        conn.execute(insert(model), rows)
+        return
+    statement = module.insert(model)
+    updates = {c.key: statement.excluded[c.key] for c in model.__table__.columns if c.key != key}
+    conn.execute(statement.on_conflict_do_update(index_elements=[key], set_=updates), rows)
+
+
+def _existing(conn, column, value_column, keys) -> dict:
+    found = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start:start + LOOKUP_CHUNK]
+        found.update(conn.execute(select(column, value_column).where(column.in_(chunk))).all())
+    return found
+
+
+def _names(conn, nconsts) -> dict:
+    return _existing(conn, CatalogName.nconst, CatalogName.name, sorted(set(nconsts)))
+
+
+def _join_names(names, limit: int) -> str:
+    """Comma-separated names, dropping trailing ones that would not fit `limit`."""
+    joined = ""
+    for name in names:
+        candidate = f"{joined}, {name}" if joined else name
+        if len(candidate) > limit:
+            break
+        joined = candidate
+    return joined
+
+
+def _checksum(row: dict) -> int:
+    fields = ("title_type", "title", "year", "runtime", "genre", "director", "actors", "imdb_rating", "votes")
+    # 31 bits so it fits a signed INTEGER column everywhere
+    return zlib.crc32("\t".join(str(row[f]) for f in fields).encode()) & 0x7FFFFFFF
+
+
+def _write_titles(conn, records: list) -> tuple[int, int]:
+    """Upsert one batch of merged records. Returns (inserted, updated)."""
+    names = _names(conn, (n for r in records for n in r["director_ids"] + r["actor_ids"]))
+    rows = []
+    for record in records:
+        row = {k: v for k, v in record.items() if k not in ("director_ids", "actor_ids")}
+        row["title"] = row["title"][:500]
+        row["director"] = _join_names((names[n] for n in record["director_ids"] if n in names), 200)
+        row["actors"] = _join_names((names[n] for n in record["actor_ids"] if n in names), 200)
+        row["checksum"] = _checksum(row)
+        rows.append(row)
+
+    known = _existing(conn, CatalogTitle.imdb_id, CatalogTitle.checksum, [r["imdb_id"] for r in rows])
+    changed = [r for r in rows if known.get(r["imdb_id"]) != r["checksum"]]
+    if changed:
+        _upsert(conn, CatalogTitle, changed, "imdb_id")
+    updated = sum(1 for r in changed if r["imdb_id"] in known)
+    return len(changed) - updated, updated
+
+
+def _ingest_names(engine, path, progress) -> int:
+    """Upsert name.basics; unchanged names are skipped. Returns names written."""
+    written = 0
+    batch = []
+
+    def flush():
+        with engine.begin() as conn:
+            known = _existing(conn, CatalogName.nconst, CatalogName.name, [r["nconst"] for r in batch])
+            changed = [r for r in batch if known.get(r["nconst"]) != r["name"]]
+            if changed:
+                _upsert(conn, CatalogName, changed, "nconst")
+        return len(changed)
+
+    for row in read_tsv(path):
+        if row["primaryName"]:
+            batch.append({"nconst": row["nconst"], "name": row["primaryName"][:200]})
+        if len(batch) >= BATCH:
+            written += flush()
+            batch = []
+            progress(f"names written: {written}")
+    if batch:
+        written += flush()
+    return written
+
+
+def ingest(engine, paths: dict, title_types=TITLE_TYPES, progress=None) -> dict:
+    """Import the dumps in `paths` (role -> file, see FILES; only "basics"
+    is required). Names go first so titles can resolve their crew.
+    Returns counts of names written and titles seen / inserted / updated."""
+    report = progress or (lambda message: None)
+    result = {"names": 0, "titles": 0, "inserted": 0, "updated": 0}
+    if paths.get("names"):
+        result["names"] = _ingest_names(engine, paths["names"], report)
+
+    batch = []
+
+    def flush():
+        with engine.begin() as conn:
+            inserted, updated = _write_titles(conn, batch)
+        result["titles"] += len(batch)
+        result["inserted"] += inserted
+        result["updated"] += updated
+        report(f"titles: {result['titles']} (inserted {result['inserted']}, updated {result['updated']})")
+
+    for record in merged_titles(paths, title_types):
+        batch.append(record)
+        if len(batch) >= BATCH:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return result
+
+
+# ── Lookups ────────────────────────────────────────────
+
+def find(title: str | None = None, imdb_id: str | None = None, year: int | None = None) -> CatalogTitle | None:
+    """Catalog entry by IMDb id, or by case-insensitive exact title (the
+    most voted one when several titles share it)."""
+    if imdb_id:
+        return db.session.get(CatalogTitle, imdb_id)
+    if not title:
+        return None
+    query = CatalogTitle.query.filter(func.lower(CatalogTitle.title) == " ".join(title.split()).lower())
+    if year:
+        query = query.filter(CatalogTitle.year == year)
+    return query.order_by(CatalogTitle.votes.desc().nulls_last()).first()
+
+
+def movie_values(entry: CatalogTitle) -> dict:
+    """Movie(**values) for a catalog entry. Plot, poster and country stay
+    empty until OMDb fills them in (DataManager.complete_movie)."""
+    return {
+        "title": entry.title[:200],
+        "genre": entry.genre,
+        "year": entry.year or 0,
+        "director": _join_names(entry.director.split(", "), 50) if entry.director else None,
+        "actors": entry.actors,
+        "country": "",
+        "plot": "",
+        "runtime": entry.runtime,
+        "imdb_rating": entry.imdb_rating,
+        "poster_url": None,
+        "imdb_url": f"https://www.imdb.com/title/{entry.imdb_id}/",
+        "imdb_id": entry.imdb_id,
+    }
@@ -0,0 +1,206 @@
+"""flask --app app <command> ... (see create_app)."""
+import os
+import time
+from collections import Counter
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import catalog
+import export
+import migrations
+import stats
+from data_manager import COLLECTION_FIELDS
+from database import optimize
+from importer import parse_import, import_movies, DEFAULT_WORKERS
+from models import db, User
+
+
+def _services():
+    return current_app.extensions["moviehub"]
+
+
+# CLI: flask --app app import-movies USER_ID FILE
+@click.command("import-movies")
+@click.argument("user_id", type=int)
+@click.argument("source", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--workers", default=DEFAULT_WORKERS, show_default=True, help="Concurrent OMDb lookups.")
+@with_appcontext
+def import_movies_command(user_id, source, workers):
+    """Import titles / IMDb ids from a CSV or text file into a user's collection."""
+    if not User.query.get(user_id):
+        raise click.ClickException(f"User {user_id} not found.")
+
+    services = _services()
+    results = import_movies(services.dm, user_id, parse_import(source.read()), services.lookup_omdb, workers=workers)
+    for r in results:
+        click.echo(f"{r['line']:>6}  {r['status']:<10} {r['input']}"
+                   + (f" -> {r['title']} ({r['imdb_id']})" if r["imdb_id"] else ""))
+
+    summary = Counter(r["status"] for r in results)
+    click.echo(", ".join(f"{status}: {count}" for status, count in sorted(summary.items())))
+
+
+# CLI: flask --app app seed-data --users 10000 --movies 50000 --links 1000
+@click.command("seed-data")
+@click.option("--users", default=100, show_default=True)
+@click.option("--movies", default=5000, show_default=True)
+@click.option("--links", "links_per_user", default=200, show_default=True, help="Collection size per user.")
+@click.option("--seed", default=42, show_default=True)
+@with_appcontext
+def seed_data_command(users, movies, links_per_user, seed):
+    """Fill the database with synthetic users, movies and collections."""
+    from datagen import generate  # only needed here
+
+    db.create_all()
+    migrations.upgrade(db.engine)
+    result = generate(users, movies, links_per_user, seed=seed, progress=click.echo)
+    _services().page_cache.invalidate()
+    click.echo(f"Generated {result['users']} users, {result['movies']} movies, "
+               f"{result['links']} links in {result['seconds']}s")
+
+
+# CLI: flask --app app gc-movies
+@click.command("gc-movies")
+@with_appcontext
+def gc_movies_command():
+    """Delete movies that are no longer in any user's collection."""
+    deleted = _services().dm.delete_orphan_movies()
+    click.echo(f"Deleted {deleted} orphaned movies.")
+
+
+# CLI: flask --app app db-upgrade
+@click.command("db-upgrade")
+@with_appcontext
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations."""
+    db.create_all()
+    applied = migrations.upgrade(db.engine)
+    click.echo(f"Applied migrations: {applied}" if applied else "Schema is up to date.")
+    click.echo(f"Schema version: {migrations.current_version(db.engine)}")
+
+
+# CLI: flask --app app db-optimize [--analyze]
+@click.command("db-optimize")
+@click.option("--analyze", is_flag=True, help="Run a full ANALYZE instead of PRAGMA optimize.")
+@with_appcontext
+def db_optimize_command(analyze):
+    """Refresh query planner statistics."""
+    optimize(db.engine, analyze=analyze)
+    click.echo("Database statistics refreshed.")
+
+
+# CLI: flask --app app run-jobs [--workers N]  (with JOB_WORKERS=0 ASYNC_ADDS=1 on web processes)
+@click.command("run-jobs")
+@click.option("--workers", default=2, show_default=True, help="Worker threads.")
+@with_appcontext
+def run_jobs_command(workers):
+    """Run background job workers in the foreground until interrupted."""
+    job_queue = _services().job_queue
+    threads = job_queue.start(current_app._get_current_object(), workers)
+    click.echo(f"Job workers running: {len(threads)}")
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_queue.stop()
+
+
+# CLI: flask --app app jobs-status
+@click.command("jobs-status")
+@with_appcontext
+def jobs_status_command():
+    """Show the number of background jobs per status."""
+    counts = _services().job_queue.counts()
+    for status in ("queued", "running", "failed"):
+        click.echo(f"{status}: {counts.get(status, 0)}")
+
+
+# CLI: flask --app app recommend [--rebuild]
+@click.command("recommend")
+@click.option("--rebuild", is_flag=True, help="Rebuild movie neighbours first.")
+@with_appcontext
+def recommend_command(rebuild):
+    """Recompute recommendations for every user whose collection changed."""
+    recommender = _services().recommender
+    if rebuild:
+        click.echo(f"Movies with neighbours: {recommender.build_similarity()}")
+    total = 0
+    while refreshed := recommender.refresh_stale(500):
+        total += refreshed
+    click.echo(f"Users refreshed: {total}")
+
+
+# CLI: flask --app app rebuild-stats
+@click.command("rebuild-stats")
+@with_appcontext
+def rebuild_stats_command():
+    """Re-split movie genres / countries and recompute every user's collection stats."""
+    movies = stats.index_movies(db.session)
+    stats.rebuild(db.session)
+    db.session.commit()
+    _services().page_cache.invalidate()
+    click.echo(f"Indexed {movies} movies; collection stats rebuilt.")
+
+
+# CLI: flask --app app import-catalog DIR [--type movie --type tvSeries ...]
+@click.command("import-catalog")
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.option("--type", "title_types", multiple=True, help="Title types to keep (default: catalog.TITLE_TYPES).")
+@with_appcontext
+def import_catalog_command(directory, title_types):
+    """Load or update the offline catalog from IMDb dataset dumps in DIRECTORY
+    (title.basics.tsv.gz required; ratings, crew, principals and name.basics
+    optional; uncompressed .tsv files work too)."""
+    paths = {}
+    for role, filename in catalog.FILES.items():
+        for candidate in (filename, filename.removesuffix(".gz")):
+            if os.path.exists(os.path.join(directory, candidate)):
+                paths[role] = os.path.join(directory, candidate)
+                break
+    if "basics" not in paths:
+        raise click.ClickException(f"{catalog.FILES['basics']} not found in {directory}.")
+
+    db.create_all()
+    result = catalog.ingest(db.engine, paths, title_types or catalog.TITLE_TYPES, progress=click.echo)
+    click.echo(f"Catalog: {result['titles']} titles ({result['inserted']} new, {result['updated']} changed), "
+               f"{result['names']} names written")
+
+
+# CLI: flask --app app export [--format jsonl] [--user ID] [--output FILE]
+@click.command("export")
+@click.option("--format", "fmt", type=click.Choice(sorted(export.FORMATS)), default="csv", show_default=True)
+@click.option("--user", "user_id", type=int, help="Only this user's collection (default: every user).")
+@click.option("--output", type=click.File("wb"), default="-", help="File to write (default: stdout).")
+@with_appcontext
+def export_command(fmt, user_id, output):
+    """Stream collections as CSV or JSON Lines, e.g. for backups."""
+    if user_id is not None and not User.query.get(user_id):
+        raise click.ClickException(f"User {user_id} not found.")
+
+    fields = list(COLLECTION_FIELDS)
+    if user_id is None:
+        fields += ["user_id", "user_name"]  # see DataManager.iter_collection
+    for chunk in export.chunks(fmt, _services().dm.iter_collection(user_id), fields):
+        output.write(chunk)
+
+
+COMMANDS = (
+    import_movies_command,
+    seed_data_command,
+    gc_movies_command,
+    db_upgrade_command,
+    db_optimize_command,
+    run_jobs_command,
+    jobs_status_command,
+    recommend_command,
+    rebuild_stats_command,
+    import_catalog_command,
+    export_command,
+)
+
+
+def init_app(app) -> None:
+    for command in COMMANDS:
+        app.cli.add_command(command)
@@ -0,0 +1,135 @@
+"""Application settings.
+
+Defaults come from environment variables; create_app(config) overrides
+any of them per app instance, so tests and benchmarks can run several
+isolated apps (own database, caches and workers) in one process."""
+import os
+
+from database import database_uri, engine_options
+
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default) == "1"
+
+
+def load_config(overrides: dict | None = None) -> dict:
+    """Settings from the environment, with `overrides` applied on top."""
+    env = os.getenv
+    config = {
+        "SECRET_KEY": env("SECRET_KEY", "dev"),
+        "SQLALCHEMY_DATABASE_URI": database_uri(os.path.join(BASEDIR, "data/movies.db")),
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        # Per-connection SQLite settings. WAL lets readers run alongside a
+        # writer, busy_timeout (ms) makes writers wait for the lock instead
+        # of failing with "database is locked"; cache_size < 0 is in KiB.
+        "SQLITE_PRAGMAS": {
+            "journal_mode": env("SQLITE_JOURNAL_MODE", "WAL"),
+            "synchronous": env("SQLITE_SYNCHRONOUS", "NORMAL"),
+            "busy_timeout": int(env("SQLITE_BUSY_TIMEOUT", 5000)),
+            "cache_size": int(env("SQLITE_CACHE_SIZE", -64000)),
+            "mmap_size": int(env("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+            "temp_store": "MEMORY",
+            "foreign_keys": "ON",
+        },
+        # Check for pending migrations on the first request instead of at
+        # startup; AUTO_MIGRATE=1 applies them there as well
+        "AUTO_MIGRATE": _flag("AUTO_MIGRATE", "0"),
+
+        # Logging (see logging_setup). An empty LOG_FILE logs to the console only.
+        # LOG_ROTATION = size | pid | external; with several worker processes
+        # use pid or external. LOG_SAMPLE_RATE keeps that share of the INFO
+        # lines on the toggle/rate endpoints; LOG_SAMPLE=endpoint=rate,...
+        # overrides per endpoint.
+        "LOG_FILE": env("LOG_FILE", "logs/moviehub.log"),
+        "LOG_FORMAT": env("LOG_FORMAT", "json"),
+        "LOG_ROTATION": env("LOG_ROTATION", "size"),
+        "LOG_MAX_BYTES": int(env("LOG_MAX_BYTES", 1_000_000)),
+        "LOG_BACKUP_COUNT": int(env("LOG_BACKUP_COUNT", 3)),
+        "LOG_SAMPLE": env("LOG_SAMPLE"),
+        "LOG_SAMPLE_RATE": float(env("LOG_SAMPLE_RATE", 1)),
+        "LOG_REQUESTS": _flag("LOG_REQUESTS", "1"),
+        "LOG_CONSOLE": _flag("LOG_CONSOLE", "1"),
+
+        # Metrics served on /metrics. SLOW_REQUEST_MS > 0 also logs slow
+        # requests with their SQL; METRICS_TOKEN, if set, is required as a
+        # bearer token.
+        "SLOW_REQUEST_MS": int(env("SLOW_REQUEST_MS", 0)),
+        "METRICS_TOKEN": env("METRICS_TOKEN"),
+
+        # OMDb client and response cache
+        "OMDB_API_KEY": env("OMDB_API_KEY"),
+        "OMDB_BASE_URL": env("OMDB_BASE_URL", "https://www.omdbapi.com/"),
+        "OMDB_CONNECT_TIMEOUT": float(env("OMDB_CONNECT_TIMEOUT", 3.05)),
+        "OMDB_READ_TIMEOUT": float(env("OMDB_READ_TIMEOUT", 5)),
+        "OMDB_MAX_RETRIES": int(env("OMDB_MAX_RETRIES", 2)),
+        "OMDB_BREAKER_THRESHOLD": int(env("OMDB_BREAKER_THRESHOLD", 5)),
+        "OMDB_BREAKER_RESET": float(env("OMDB_BREAKER_RESET", 30)),
+        "OMDB_CACHE_PATH": env("OMDB_CACHE_PATH", os.path.join(BASEDIR, "data/omdb_cache.db")),
+        "OMDB_CACHE_TTL": int(env("OMDB_CACHE_TTL", 7 * 24 * 3600)),
+        "OMDB_NEGATIVE_CACHE_TTL": int(env("OMDB_NEGATIVE_CACHE_TTL", 24 * 3600)),
+        "OMDB_CACHE_SIZE": int(env("OMDB_CACHE_SIZE", 1024)),
+        # OMDb calls made by background jobs stay under this daily quota
+        "OMDB_DAILY_QUOTA": int(env("OMDB_DAILY_QUOTA", 1000)),
+
+        # Rendered page cache: PAGE_CACHE_BACKEND = memory | sqlite | none
+        "PAGE_CACHE_BACKEND": env("PAGE_CACHE_BACKEND", "memory"),
+        "PAGE_CACHE_PATH": env("PAGE_CACHE_PATH", os.path.join(BASEDIR, "data/page_cache.db")),
+        "PAGE_CACHE_SIZE": int(env("PAGE_CACHE_SIZE", 512)),
+        "PAGE_CACHE_TTL": int(env("PAGE_CACHE_TTL", 3600)),
+
+        # Local poster cache; served through /posters/<imdb_id>
+        "POSTER_CACHE_DIR": env("POSTER_CACHE_DIR", os.path.join(BASEDIR, "data/posters")),
+        "POSTER_MAX_AGE": int(env("POSTER_MAX_AGE", 30 * 24 * 3600)),
+
+        # Collection page sizes
+        "PAGE_SIZE": 40,
+        "SECTION_LIMIT": 20,
+
+        # OMDb lookups in flight per import (threads for the import command)
+        "IMPORT_WORKERS": int(env("IMPORT_WORKERS", 8)),
+        # Threads running requests under `uvicorn asgi:app`
+        "ASGI_THREADS": int(env("ASGI_THREADS", 16)),
+        # Seconds between orphaned-movie sweeps; 0 cleans up inline on every delete
+        "ORPHAN_GC_INTERVAL": int(env("ORPHAN_GC_INTERVAL", 0)),
+
+        # Background threads (job workers, orphan sweep) only start with
+        # START_BACKGROUND=1, so CLI commands and throwaway apps stay
+        # single-threaded; the serving entry points set it.
+        "START_BACKGROUND": _flag("START_BACKGROUND", "0"),
+        # Background jobs. JOB_WORKERS=0 runs no workers in the web process
+        # (use the run-jobs command instead). ASYNC_ADDS=1 adds placeholders
+        # and fetches OMDb data in a job, 0 keeps lookups inline; unset, it
+        # is on only when this app starts job workers, so adds never wait
+        # for workers that do not exist (set it with a run-jobs process).
+        "JOB_WORKERS": int(env("JOB_WORKERS", 2)),
+        "ASYNC_ADDS": env("ASYNC_ADDS") == "1" if env("ASYNC_ADDS") is not None else None,
+        "JOB_MAX_ATTEMPTS": int(env("JOB_MAX_ATTEMPTS", 5)),
+        "JOB_BACKOFF": float(env("JOB_BACKOFF", 30)),
+
+        # Periodic metadata refresh: every MOVIE_REFRESH_INTERVAL seconds,
+        # re-fetch up to MOVIE_REFRESH_BATCH movies not refreshed for
+        # MOVIE_REFRESH_MAX_AGE seconds
+        "MOVIE_REFRESH_INTERVAL": int(env("MOVIE_REFRESH_INTERVAL", 3600)),
+        "MOVIE_REFRESH_BATCH": int(env("MOVIE_REFRESH_BATCH", 20)),
+        "MOVIE_REFRESH_MAX_AGE": int(env("MOVIE_REFRESH_MAX_AGE", 30 * 24 * 3600)),
+
+        # Recommendations (recommender.py): movie neighbours are rebuilt every
+        # SIMILARITY_INTERVAL seconds; every RECOMMEND_INTERVAL seconds up to
+        # RECOMMEND_BATCH users whose collections changed get new suggestions
+        "SIMILARITY_INTERVAL": int(env("SIMILARITY_INTERVAL", 6 * 3600)),
+        "SIMILAR_MOVIES": int(env("SIMILAR_MOVIES", 30)),
+        "RECOMMEND_INTERVAL": int(env("RECOMMEND_INTERVAL", 60)),
+        "RECOMMEND_BATCH": int(env("RECOMMEND_BATCH", 500)),
+        "RECOMMEND_COUNT": int(env("RECOMMEND_COUNT", 20)),
+
+        # Seconds between change feed compactions (superseded rows removed)
+        "CHANGE_COMPACT_INTERVAL": int(env("CHANGE_COMPACT_INTERVAL", 24 * 3600)),
+    }
+    config.update(overrides or {})
+    if config["ASYNC_ADDS"] is None:
+        config["ASYNC_ADDS"] = bool(config["START_BACKGROUND"] and config["JOB_WORKERS"])
+    config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(
+        config["SQLALCHEMY_DATABASE_URI"], config["SQLITE_PRAGMAS"].get("busy_timeout", 5000)))
+    return config
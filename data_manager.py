@@ -1,13 +1,170 @@
-from models import db, User, Movie, UserMovie
+import base64
+import functools
+import json
+import re
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func, case, tuple_, or_, and_, text, select, bindparam, insert, literal
+from sqlalchemy.orm import aliased
+
+import stats
+from models import (
+    db, User, Movie, UserMovie, Change, Recommendation, Genre, Country,
+    UserStats, UserGenreStats, UserCountryStats, UserDecadeStats, utcnow,
+)
+
+# Rows per IN (...) list / per transaction for bulk operations
+BATCH_SIZE = 500
+
+# Movie.status of placeholders added before their OMDb lookup finished
+PENDING = "pending"
+NOT_FOUND = "not_found"
+# Real movies; local lookups must not match placeholders
+RESOLVED = Movie.status.is_(None)
+
+# Columns the periodic metadata refresh may change
+REFRESH_FIELDS = ("imdb_rating", "poster_url", "plot")
+
+# Columns the IMDb catalog lacks; filled from OMDb after a catalog add
+DETAIL_FIELDS = ("plot", "poster_url", "country")
+
+# Rows fetched per round trip when streaming an export
+EXPORT_BATCH = 1000
+
+# Change feed operations (models.Change.op)
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Second alias of the junction table for "owned by someone else" checks
+owned = aliased(UserMovie)
+
+# Columns a collection row can carry, by public field name. Collection
+# reads select these as plain rows instead of hydrating ORM objects.
+MOVIE_FIELDS = {
+    "id": Movie.id,
+    "imdb_id": Movie.imdb_id,
+    "title": Movie.title,
+    "year": Movie.year,
+    "genre": Movie.genre,
+    "director": Movie.director,
+    "actors": Movie.actors,
+    "country": Movie.country,
+    "plot": Movie.plot,
+    "runtime": Movie.runtime,
+    "imdb_rating": Movie.imdb_rating,
+    "poster_url": Movie.poster_url,
+    "imdb_url": Movie.imdb_url,
+    "status": Movie.status,
+}
+LINK_FIELDS = {
+    "watched": UserMovie.watched,
+    "want_to_watch": UserMovie.want_to_watch,
+    "user_rating": UserMovie.user_rating,
+}
+TIMESTAMP_FIELDS = {
+    "created_at": UserMovie.created_at,
+    "updated_at": UserMovie.updated_at,
+}
+COLLECTION_FIELDS = {**MOVIE_FIELDS, **LINK_FIELDS, **TIMESTAMP_FIELDS}
+
+# Sort keys for a user's collection. Nullable columns are coalesced so the
+# keyset cursor always compares against a concrete value.
+SORT_OPTIONS = {
+    "added": UserMovie.id,
+    "title": Movie.title,
+    "year": Movie.year,
+    "imdb_rating": func.coalesce(Movie.imdb_rating, 0.0),
+    "user_rating": func.coalesce(UserMovie.user_rating, 0.0),
+}
+
+
+# Column weights for bm25(): title, plot, actors, director, genre
+SEARCH_WEIGHTS = "10.0, 1.0, 2.0, 3.0, 1.0"
+
+
+def fts_query(terms: str, column: str | None = None) -> str | None:
+    """Turn free text into a safe FTS5 query: every word becomes a quoted
+    prefix term, all terms required. None if there is nothing to search."""
+    words = re.findall(r"\w+", terms)
+    if not words:
+        return None
+    expr = " ".join(f'"{w}"*' for w in words)
+    return f"{{{column}}} : ({expr})" if column else expr
+
+
+def encode_cursor(sort_value, link_id: int) -> str:
+    """Pack the last row's (sort value, user_movie.id) into an opaque token."""
+    raw = json.dumps([sort_value, link_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        sort_value, link_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return sort_value, int(link_id)
+
+
+def _average(total: float, count: int) -> float | None:
+    return round(total / count, 1) if count else None
+
+
+@functools.lru_cache(maxsize=32)
+def _recommendations_statement(names: tuple):
+    """Prebuilt SELECT for DataManager.get_recommendations. Building an ORM
+    query per call costs more than the indexed lookup itself."""
+    in_collection = (
+        select(UserMovie.id)
+        .where(UserMovie.user_id == bindparam("user_id"), UserMovie.movie_id == Recommendation.movie_id)
+        .exists()
+    )
+    return (
+        select(*(MOVIE_FIELDS[name].label(name) for name in names), Recommendation.score)
+        .select_from(Recommendation)
+        .join(Movie, Movie.id == Recommendation.movie_id)
+        .where(Recommendation.user_id == bindparam("user_id"), ~in_collection)
+        .order_by(Recommendation.rank)
+        .limit(bindparam("limit"))
+    )
+
 
 class DataManager:
 
+    def __init__(self, on_change=None):
+        # on_change(user_ids) runs after every committed write; the page
+        # cache uses it to invalidate the affected users' pages.
+        self.on_change = on_change
+        self._fts_ready = False
+
+    def _changed(self, *user_ids) -> None:
+        if self.on_change:
+            self.on_change(user_ids)
+
+    def _log_changes(self, op: str, items) -> None:
+        """Append (user_id, movie_id) items to the change feed. Runs inside
+        the caller's transaction, so the feed commits with the data."""
+        rows = [{"user_id": user_id, "movie_id": movie_id, "op": op} for user_id, movie_id in items]
+        if rows:
+            db.session.execute(insert(Change), rows)
+
+    def _log_links(self, op: str, *criteria) -> None:
+        """Like _log_changes for every user_movie row matching `criteria`,
+        in one INSERT ... SELECT."""
+        links = select(UserMovie.user_id, UserMovie.movie_id, literal(op), literal(utcnow())).where(*criteria)
+        db.session.execute(
+            insert(Change).from_select(["user_id", "movie_id", "op", "created_at"], links)
+        )
+
     # ── Users ──────────────────────────────────────────────
 
     def create_user(self, name: str) -> User:
         user = User(name=name)
         db.session.add(user)
         db.session.commit()
+        self._changed(user.id)
         return user
 
     def user_exists(self, name: str) -> bool:
@@ -17,48 +174,267 @@ class DataManager:
     def get_users(self):
         return User.query.all()
 
-    def delete_user(self, user_id: int) -> bool:
-        user = User.query.get(user_id)
-        if not user:
+    def get_user_stats(self, user_id: int | None = None) -> list[dict]:
+        """Return per-user collection stats from the user_stats summary
+        (see stats.py). Users without movies are included with zero counts."""
+        query = (
+            db.session.query(
+                User.id,
+                User.name,
+                func.coalesce(UserStats.total, 0),
+                func.coalesce(UserStats.watched, 0),
+                func.coalesce(UserStats.want, 0),
+                UserStats.rating_sum,
+                UserStats.rated,
+            )
+            .outerjoin(UserStats, UserStats.user_id == User.id)
+            .order_by(User.id)
+        )
+        if user_id is not None:
+            query = query.filter(User.id == user_id)
+
+        return [
+            {
+                "id": user_id,
+                "name": name,
+                "total": total,
+                "watched": watched,
+                "want": want,
+                "avg": _average(rating_sum, rated),
+            }
+            for user_id, name, total, watched, want, rating_sum, rated in query
+        ]
+
+    def delete_user(self, user_id: int, cleanup_orphans: bool = True) -> bool:
+        """Delete a user and their collection links with set-based statements.
+        Movies no other user owns are removed too, unless cleanup_orphans is
+        False (then delete_orphan_movies picks them up later)."""
+        self._log_links(DELETE, UserMovie.user_id == user_id)
+        if cleanup_orphans:
+            # One statement while the user's links still say which movies
+            # are theirs; a movie someone else has linked by now is kept.
+            # Its links go right after, so the foreign key check waits for
+            # the commit.
+            if db.engine.dialect.name == "sqlite":
+                db.session.execute(text("PRAGMA defer_foreign_keys = ON"))
+            other_owner = (
+                db.session.query(owned.id)
+                .filter(owned.movie_id == Movie.id, owned.user_id != user_id)
+                .exists()
+            )
+            mine = db.session.query(UserMovie.movie_id).filter(UserMovie.user_id == user_id)
+            Movie.query.filter(Movie.id.in_(mine), ~other_owner).delete(synchronize_session=False)
+
+        UserMovie.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        deleted = User.query.filter_by(id=user_id).delete(synchronize_session=False)
+        if not deleted:
+            db.session.rollback()
             return False
 
-        um_rows = UserMovie.query.filter_by(user_id=user_id).all()
-        movie_ids = [um.movie_id for um in um_rows]
-
-        db.session.delete(user)
-        db.session.flush()
-
-        # Delete related movies
-        for movie_id in movie_ids:
-            still_used = UserMovie.query.filter_by(movie_id=movie_id).first()
-            if not still_used:
-                movie = Movie.query.get(movie_id)
-                if movie:
-                    db.session.delete(movie)
-
         db.session.commit()
+        self._changed(user_id)
         return True
 
+    def delete_orphan_movies(self) -> int:
+        """Remove movies no user owns, in short batches so the write lock
+        is released between them. Returns the number of deleted movies."""
+        unowned = ~db.session.query(UserMovie.id).filter(UserMovie.movie_id == Movie.id).exists()
+        total = 0
+        while True:
+            batch = db.session.query(Movie.id).filter(unowned).limit(BATCH_SIZE).subquery()
+            deleted = (
+                Movie.query
+                .filter(Movie.id.in_(db.session.query(batch.c.id)))
+                .delete(synchronize_session=False)
+            )
+            db.session.commit()
+            total += deleted
+            if deleted < BATCH_SIZE:
+                return total
+
 
     # ── Movies ─────────────────────────────────────────────
 
-    def get_movies(self, user_id: int) -> list:
-        rows = (
-            db.session.query(Movie, UserMovie)
-            .join(UserMovie, Movie.id == UserMovie.movie_id)
+    def get_movies(self, user_id: int, **options) -> list:
+        """Return a user's movies as read-only rows (movie columns plus
+        watched / want_to_watch / user_rating).
+        Accepts the same sort/filter/cursor options as get_movies_page;
+        without a limit the whole collection is returned."""
+        movies, _ = self.get_movies_page(user_id, **options)
+        return movies
+
+    def get_movies_page(
+        self,
+        user_id: int,
+        sort: str = "added",
+        descending: bool = False,
+        watched: bool | None = None,
+        want_to_watch: bool | None = None,
+        genre: str | None = None,
+        decade: int | None = None,
+        after: str | None = None,
+        limit: int | None = None,
+        fields=None,
+    ) -> tuple[list, str | None]:
+        """Return one page of a user's movies and the cursor for the next page.
+        Sorting, filtering and paging all happen in SQL (keyset pagination
+        on (sort key, user_movie.id)), so cost does not grow with the offset.
+        `fields` limits the selected columns (names from COLLECTION_FIELDS)."""
+        if sort not in SORT_OPTIONS:
+            raise ValueError(f"Unknown sort option: {sort!r}")
+        sort_key = SORT_OPTIONS[sort]
+
+        query = (
+            self._collection_query(fields, sort_key.label("sort_key"), UserMovie.id.label("link_id"))
             .filter(UserMovie.user_id == user_id)
-            .all()
         )
 
-        movies = []
+        if watched is not None:
+            query = query.filter(UserMovie.watched == watched)
+        if want_to_watch is not None:
+            query = query.filter(UserMovie.want_to_watch == want_to_watch)
+        if genre:
+            escaped = genre.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.filter(Movie.genre.ilike(f"%{escaped}%", escape="\\"))
+        if decade is not None:
+            query = query.filter(Movie.year >= decade, Movie.year < decade + 10)
+
+        if after:
+            last_value, last_id = decode_cursor(after)
+            position = tuple_(sort_key, UserMovie.id)
+            if descending:
+                query = query.filter(position < tuple_(last_value, last_id))
+            else:
+                query = query.filter(position > tuple_(last_value, last_id))
+
+        if descending:
+            query = query.order_by(sort_key.desc(), UserMovie.id.desc())
+        else:
+            query = query.order_by(sort_key.asc(), UserMovie.id.asc())
+
+        # Fetch one extra row to know whether another page exists
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].sort_key, rows[-1].link_id)
+
+        return rows, next_cursor
+
+    def iter_collection(self, user_id: int | None = None, fields=None, batch_size: int = EXPORT_BATCH):
+        """Yield collection rows in the order they were added, for exports.
+        Streams with yield_per (a server-side cursor where the driver has
+        one), so memory does not grow with the collection. Without user_id
+        every user's collection is streamed, each row ending with user_id
+        and user_name."""
+        if user_id is None:
+            extra = (UserMovie.user_id.label("user_id"), User.name.label("user_name"))
+            query = (
+                self._collection_query(fields, *extra)
+                .join(User, User.id == UserMovie.user_id)
+                .order_by(UserMovie.user_id, UserMovie.id)
+            )
+        else:
+            query = self._collection_query(fields).filter(UserMovie.user_id == user_id).order_by(UserMovie.id)
+        yield from query.yield_per(batch_size)
+
+    def _collection_query(self, fields=None, *extra):
+        """Column-projected movie + user_movie query for collection reads."""
+        names = fields or COLLECTION_FIELDS
+        unknown = set(names) - COLLECTION_FIELDS.keys()
+        if unknown:
+            raise ValueError(f"Unknown fields: {sorted(unknown)}")
+        columns = [COLLECTION_FIELDS[name].label(name) for name in names]
+        return (
+            db.session.query(*columns, *extra)
+            .select_from(Movie)
+            .join(UserMovie, Movie.id == UserMovie.movie_id)
+        )
 
-        for movie, link in rows:
-            movie.watched = link.watched
-            movie.want_to_watch = link.want_to_watch
-            movie.user_rating = link.user_rating
-            movies.append(movie)
+    def get_collection_item(self, user_id: int, movie_id: int, fields=None):
+        """One row of a user's collection, or None."""
+        return (
+            self._collection_query(fields)
+            .filter(UserMovie.user_id == user_id, UserMovie.movie_id == movie_id)
+            .first()
+        )
 
-        return movies
+    # ── Search ─────────────────────────────────────────────
+
+    def _use_fts(self) -> bool:
+        """True when movie_fts exists. It comes from migration 3, so a
+        database made by create_all() alone searches with LIKE until the
+        migrations run."""
+        if not self._fts_ready and db.engine.dialect.name == "sqlite":
+            self._fts_ready = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movie_fts'")
+            ).first() is not None
+        return self._fts_ready
+
+    def _fts_movie_ids(self, match: str, user_id: int | None, limit: int, resolved: bool = False) -> list:
+        """Movie ids matching an FTS5 query, best bm25 rank first.
+        With resolved, placeholders are left out."""
+        sql = "SELECT movie_fts.rowid FROM movie_fts"
+        if resolved:
+            sql += " JOIN movie ON movie.id = movie_fts.rowid AND movie.status IS NULL"
+        if user_id is not None:
+            sql += (" JOIN user_movie ON user_movie.movie_id = movie_fts.rowid"
+                    " AND user_movie.user_id = :user_id")
+        sql += f" WHERE movie_fts MATCH :match ORDER BY bm25(movie_fts, {SEARCH_WEIGHTS}) LIMIT :limit"
+        params = {"match": match, "user_id": user_id, "limit": limit}
+        return db.session.execute(text(sql), params).scalars().all()
+
+    def _like_filter(self, terms: str, columns):
+        """ILIKE fallback when movie_fts is missing: every word must appear in some column."""
+        clauses = []
+        for word in re.findall(r"\w+", terms):
+            clauses.append(or_(*(column.ilike(f"%{word}%") for column in columns)))
+        return clauses
+
+    def search_movies(self, user_id: int, terms: str, limit: int = 50, fields=None) -> list:
+        """Ranked full-text search within a user's collection
+        (title, plot, actors, director, genre). Returns collection rows."""
+        match = fts_query(terms)
+        if match is None:
+            return []
+
+        query = (
+            self._collection_query(fields, Movie.id.label("movie_id"))
+            .filter(UserMovie.user_id == user_id)
+        )
+        if self._use_fts():
+            ids = self._fts_movie_ids(match, user_id, limit)
+            rows = query.filter(Movie.id.in_(ids)).all()
+            rank = {movie_id: i for i, movie_id in enumerate(ids)}
+            rows.sort(key=lambda row: rank[row.movie_id])
+            return rows
+
+        columns = (Movie.title, Movie.plot, Movie.actors, Movie.director, Movie.genre)
+        return query.filter(*self._like_filter(terms, columns)).order_by(Movie.title).limit(limit).all()
+
+    def suggest_movies(self, title: str, limit: int = 5) -> list:
+        """Movies already in the shared table whose title matches, best first.
+        Used to offer "did you mean" before going to OMDb."""
+        match = fts_query(title, column="title")
+        if match is None:
+            return []
+
+        if not self._use_fts():
+            return (
+                Movie.query
+                .filter(RESOLVED, *self._like_filter(title, (Movie.title,)))
+                .order_by(Movie.title)
+                .limit(limit)
+                .all()
+            )
+
+        ids = self._fts_movie_ids(match, None, limit, resolved=True)
+        movies = Movie.query.filter(Movie.id.in_(ids)).all()
+        rank = {movie_id: i for i, movie_id in enumerate(ids)}
+        return sorted(movies, key=lambda m: rank[m.id])
 
     def get_user_movie(self, user_id: int, movie_id: int) -> UserMovie | None:
         """Return the UserMovie junction row """
@@ -75,14 +451,288 @@ class DataManager:
             db.session.add(movie_data)
             db.session.flush()  # get movie.id without full commit
             movie = movie_data
+            stats.index_movies(db.session, [movie.id])
 
         link = UserMovie(user_id=user_id, movie_id=movie.id)
         db.session.add(link)
         db.session.add(movie)
+        self._log_changes(UPSERT, [(user_id, movie.id)])
         db.session.commit()
+        self._changed(user_id)
         return movie
 
 
+    def bulk_add_movies(self, user_id: int, movies: list) -> dict:
+        """Link many movies to a user, inserting the shared Movie rows that
+        are not stored yet. Works in batches with one commit per batch.
+        Returns imdb_id -> "added" or "duplicate"."""
+        results = {}
+
+        for start in range(0, len(movies), BATCH_SIZE):
+            batch = movies[start:start + BATCH_SIZE]
+            existing = self.get_movies_by_imdb_ids(m.imdb_id for m in batch)
+
+            owned = set()
+            if existing:
+                owned = {
+                    movie_id for (movie_id,) in
+                    db.session.query(UserMovie.movie_id).filter(
+                        UserMovie.user_id == user_id,
+                        UserMovie.movie_id.in_([m.id for m in existing.values()]),
+                    )
+                }
+
+            new_movies = []
+            for movie in batch:
+                if movie.imdb_id not in existing:
+                    existing[movie.imdb_id] = movie
+                    new_movies.append(movie)
+            db.session.add_all(new_movies)
+            db.session.flush()  # assign ids for the new rows
+            stats.index_movies(db.session, [m.id for m in new_movies])
+
+            links = []
+            for movie in batch:
+                movie = existing[movie.imdb_id]
+                if movie.id in owned:
+                    results[movie.imdb_id] = "duplicate"
+                    continue
+                owned.add(movie.id)
+                links.append(UserMovie(user_id=user_id, movie_id=movie.id))
+                results[movie.imdb_id] = "added"
+
+            db.session.add_all(links)
+            self._log_changes(UPSERT, [(user_id, link.movie_id) for link in links])
+            db.session.commit()
+
+        self._changed(user_id)
+        return results
+
+    # ── Statistics ─────────────────────────────────────────
+
+    def get_collection_stats(self, user_id: int) -> dict | None:
+        """Totals plus genre, country and decade breakdowns for a user's
+        collection, read from the precomputed summaries. None for an
+        unknown user."""
+        row = (
+            db.session.query(User.id, UserStats)
+            .outerjoin(UserStats, UserStats.user_id == User.id)
+            .filter(User.id == user_id)
+            .first()
+        )
+        if row is None:
+            return None
+        summary = row.UserStats or UserStats(
+            total=0, watched=0, want=0, rated=0, rating_sum=0, runtime_watched=0,
+            compared=0, compared_rating=0, compared_imdb=0,
+        )
+
+        def breakdown(label, model, *joins):
+            query = db.session.query(label, model.total, model.watched, model.rated, model.rating_sum)
+            for target, condition in joins:
+                query = query.join(target, condition)
+            return [
+                {"name": name, "total": total, "watched": watched, "avg": _average(rating_sum, rated)}
+                for name, total, watched, rated, rating_sum in
+                query.filter(model.user_id == user_id, model.total > 0)
+            ]
+
+        genres = breakdown(Genre.name, UserGenreStats, (Genre, Genre.id == UserGenreStats.genre_id))
+        countries = breakdown(Country.name, UserCountryStats, (Country, Country.id == UserCountryStats.country_id))
+        decades = breakdown(UserDecadeStats.decade, UserDecadeStats)
+        return {
+            "total": summary.total,
+            "watched": summary.watched,
+            "want": summary.want,
+            "rated": summary.rated,
+            "avg": _average(summary.rating_sum, summary.rated),
+            "runtime_watched": summary.runtime_watched,
+            # The same rated movies, your rating vs IMDb's
+            "compared": summary.compared,
+            "compared_avg": _average(summary.compared_rating, summary.compared),
+            "compared_imdb_avg": _average(summary.compared_imdb, summary.compared),
+            "genres": sorted(genres, key=lambda g: (-g["total"], g["name"])),
+            "countries": sorted(countries, key=lambda c: (-c["total"], c["name"])),
+            "decades": sorted(decades, key=lambda d: d["name"]),
+        }
+
+    # ── Change feed ────────────────────────────────────────
+
+    def get_changes(self, since: int = 0, user_id: int | None = None, limit: int = 100, fields=None) -> tuple:
+        """Collection changes with seq > since, oldest first, the cursor to
+        pass next time and whether more changes are waiting. Upserts carry the item's current columns
+        (`fields`, default COLLECTION_FIELDS); deletes are tombstones with
+        item None. An upsert whose item is gone by now is skipped: its
+        tombstone follows later in the feed."""
+        names = list(fields or COLLECTION_FIELDS)
+        unknown = set(names) - COLLECTION_FIELDS.keys()
+        if unknown:
+            raise ValueError(f"Unknown fields: {sorted(unknown)}")
+
+        query = (
+            db.session.query(
+                Change.seq, Change.user_id, Change.movie_id, Change.op, UserMovie.id.label("link_id"),
+                *(COLLECTION_FIELDS[name].label(name) for name in names),
+            )
+            .select_from(Change)
+            .outerjoin(UserMovie, and_(UserMovie.user_id == Change.user_id, UserMovie.movie_id == Change.movie_id))
+            .outerjoin(Movie, Movie.id == UserMovie.movie_id)
+            .filter(Change.seq > since)
+        )
+        if user_id is not None:
+            query = query.filter(Change.user_id == user_id)
+        # One extra row tells whether another page exists
+        rows = query.order_by(Change.seq).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        changes = []
+        for row in rows:
+            if row.op == DELETE:
+                changes.append({"seq": row.seq, "user_id": row.user_id, "movie_id": row.movie_id, "op": DELETE})
+            elif row.link_id is not None:
+                changes.append({
+                    "seq": row.seq, "user_id": row.user_id, "movie_id": row.movie_id, "op": UPSERT,
+                    "item": {name: getattr(row, name) for name in names},
+                })
+        return changes, rows[-1].seq if rows else since, has_more
+
+    def compact_changes(self) -> int:
+        """Drop feed rows superseded by a later row for the same item.
+        Clients only need an item's latest state, so any cursor stays
+        valid. Returns the number of rows removed."""
+        newer = aliased(Change)
+        superseded = (
+            db.session.query(newer.seq)
+            .filter(newer.user_id == Change.user_id, newer.movie_id == Change.movie_id, newer.seq > Change.seq)
+            .exists()
+        )
+        deleted = Change.query.filter(superseded).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    # ── Recommendations ────────────────────────────────────
+
+    def get_recommendations(self, user_id: int, limit: int = 20, fields=None) -> list:
+        """A user's precomputed suggestions (see recommender.py), best first,
+        as movie rows plus score. Movies added since the last refresh are skipped."""
+        names = tuple(fields or MOVIE_FIELDS)
+        unknown = set(names) - MOVIE_FIELDS.keys()
+        if unknown:
+            raise ValueError(f"Unknown fields: {sorted(unknown)}")
+        return db.session.execute(_recommendations_statement(names), {"user_id": user_id, "limit": limit}).all()
+
+    # ── Background enrichment ──────────────────────────────
+
+    def add_pending_movie(self, user_id: int, title: str) -> Movie:
+        """Link a placeholder movie that only has a title; a background job
+        fills in the OMDb data later (resolve_pending_movie)."""
+        movie = Movie(
+            title=title, genre="", year=0, actors="", country="", plot="", imdb_url="",
+            # Unique stand-in until the real IMDb id is known (fits String(20))
+            imdb_id=f"pending-{uuid.uuid4().hex[:12]}",
+            status=PENDING, refreshed_at=None,
+        )
+        db.session.add(movie)
+        db.session.flush()
+        db.session.add(UserMovie(user_id=user_id, movie_id=movie.id))
+        self._log_changes(UPSERT, [(user_id, movie.id)])
+        db.session.commit()
+        self._changed(user_id)
+        return movie
+
+    def resolve_pending_movie(self, movie_id: int, values: dict) -> bool:
+        """Replace a placeholder with OMDb data (parse_movie output).
+        If that movie is already stored, the placeholder's links move to
+        it (dropping links the user already has) and the placeholder goes."""
+        owner_ids = [u for (u,) in db.session.query(UserMovie.user_id).filter_by(movie_id=movie_id)]
+        existing = (
+            db.session.query(Movie.id)
+            .filter(Movie.imdb_id == values["imdb_id"], Movie.id != movie_id)
+            .scalar()
+        )
+        if existing:
+            already_linked = (
+                db.session.query(owned.id)
+                .filter(owned.movie_id == existing, owned.user_id == UserMovie.user_id)
+                .exists()
+            )
+            UserMovie.query.filter(UserMovie.movie_id == movie_id, already_linked).delete(synchronize_session=False)
+            UserMovie.query.filter_by(movie_id=movie_id).update(
+                {UserMovie.movie_id: existing}, synchronize_session=False
+            )
+            self._log_changes(DELETE, [(user_id, movie_id) for user_id in owner_ids])
+            self._log_changes(UPSERT, [(user_id, existing) for user_id in owner_ids])
+            # "evaluate" drops a loaded placeholder from the identity map too
+            updated = Movie.query.filter_by(id=movie_id).delete(synchronize_session="evaluate")
+        else:
+            updated = Movie.query.filter_by(id=movie_id, status=PENDING).update(
+                {**values, "status": None, "refreshed_at": utcnow()}, synchronize_session=False
+            )
+            stats.index_movies(db.session, [movie_id])
+            self._log_changes(UPSERT, [(user_id, movie_id) for user_id in owner_ids])
+        db.session.commit()
+        self._changed(*owner_ids)
+        return bool(updated)
+
+    def mark_movie_not_found(self, movie_id: int) -> bool:
+        updated = Movie.query.filter_by(id=movie_id, status=PENDING).update(
+            {Movie.status: NOT_FOUND}, synchronize_session=False
+        )
+        if updated:
+            self._log_links(UPSERT, UserMovie.movie_id == movie_id)
+        db.session.commit()
+        owners = db.session.query(UserMovie.user_id).filter_by(movie_id=movie_id).all()
+        self._changed(*(user_id for (user_id,) in owners))
+        return bool(updated)
+
+    def get_stale_movies(self, limit: int, before: datetime) -> list:
+        """(id, imdb_id) of resolved movies not refreshed since `before`,
+        never-refreshed ones first."""
+        return (
+            db.session.query(Movie.id, Movie.imdb_id)
+            .filter(Movie.status.is_(None))
+            .filter(or_(Movie.refreshed_at.is_(None), Movie.refreshed_at < before))
+            .order_by(Movie.refreshed_at.asc().nulls_first(), Movie.id)
+            .limit(limit)
+            .all()
+        )
+
+    def refresh_movie(self, movie_id: int, values: dict) -> None:
+        """Store re-fetched metadata (only REFRESH_FIELDS) and stamp refreshed_at.
+        Owners' pages are only invalidated when something actually changed."""
+        values = {k: v for k, v in values.items() if k in REFRESH_FIELDS}
+        changed = bool(values) and db.session.query(Movie.id).filter(
+            Movie.id == movie_id,
+            or_(*(getattr(Movie, k).is_distinct_from(v) for k, v in values.items())),
+        ).first() is not None
+        Movie.query.filter_by(id=movie_id).update(
+            {**values, "refreshed_at": utcnow()}, synchronize_session=False
+        )
+        if changed:
+            self._log_links(UPSERT, UserMovie.movie_id == movie_id)
+        db.session.commit()
+        if changed:
+            owners = db.session.query(UserMovie.user_id).filter_by(movie_id=movie_id).all()
+            self._changed(*(user_id for (user_id,) in owners))
+
+    def complete_movie(self, movie_id: int, data: dict) -> bool:
+        """Fill DETAIL_FIELDS that are still empty (a movie added from the
+        IMDb catalog) from OMDb data (parse_movie output), and stamp refreshed_at."""
+        values = {Movie.refreshed_at: utcnow()}
+        for name in DETAIL_FIELDS:
+            if data.get(name):
+                column = getattr(Movie, name)
+                values[column] = case((or_(column.is_(None), column == ""), data[name]), else_=column)
+        updated = Movie.query.filter_by(id=movie_id).update(values, synchronize_session=False)
+        stats.index_movies(db.session, [movie_id])  # country may be new
+        self._log_links(UPSERT, UserMovie.movie_id == movie_id)
+        db.session.commit()
+        owners = db.session.query(UserMovie.user_id).filter_by(movie_id=movie_id).all()
+        self._changed(*(user_id for (user_id,) in owners))
+        return bool(updated)
+
+
     def movie_exists_for_user(self, user_id: int, imdb_id: str) -> bool:
         return (
                 UserMovie.query
@@ -95,6 +745,41 @@ class DataManager:
     def get_movie(self, movie_id: int) -> Movie | None:
         return Movie.query.get(movie_id)
 
+    def get_movie_by_imdb_id(self, imdb_id: str) -> Movie | None:
+        """Resolved movie with this IMDb id (placeholders are skipped)."""
+        return Movie.query.filter(Movie.imdb_id == imdb_id, RESOLVED).first()
+
+    def get_movies_by_imdb_ids(self, imdb_ids) -> dict:
+        """Map imdb_id -> Movie for the ids already in the movie table (resolved movies only)."""
+        imdb_ids = list(set(imdb_ids))
+        found = {}
+        for start in range(0, len(imdb_ids), BATCH_SIZE):
+            chunk = imdb_ids[start:start + BATCH_SIZE]
+            for movie in Movie.query.filter(Movie.imdb_id.in_(chunk), RESOLVED):
+                found[movie.imdb_id] = movie
+        return found
+
+    def get_movies_by_titles(self, titles) -> dict:
+        """Map lower-cased title -> Movie for resolved movies with these titles."""
+        titles = list({" ".join(t.split()).lower() for t in titles})
+        found = {}
+        for start in range(0, len(titles), BATCH_SIZE):
+            chunk = titles[start:start + BATCH_SIZE]
+            rows = Movie.query.filter(func.lower(Movie.title).in_(chunk), RESOLVED).order_by(Movie.id)
+            for movie in rows:
+                found.setdefault(movie.title.lower(), movie)
+        return found
+
+    def get_movie_by_title(self, title: str) -> Movie | None:
+        """Case-insensitive exact title match among the resolved movies."""
+        normalized = " ".join(title.split()).lower()
+        return (
+            Movie.query
+            .filter(func.lower(Movie.title) == normalized, RESOLVED)
+            .order_by(Movie.id)
+            .first()
+        )
+
     def get_movie_for_user(self, user_id: int, movie_id: int) -> Movie | None:
         """Return the movie only if it belongs to this user."""
         return (
@@ -110,74 +795,123 @@ class DataManager:
         if not movie:
             return None
         movie.title = new_title
+        self._log_links(UPSERT, UserMovie.movie_id == movie_id)
         db.session.commit()
+        # The movie row is shared: every owner's pages show the new title
+        owners = db.session.query(UserMovie.user_id).filter_by(movie_id=movie_id).all()
+        self._changed(*(user_id for (user_id,) in owners))
         return movie
 
 
-    def delete_movie(self, user_id, movie_id: int) -> bool:
+    def delete_movie(self, user_id, movie_id: int, cleanup_orphans: bool = True) -> bool:
         """Remove movie from user's collection.
                 Deletes the shared Movie row only if no other users own it."""
-        link = UserMovie.query.filter_by(
-            user_id=user_id, movie_id=movie_id
-        ).first()
-        if not link:
+        deleted = (
+            UserMovie.query
+            .filter_by(user_id=user_id, movie_id=movie_id)
+            .delete(synchronize_session=False)
+        )
+        if not deleted:
+            db.session.rollback()
             return False
-
-        db.session.delete(link)
-        db.session.flush()
+        self._log_changes(DELETE, [(user_id, movie_id)])
 
         # Clean movies with no user
-        still_used = UserMovie.query.filter_by(movie_id=movie_id).first()
-        if not still_used:
-            movie = Movie.query.get(movie_id)
-            if movie:
-                db.session.delete(movie)
+        if cleanup_orphans:
+            still_used = db.session.query(UserMovie.id).filter(UserMovie.movie_id == Movie.id).exists()
+            Movie.query.filter(Movie.id == movie_id, ~still_used).delete(synchronize_session=False)
 
         db.session.commit()
+        self._changed(user_id)
         return True
 
 
     # ── User-specific movie stats ────────────────────────────
 
-    def set_watched(self, user_id: int, movie_id: int, watched: bool) -> bool:
-        link = self.get_user_movie(user_id, movie_id)
-        if not link:
+    def _update_link(self, user_id: int, movie_id: int, values: dict) -> bool:
+        """Apply one UPDATE to the user_movie row and commit.
+        Values may reference the row's current columns, so read-modify-write
+        happens inside the statement and concurrent clicks cannot be lost."""
+        updated = (
+            UserMovie.query
+            .filter_by(user_id=user_id, movie_id=movie_id)
+            .update(values, synchronize_session=False)
+        )
+        if updated:
+            self._log_changes(UPSERT, [(user_id, movie_id)])
+        db.session.commit()
+        if updated:
+            self._changed(user_id)
+        return updated > 0
+
+    def _status_values(self, changes: dict) -> dict:
+        """UPDATE values for status fields (watched, want_to_watch,
+        user_rating), with the same rules as the single-field methods:
+        a rating marks the movie watched, un-watching clears the rating.
+        Raises ValueError for changes that contradict those rules."""
+        unknown = set(changes) - LINK_FIELDS.keys()
+        if unknown:
+            raise ValueError(f"Unknown status fields: {sorted(unknown)}")
+        if changes.get("watched") is False and changes.get("user_rating") is not None:
+            raise ValueError("A rated movie is watched: send watched=false with user_rating=null.")
+
+        values = {LINK_FIELDS[name]: value for name, value in changes.items()}
+        if changes.get("user_rating") is not None:
+            values[UserMovie.watched] = True
+        elif changes.get("watched") is False:
+            values[UserMovie.user_rating] = None
+        return values
+
+    def update_collection_item(self, user_id: int, movie_id: int, changes: dict, title: str | None = None) -> bool:
+        """Apply status changes (see _status_values) and a new title to one
+        of a user's movies in a single transaction. Returns False, changing
+        nothing, when the movie is not in the user's collection."""
+        values = self._status_values(changes)
+        movie = self.get_movie_for_user(user_id, movie_id)
+        if movie is None:
+            db.session.rollback()
             return False
-        link.watched = watched
+
+        owners = [user_id]
+        if values:
+            (
+                UserMovie.query
+                .filter_by(user_id=user_id, movie_id=movie_id)
+                .update(values, synchronize_session=False)
+            )
+        if title is not None:
+            # The movie row is shared: every owner's pages show the new title
+            movie.title = title
+            self._log_links(UPSERT, UserMovie.movie_id == movie_id)
+            owners = [owner for (owner,) in db.session.query(UserMovie.user_id).filter_by(movie_id=movie_id)]
+        elif values:
+            self._log_changes(UPSERT, [(user_id, movie_id)])
         db.session.commit()
+        if values or title is not None:
+            self._changed(*owners)
         return True
 
+    def set_watched(self, user_id: int, movie_id: int, watched: bool) -> bool:
+        return self._update_link(user_id, movie_id, {UserMovie.watched: watched})
+
     def set_want_to_watch(self, user_id: int, movie_id: int, want: bool) -> bool:
-        link = self.get_user_movie(user_id, movie_id)
-        if not link:
-            return False
-        link.want_to_watch = want
-        db.session.commit()
-        return True
+        return self._update_link(user_id, movie_id, {UserMovie.want_to_watch: want})
 
     def set_user_rating(self, user_id: int, movie_id: int, rating: float | None) -> bool:
-        link = self.get_user_movie(user_id, movie_id)
-        if not link:
-            return False
-        link.user_rating = rating
-        db.session.commit()
-        return True
+        return self._update_link(user_id, movie_id, {UserMovie.user_rating: rating})
 
     def toggle_want_to_watch(self, user_id: int, movie_id: int) -> bool:
-        link = self.get_user_movie(user_id, movie_id)
-        if not link:
-            return False
-        return self.set_want_to_watch(user_id, movie_id, not link.want_to_watch)
+        return self._update_link(user_id, movie_id, {UserMovie.want_to_watch: ~UserMovie.want_to_watch})
 
     def toggle_watched(self, user_id: int, movie_id: int) -> bool:
-        link = self.get_user_movie(user_id, movie_id)
-        if not link:
-            return False
-
-        if link.watched:
-            self.set_user_rating(user_id, movie_id, None)  # clear rating when un-watching
-        return self.set_watched(user_id, movie_id, not link.watched)
+        return self._update_link(user_id, movie_id, {
+            UserMovie.watched: ~UserMovie.watched,
+            # clear rating when un-watching
+            UserMovie.user_rating: case((UserMovie.watched, None), else_=UserMovie.user_rating),
+        })
 
     def rate_movie(self, user_id: int, movie_id: int, rating: int) -> bool:
-        self.set_watched(user_id, movie_id, True)  # auto-mark watched
-        return self.set_user_rating(user_id, movie_id, rating)
\ No newline at end of file
+        return self._update_link(user_id, movie_id, {
+            UserMovie.watched: True,  # auto-mark watched
+            UserMovie.user_rating: rating,
+        })
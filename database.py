@@ -0,0 +1,66 @@
+import os
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+
+
+def database_uri(default_path: str) -> str:
+    """DATABASE_URL if set (e.g. Postgres), else the local SQLite file."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return f"sqlite:///{default_path}"
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _in_memory_sqlite(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def engine_options(uri: str, busy_timeout: int = 5000) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured backend; busy_timeout
+    (ms) matches the SQLite busy_timeout pragma."""
+    options = {"pool_pre_ping": not uri.startswith("sqlite")}
+    # In-memory SQLite runs on a single shared connection (StaticPool),
+    # which takes no queue settings
+    if not _in_memory_sqlite(uri):
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+            pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+        )
+    if uri.startswith("sqlite"):
+        # Driver-level busy handler, matched to the pragma
+        options["connect_args"] = {"timeout": busy_timeout / 1000}
+    else:
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    return options
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: dict) -> None:
+    """Run the PRAGMAs (config SQLITE_PRAGMAS) on every new DBAPI
+    connection of a SQLite engine."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def optimize(engine: Engine, analyze: bool = False) -> None:
+    """Refresh query planner statistics.
+    SQLite: PRAGMA optimize (or a full ANALYZE); other backends: ANALYZE."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE" if analyze else "PRAGMA optimize"))
+        else:
+            conn.execute(text("ANALYZE"))
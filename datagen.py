@@ -0,0 +1,123 @@
+"""Synthetic data for benchmarks and load tests.
+
+Fills the schema with generated users, shared movies and collection links
+using bulk Core inserts. The same seed always produces the same data, so
+benchmark runs against different code versions are comparable."""
+import random
+import time
+
+from sqlalchemy import insert
+
+import stats
+from models import db, User, Movie, UserMovie
+
+# Rows per executemany() batch
+INSERT_BATCH = 10_000
+
+# Synthetic ids live far above real IMDb ids so they never collide
+SYNTHETIC_ID_BASE = 90_000_000
+
+GENRES = ["Action", "Adventure", "Animation", "Comedy", "Crime", "Drama", "Fantasy",
+          "Horror", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western"]
+WORDS = ["Night", "City", "Last", "Dark", "Love", "Return", "Secret", "River", "Star", "Storm",
+         "King", "Ghost", "Summer", "Road", "House", "Blood", "Silent", "Golden", "Edge", "Dream"]
+NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Robin", "Quinn"]
+COUNTRIES = ["USA", "UK", "France", "Germany", "Japan", "India", "Italy", "Spain"]
+
+
+def synthetic_imdb_id(n: int) -> str:
+    return f"tt{SYNTHETIC_ID_BASE + n}"
+
+
+def _movie_row(rng: random.Random, n: int) -> dict:
+    imdb_id = synthetic_imdb_id(n)
+    return {
+        "title": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {n}",
+        "genre": ", ".join(rng.sample(GENRES, rng.randint(1, 3))),
+        "year": rng.randint(1930, 2025),
+        "director": f"{rng.choice(NAMES)} {rng.choice(WORDS)}son",
+        "actors": ", ".join(f"{rng.choice(NAMES)} {rng.choice(WORDS)}" for _ in range(3)),
+        "country": rng.choice(COUNTRIES),
+        "plot": " ".join(rng.choice(WORDS).lower() for _ in range(30)).capitalize() + ".",
+        "runtime": rng.randint(75, 180),
+        "imdb_rating": round(rng.uniform(2.0, 9.5), 1),
+        "poster_url": "N/A",
+        "imdb_url": f"https://www.imdb.com/title/{imdb_id}/",
+        "imdb_id": imdb_id,
+    }
+
+
+def _insert(table, rows) -> None:
+    if rows:
+        db.session.execute(insert(table), rows)
+        db.session.commit()
+
+
+def generate(
+    users: int,
+    movies: int,
+    links_per_user: int,
+    seed: int = 42,
+    watched_ratio: float = 0.6,
+    want_ratio: float = 0.2,
+    rated_ratio: float = 0.5,
+    progress=None,
+) -> dict:
+    """Insert `users` users, `movies` shared movies and `links_per_user`
+    random collection links per user. want_ratio applies to unwatched
+    links, rated_ratio to watched ones. Call inside an app context on an
+    empty (or disposable) database. Returns counts and elapsed seconds."""
+    if links_per_user > movies:
+        raise ValueError("links_per_user cannot exceed the number of movies")
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+    started = time.perf_counter()
+
+    first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    first_movie = (db.session.query(db.func.max(Movie.id)).scalar() or 0) + 1
+
+    for start in range(0, movies, INSERT_BATCH):
+        _insert(Movie, [_movie_row(rng, first_movie + n) for n in range(start, min(start + INSERT_BATCH, movies))])
+    report(f"movies: {movies}")
+
+    _insert(User, [{"name": f"user-{first_user + n}"} for n in range(users)])
+    user_ids = [u for (u,) in db.session.query(User.id).filter(User.id >= first_user).order_by(User.id)]
+    movie_ids = [m for (m,) in db.session.query(Movie.id).filter(Movie.id >= first_movie).order_by(Movie.id)]
+    report(f"users: {users}")
+
+    # Genre / country lookups first, so the stats triggers see them as links arrive
+    stats.index_movies(db.session, movie_ids)
+    db.session.commit()
+
+    links = []
+    total_links = 0
+    for user_id in user_ids:
+        for movie_id in rng.sample(movie_ids, links_per_user):
+            watched = rng.random() < watched_ratio
+            links.append({
+                "user_id": user_id,
+                "movie_id": movie_id,
+                "watched": watched,
+                "want_to_watch": not watched and rng.random() < want_ratio,
+                "user_rating": float(rng.randint(1, 10)) if watched and rng.random() < rated_ratio else None,
+            })
+        if len(links) >= INSERT_BATCH:
+            _insert(UserMovie, links)
+            total_links += len(links)
+            links = []
+            report(f"links: {total_links}")
+    _insert(UserMovie, links)
+    total_links += len(links)
+    report(f"links: {total_links}")
+
+    # SQLite keeps the stats current with triggers (migration 6)
+    if db.engine.dialect.name != "sqlite":
+        stats.rebuild(db.session, user_ids)
+        db.session.commit()
+
+    return {
+        "users": users,
+        "movies": movies,
+        "links": total_links,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
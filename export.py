@@ -0,0 +1,69 @@
+"""Collection exports as CSV or JSON Lines.
+
+The writers turn a row iterator (DataManager.iter_collection) into
+chunks of encoded bytes, so a streamed HTTP response or a file gets the
+first rows right away and memory stays flat for any collection size.
+The CSV header uses the same names as the importer (title, year,
+imdb_id), so an export can be imported again."""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+# Rows encoded per yielded chunk; one chunk per row would make the WSGI
+# server write (and flush) tens of thousands of tiny pieces
+CHUNK_ROWS = 500
+
+
+def csv_chunks(rows, fields) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(fields)
+    yield flush()  # the header goes out before the first row is fetched
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CHUNK_ROWS == 0:
+            yield flush()
+    yield flush()
+
+
+def _dumps(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=datetime.isoformat).encode()
+
+
+def jsonl_chunks(rows, fields) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(_dumps(dict(zip(fields, row))))
+        if len(lines) == CHUNK_ROWS:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def chunks(fmt: str, rows, fields) -> Iterator[bytes]:
+    """Encoded export of `rows` (sequences in `fields` order) in format `fmt`."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    return csv_chunks(rows, fields) if fmt == "csv" else jsonl_chunks(rows, fields)
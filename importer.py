@@ -0,0 +1,210 @@
+import asyncio
+import csv
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from models import Movie
+from omdb_client import parse_movie
+
+DEFAULT_WORKERS = 8
+
+IMDB_ID_RE = re.compile(r"\btt\d{7,}\b")
+TITLE_YEAR_RE = re.compile(r"^(.*\S)\s*\((\d{4})\)$")
+
+# Header names used by the supported CSV layouts (compared lower-cased):
+# generic (title, year, imdb_id), IMDb lists/ratings (Const, Title, Year)
+# and Letterboxd (Name, Year, Letterboxd URI).
+TITLE_COLUMNS = ("title", "name")
+IMDB_ID_COLUMNS = ("imdb_id", "imdbid", "imdb id", "const", "tconst")
+YEAR_COLUMNS = ("year",)
+
+
+@dataclass
+class ImportEntry:
+    """One requested movie from an import file."""
+    line: int
+    text: str
+    title: str | None = None
+    imdb_id: str | None = None
+    year: int | None = None
+
+
+def _parse_year(value) -> int | None:
+    value = (value or "").strip()
+    return int(value[:4]) if value[:4].isdigit() else None
+
+
+def _column(row: dict, names) -> str:
+    for name in names:
+        if row.get(name):
+            return row[name].strip()
+    return ""
+
+
+def parse_import(text: str) -> list[ImportEntry]:
+    """Parse a CSV export (generic, IMDb or Letterboxd) or a plain list
+    with one title or IMDb id/URL per line."""
+    text = text.lstrip("\ufeff")
+    lines = text.splitlines()
+    first = next((line for line in lines if line.strip()), "")
+
+    delimiter = "\t" if "\t" in first else ","
+    header = [h.strip().lower() for h in next(csv.reader([first], delimiter=delimiter), [])]
+    if any(h in TITLE_COLUMNS or h in IMDB_ID_COLUMNS for h in header):
+        return _parse_csv(text, delimiter)
+
+    entries = []
+    for number, raw in enumerate(lines, start=1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = IMDB_ID_RE.search(line)
+        if match:
+            entries.append(ImportEntry(number, line, imdb_id=match.group(0)))
+            continue
+        match = TITLE_YEAR_RE.match(line)
+        if match:
+            entries.append(ImportEntry(number, line, title=match.group(1), year=int(match.group(2))))
+        else:
+            entries.append(ImportEntry(number, line, title=line))
+    return entries
+
+
+def _parse_csv(text: str, delimiter: str) -> list[ImportEntry]:
+    reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+    reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames or []]
+
+    entries = []
+    for row in reader:
+        title = _column(row, TITLE_COLUMNS)
+        match = IMDB_ID_RE.search(_column(row, IMDB_ID_COLUMNS))
+        if not title and not match:
+            continue
+        entries.append(ImportEntry(
+            reader.line_num,
+            title or match.group(0),
+            title=title or None,
+            imdb_id=match.group(0) if match else None,
+            year=_parse_year(_column(row, YEAR_COLUMNS)),
+        ))
+    return entries
+
+
+def import_movies(dm, user_id: int, entries: list[ImportEntry], lookup, workers: int = DEFAULT_WORKERS) -> list[dict]:
+    """Add every entry to a user's collection.
+
+    Entries already in the movie table are matched locally; the rest are
+    fetched concurrently through `lookup(title=, imdb_id=, year=)`, which
+    must return OMDb data or None and must not use the database session.
+    All inserts go through DataManager.bulk_add_movies.
+    Returns one result dict per entry, in input order."""
+    resolved, pending = _match_local(dm, entries)
+
+    # Network lookups run in a bounded pool; one call per distinct key
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        for key, indexes in pending.items():
+            entry = entries[indexes[0]]
+            futures[pool.submit(lookup, title=entry.title, imdb_id=entry.imdb_id, year=entry.year)] = key
+        fetched = {}
+        for future in as_completed(futures):
+            try:
+                fetched[futures[future]] = future.result()
+            except Exception as e:
+                fetched[futures[future]] = e
+
+    return _add_and_report(dm, user_id, entries, resolved, pending, fetched)
+
+
+async def import_movies_async(dm, user_id: int, entries: list[ImportEntry], lookup,
+                              concurrency: int = DEFAULT_WORKERS) -> list[dict]:
+    """import_movies for async views: `lookup` is a coroutine function and
+    at most `concurrency` lookups wait on OMDb at a time, all on the
+    calling event loop instead of a thread each."""
+    resolved, pending = _match_local(dm, entries)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(entry):
+        async with semaphore:
+            return await lookup(title=entry.title, imdb_id=entry.imdb_id, year=entry.year)
+
+    keys = list(pending)
+    answers = await asyncio.gather(*(fetch(entries[pending[key][0]]) for key in keys), return_exceptions=True)
+    return _add_and_report(dm, user_id, entries, resolved, pending, dict(zip(keys, answers)))
+
+
+def _match_local(dm, entries: list[ImportEntry]) -> tuple[dict, dict]:
+    """({entry index: Movie} for entries found in the movie table,
+    {lookup key: entry indexes sharing that lookup} for the rest)."""
+    local_by_id = dm.get_movies_by_imdb_ids(e.imdb_id for e in entries if e.imdb_id)
+    local_by_title = dm.get_movies_by_titles(e.title for e in entries if e.title and not e.imdb_id)
+
+    resolved = {}
+    pending = {}
+    for i, entry in enumerate(entries):
+        if entry.imdb_id:
+            movie = local_by_id.get(entry.imdb_id)
+            key = ("i", entry.imdb_id)
+        else:
+            movie = local_by_title.get(" ".join(entry.title.split()).lower())
+            if movie and entry.year and movie.year != entry.year:
+                movie = None
+            key = ("t", " ".join(entry.title.split()).casefold(), entry.year)
+        if movie:
+            resolved[i] = movie
+        else:
+            pending.setdefault(key, []).append(i)
+    return resolved, pending
+
+
+def _add_and_report(dm, user_id: int, entries: list[ImportEntry], resolved: dict, pending: dict,
+                    fetched: dict) -> list[dict]:
+    """Insert the matched and fetched movies; `fetched` maps each pending
+    key to OMDb data, None or the exception its lookup raised."""
+    errors = {}     # entry index -> error message
+    by_imdb = {m.imdb_id: m for m in resolved.values()}
+    for key, indexes in pending.items():
+        data = fetched[key]
+        if isinstance(data, Exception):
+            for i in indexes:
+                errors[i] = str(data)
+            continue
+
+        movie = None
+        if data and data.get("imdbID"):
+            # A malformed Runtime or imdbRating fails this entry, not the import
+            try:
+                movie = Movie(**parse_movie(data))
+            except ValueError as e:
+                for i in indexes:
+                    errors[i] = f"Unreadable OMDb data: {e}"
+                continue
+            movie = by_imdb.setdefault(movie.imdb_id, movie)
+        for i in indexes:
+            resolved[i] = movie
+
+    statuses = dm.bulk_add_movies(user_id, list(by_imdb.values()))
+
+    results = []
+    reported = set()
+    for i, entry in enumerate(entries):
+        result = {"line": entry.line, "input": entry.text, "title": None, "imdb_id": None}
+        movie = resolved.get(i)
+        if i in errors:
+            result["status"] = "error"
+            result["error"] = errors[i]
+        elif movie is None:
+            result["status"] = "not_found"
+        else:
+            result["title"] = movie.title
+            result["imdb_id"] = movie.imdb_id
+            if movie.imdb_id in reported:
+                result["status"] = "duplicate"
+            else:
+                result["status"] = statuses.get(movie.imdb_id, "duplicate")
+                reported.add(movie.imdb_id)
+        results.append(result)
+
+    return results
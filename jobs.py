@@ -0,0 +1,199 @@
+"""Background jobs stored in the job table.
+
+Any process can enqueue. Workers (threads in the web process, or a
+separate `run-jobs` process) claim a job with a conditional UPDATE, so
+each job runs once no matter how many workers poll the table. A claim is
+a lease: if a worker dies mid-job, the job becomes claimable again once
+its run_after passes."""
+import json
+import threading
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Job
+
+QUEUED, RUNNING, FAILED = "queued", "running", "failed"
+
+
+class RetryLater(Exception):
+    """Raised by a handler to run the job again after `delay` seconds
+    without counting it as a failed attempt (e.g. rate limited)."""
+
+    def __init__(self, delay: float):
+        super().__init__(f"retry in {delay:.1f}s")
+        self.delay = delay
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads of one process.
+    With several worker processes, give each a share of the quota."""
+
+    def __init__(self, per_day: int, burst: int = 10):
+        self.rate = per_day / 86400
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token. Returns 0 on success, else seconds until one is free."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate if self.rate else float("inf")
+
+
+class JobQueue:
+    """Registry of job handlers plus the enqueue / claim / worker loop.
+
+    handler(payload) runs inside an app context. On an exception the job is
+    retried with exponential backoff up to max_attempts, then marked
+    failed and on_failure(payload, error) is called. Periodic jobs
+    (registered with every=seconds) are rescheduled instead of removed."""
+
+    def __init__(self, max_attempts: int = 5, backoff: float = 30, lease: float = 300):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self._handlers = {}
+        self._stop = threading.Event()
+        self._schedule_lock = threading.Lock()
+        self._scheduled = False
+
+    def handler(self, kind: str, every: int | None = None, on_failure=None):
+        def decorator(fn):
+            self._handlers[kind] = (fn, every, on_failure)
+            return fn
+        return decorator
+
+    # ── Producer side ──────────────────────────────────
+
+    def enqueue(self, kind: str, payload: dict | None = None, delay: float = 0) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind=kind, payload=json.dumps(payload or {}), status=QUEUED, run_after=time.time() + delay)
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def ensure_periodic(self) -> None:
+        """Insert one row per periodic job kind unless it already exists."""
+        with self._schedule_lock:
+            if self._scheduled:
+                return
+            self._insert_periodic()
+            self._scheduled = True
+
+    def _insert_periodic(self) -> None:
+        existing = {kind for (kind,) in db.session.query(Job.kind).distinct()}
+        for kind, (_, every, _) in self._handlers.items():
+            if every and kind not in existing:
+                db.session.add(Job(kind=kind, payload="{}", status=QUEUED, run_after=time.time()))
+        db.session.commit()
+
+    def counts(self) -> dict:
+        """Number of jobs per status."""
+        return dict(db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all())
+
+    # ── Worker side ────────────────────────────────────
+
+    def claim(self, kinds=None) -> Job | None:
+        """Take the next due job (of one of `kinds`, if given), or None. Safe
+        across threads and processes: only the worker whose UPDATE matches
+        the row gets it."""
+        now = time.time()
+        due = (Job.status.in_((QUEUED, RUNNING)), Job.run_after <= now)
+        if kinds is not None:
+            due += (Job.kind.in_(kinds),)
+        for (job_id,) in db.session.query(Job.id).filter(*due).order_by(Job.run_after).limit(5):
+            claimed = (
+                Job.query.filter(Job.id == job_id, *due)
+                .update({Job.status: RUNNING, Job.attempts: Job.attempts + 1,
+                         Job.run_after: now + self.lease}, synchronize_session=False)
+            )
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+        return None
+
+    def run_one(self, logger, kinds=None) -> bool:
+        """Claim and run one job. Returns False when nothing was due."""
+        job = self.claim(kinds)
+        if job is None:
+            return False
+
+        fn, every, on_failure = self._handlers.get(job.kind, (None, None, None))
+        payload = json.loads(job.payload)
+        values = {}
+        try:
+            if fn is None:
+                raise ValueError(f"No handler for job kind {job.kind!r}")
+            fn(payload)
+        except RetryLater as e:
+            db.session.rollback()
+            values = {Job.status: QUEUED, Job.attempts: Job.attempts - 1, Job.run_after: time.time() + e.delay}
+        except Exception as e:
+            db.session.rollback()
+            logger.warning("Job failed id=%s kind=%s attempt=%s", job.id, job.kind, job.attempts, exc_info=True)
+            if job.attempts < self.max_attempts:
+                delay = self.backoff * 2 ** (job.attempts - 1)
+                values = {Job.status: QUEUED, Job.run_after: time.time() + delay, Job.last_error: str(e)[:500]}
+            elif every:
+                values = {Job.status: QUEUED, Job.attempts: 0, Job.run_after: time.time() + every,
+                          Job.last_error: str(e)[:500]}
+            else:
+                values = {Job.status: FAILED, Job.last_error: str(e)[:500]}
+                if on_failure:
+                    try:
+                        on_failure(payload, e)
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception("Job on_failure hook failed id=%s kind=%s", job.id, job.kind)
+        else:
+            logger.info("Job done id=%s kind=%s", job.id, job.kind)
+            if every:
+                values = {Job.status: QUEUED, Job.attempts: 0, Job.run_after: time.time() + every,
+                          Job.last_error: None}
+
+        if values:
+            Job.query.filter_by(id=job.id).update(values, synchronize_session=False)
+        else:
+            Job.query.filter_by(id=job.id).delete(synchronize_session=False)
+        db.session.commit()
+        return True
+
+    def work(self, app, poll_interval: float = 2.0, kinds=None) -> None:
+        """Worker loop: run due jobs, sleep when idle, until stop().
+        With `kinds`, only jobs of those kinds run and periodic jobs are
+        left for other workers to schedule."""
+        while not self._stop.is_set():
+            with app.app_context():
+                try:
+                    if kinds is None:
+                        self.ensure_periodic()
+                    busy = self.run_one(app.logger, kinds)
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    app.logger.exception("DB error in job worker")
+                    busy = False
+                    self._stop.wait(10 * poll_interval)
+            if not busy:
+                self._stop.wait(poll_interval)
+
+    def start(self, app, workers: int, poll_interval: float = 2.0, kinds=None) -> list:
+        threads = [
+            threading.Thread(target=self.work, args=(app, poll_interval, kinds), daemon=True,
+                             name=f"job-worker-{n}")
+            for n in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def stop(self) -> None:
+        self._stop.set()
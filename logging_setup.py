@@ -0,0 +1,214 @@
+"""Non-blocking application logging.
+
+Records go through a QueueHandler, so request threads only put them on an
+in-memory queue; a QueueListener thread does the formatting and the file
+writes. Output is one JSON object per line (or the old text layout) with
+the request id, and every request ends with a "Request completed" record
+that carries its duration.
+
+File modes (LOG_ROTATION):
+  size      one file rotated by size - safe for a single process only
+  pid       one size-rotated file per worker process (moviehub-<pid>.log)
+  external  WatchedFileHandler; rotate with logrotate, safe for any number
+            of processes
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s"
+
+# Endpoints whose INFO records are sampled by default (see LOG_SAMPLE_RATE)
+HOT_ENDPOINTS = ("main.toggle_watched", "main.toggle_want_to_watch", "main.rate_movie")
+
+# Accepted incoming X-Request-ID values; anything else gets a fresh id
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# LogRecord attributes that are not user-supplied extras
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+# Apps given a logger so far, per import name (see _app_logger)
+_app_counts = {}
+_app_counts_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request id. Handler filters run in
+    the calling thread, before the record is queued, while the request
+    context still exists."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = g.get("request_id") if has_request_context() else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of the INFO records logged while serving the
+    given endpoints. Warnings and errors are never dropped."""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.INFO or not self.rates or not has_request_context():
+            return True
+        rate = self.rates.get(request.endpoint)
+        return rate is None or random.random() < rate
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback here, but leave the final
+        # formatting (JSON or text) to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _file_handler(path: str, rotation: str, max_bytes: int, backup_count: int) -> logging.Handler:
+    if rotation == "external":
+        return WatchedFileHandler(path, encoding="utf-8")
+    if rotation == "pid":
+        root, ext = os.path.splitext(path)
+        path = f"{root}-{os.getpid()}{ext}"
+    elif rotation != "size":
+        raise ValueError(f"Unknown LOG_ROTATION: {rotation!r}")
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+
+
+def _app_logger(app) -> logging.Logger:
+    """A logger of the app's own. Flask names app.logger after the import
+    name, so every app built by one factory would share it and its
+    handlers; the second and later apps log as "<name>#<n>" instead,
+    outside that logger's hierarchy."""
+    with _app_counts_lock:
+        count = _app_counts[app.name] = _app_counts.get(app.name, 0) + 1
+    return logging.getLogger(app.name if count == 1 else f"{app.name}#{count}")
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    if listener._thread is not None:  # stop() is not idempotent
+        listener.stop()
+
+
+def parse_sample_rates(spec: str | None, default_rate: float) -> dict:
+    """"endpoint=rate,..." from LOG_SAMPLE; HOT_ENDPOINTS get default_rate."""
+    rates = {endpoint: default_rate for endpoint in HOT_ENDPOINTS} if default_rate < 1 else {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            endpoint, rate = item.split("=", 1)
+            rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(
+    app,
+    path: str | None,
+    fmt: str = "json",
+    rotation: str = "size",
+    max_bytes: int = 1_000_000,
+    backup_count: int = 3,
+    sample_rates: dict | None = None,
+    log_requests: bool = True,
+    console: bool = True,
+    level: int = logging.INFO,
+) -> QueueListener:
+    """Route app.logger through a queue to a file handler (if `path` is
+    set) and the console, and install the request id / request-completed
+    hooks. Returns the started listener.
+
+    Each app gets its own logger (see _app_logger), so apps in one process
+    do not replace each other's handlers; configuring the same app again
+    replaces its queue handler instead of logging everything twice."""
+    if "logger" not in app.extensions:
+        app.extensions["logger"] = app.logger = _app_logger(app)
+    handlers = []
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        file_handler = _file_handler(path, rotation, max_bytes, backup_count)
+        file_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+        handlers.append(file_handler)
+    # Flask's own stderr handler would write from the request thread,
+    # with or without the console handler below
+    app.logger.removeHandler(default_handler)
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(stream_handler)
+
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)  # flush what is still queued
+
+    for old in [h for h in app.logger.handlers if isinstance(h, _QueueHandler)]:
+        app.logger.removeHandler(old)
+        _stop_listener(old.listener)
+
+    queue_handler = _QueueHandler(records)
+    queue_handler.listener = listener
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+    app.logger.setLevel(level)
+    app.logger.addHandler(queue_handler)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get("X-Request-ID", "")
+        g.request_id = incoming if REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        if "request_id" not in g:
+            return response
+        response.headers["X-Request-ID"] = g.request_id
+        if log_requests:
+            app.logger.info(
+                "Request completed",
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "endpoint": request.endpoint,
+                    "status": response.status_code,
+                    "duration_ms": round((time.perf_counter() - g.request_started) * 1000, 2),
+                },
+            )
+        return response
+
+    return listener
@@ -0,0 +1,187 @@
+"""In-process metrics with Prometheus text exposition.
+
+Metrics are per process: with several worker processes each one serves
+its own /metrics and the scraper sums them (use one target per worker)."""
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Request latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Queries per request
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+MAX_LOGGED_STATEMENTS = 100
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+# ── Metric types ───────────────────────────────────────
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for values, value in items:
+            yield self.name, _labels(self.labels, values), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}   # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        with self._lock:
+            state = self._values.setdefault(label_values, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for values, state in items:
+            for bound, count in zip(self.buckets, state):
+                yield f"{self.name}_bucket", _labels(self.labels + ("le",), values + (bound,)), count
+            yield f"{self.name}_bucket", _labels(self.labels + ("le",), values + ("+Inf",)), state[-2]
+            yield f"{self.name}_count", _labels(self.labels, values), state[-2]
+            yield f"{self.name}_sum", _labels(self.labels, values), state[-1]
+
+
+class CallbackMetric:
+    """Values read at scrape time from fn() -> {label values tuple: value}."""
+
+    def __init__(self, name: str, help: str, fn, labels=(), kind: str = "gauge"):
+        self.name, self.help, self.labels, self.kind = name, help, tuple(labels), kind
+        self.fn = fn
+
+    def samples(self):
+        for values, value in self.fn().items():
+            yield self.name, _labels(self.labels, values), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def callback(self, *args, **kwargs) -> CallbackMetric:
+        return self.register(CallbackMetric(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# ── Request / SQL instrumentation ──────────────────────
+
+class RequestMetrics:
+    """Times every request and counts the SQL it issues.
+
+    With slow_ms > 0, requests slower than that are logged together with
+    their SQL statements (collected only while slow logging is on)."""
+
+    def __init__(self, registry: Registry, logger, slow_ms: int = 0):
+        self.logger = logger
+        self.slow_ms = slow_ms
+        self.requests = registry.histogram(
+            "moviehub_request_duration_seconds", "Request latency by route.", ("method", "route", "status"))
+        self.request_queries = registry.histogram(
+            "moviehub_request_queries", "SQL statements per request.", ("route",), buckets=QUERY_BUCKETS)
+        self.queries = registry.counter("moviehub_db_queries_total", "SQL statements executed.")
+        self.query_time = registry.histogram("moviehub_db_query_duration_seconds", "SQL statement latency.")
+
+    def init_app(self, app, engine) -> None:
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    @staticmethod
+    def _route() -> str:
+        return request.url_rule.rule if request.url_rule else "unmatched"
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.sql_statements = [] if self.slow_ms else None
+
+    def _after_request(self, response):
+        start = g.get("metrics_start")
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = self._route()
+        self.requests.observe(elapsed, request.method, route, response.status_code)
+        self.request_queries.observe(g.sql_count, route)
+
+        if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+            statements = "".join(f"\n  {ms:.1f}ms {sql}" for ms, sql in g.sql_statements)
+            self.logger.warning(
+                "Slow request method=%s path=%s status=%s ms=%.1f queries=%s sql_ms=%.1f%s",
+                request.method, request.full_path, response.status_code, elapsed * 1000,
+                g.sql_count, g.sql_time * 1000, statements,
+            )
+        return response
+
+    # The start time lives on the statement's execution context, so a
+    # statement that raises (no after_cursor_execute) leaves nothing behind
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.moviehub_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "moviehub_query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        self.queries.inc()
+        self.query_time.observe(elapsed)
+        if has_request_context() and "sql_count" in g:
+            g.sql_count += 1
+            g.sql_time += elapsed
+            if g.sql_statements is not None and len(g.sql_statements) < MAX_LOGGED_STATEMENTS:
+                g.sql_statements.append((elapsed * 1000, " ".join(statement.split())))
@@ -0,0 +1,316 @@
+"""Versioned schema migrations.
+
+db.create_all() only creates missing tables, so indexes and columns added
+to existing tables never reach a database that is already in use. Each
+migration below upgrades such a database in place; the applied versions
+are recorded in the schema_migrations table.
+
+Migrations must be idempotent (IF NOT EXISTS, column checks) because a
+fresh database gets the full schema from create_all() first and then
+runs every migration once. Never edit a released migration - append one.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+import stats
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def _create_indexes(conn, statements) -> None:
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+# ── Migrations ─────────────────────────────────────────
+
+def m001_collection_indexes(conn):
+    """Sort / filter indexes for collection pages."""
+    _create_indexes(conn, [
+        'CREATE INDEX IF NOT EXISTS ix_movie_title ON movie (title)',
+        'CREATE INDEX IF NOT EXISTS ix_movie_year ON movie (year)',
+        'CREATE INDEX IF NOT EXISTS ix_movie_imdb_rating ON movie (imdb_rating)',
+        'CREATE INDEX IF NOT EXISTS ix_user_movie_user_watched ON user_movie (user_id, watched, id)',
+        'CREATE INDEX IF NOT EXISTS ix_user_movie_user_want ON user_movie (user_id, want_to_watch, id)',
+        'CREATE INDEX IF NOT EXISTS ix_user_movie_user_rating ON user_movie (user_id, user_rating, id)',
+    ])
+
+
+def m002_lookup_indexes(conn):
+    """User name lookups, orphan checks by movie_id, local title lookups."""
+    duplicates = conn.execute(text(
+        'SELECT name FROM "user" GROUP BY name HAVING COUNT(*) > 1'
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"Duplicate user names must be resolved before upgrading: {duplicates}")
+
+    _create_indexes(conn, [
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_user_name ON "user" (name)',
+        'CREATE INDEX IF NOT EXISTS ix_user_movie_movie_id ON user_movie (movie_id)',
+        'CREATE INDEX IF NOT EXISTS ix_movie_title_lower ON movie (lower(title))',
+    ])
+
+
+def m003_movie_search(conn):
+    """FTS5 index over movie text columns, kept in sync by triggers.
+    SQLite only; other backends search with ILIKE instead."""
+    if conn.dialect.name != "sqlite":
+        return
+
+    columns = "title, plot, actors, director, genre"
+    new_values = "new.title, new.plot, new.actors, new.director, new.genre"
+    old_values = "old.title, old.plot, old.actors, old.director, old.genre"
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5({columns},"
+        " content='movie', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS movie_fts_ai AFTER INSERT ON movie BEGIN"
+        f" INSERT INTO movie_fts (rowid, {columns}) VALUES (new.id, {new_values});"
+        " END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS movie_fts_ad AFTER DELETE ON movie BEGIN"
+        f" INSERT INTO movie_fts (movie_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+        " END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS movie_fts_au AFTER UPDATE OF {columns} ON movie BEGIN"
+        f" INSERT INTO movie_fts (movie_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+        f" INSERT INTO movie_fts (rowid, {columns}) VALUES (new.id, {new_values});"
+        " END"
+    ))
+    conn.execute(text("INSERT INTO movie_fts (movie_fts) VALUES ('rebuild')"))
+
+
+def m004_movie_enrichment(conn):
+    """Placeholder status and refresh timestamp on movies.
+    The job table itself is new, so create_all() creates it."""
+    if not _has_column(conn, "movie", "status"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN status VARCHAR(20)"))
+    if not _has_column(conn, "movie", "refreshed_at"):
+        conn.execute(text("ALTER TABLE movie ADD COLUMN refreshed_at TIMESTAMP"))
+    _create_indexes(conn, [
+        'CREATE INDEX IF NOT EXISTS ix_movie_refreshed_at ON movie (refreshed_at)',
+        'CREATE INDEX IF NOT EXISTS ix_job_status_run_after ON job (status, run_after)',
+    ])
+
+
+def m005_recommendation_triggers(conn):
+    """Mark a user's recommendations stale whenever their collection
+    changes. The recommendation tables are new, so create_all() creates
+    them. SQLite only; other backends mark users from DataManager's
+    change hook instead."""
+    if conn.dialect.name != "sqlite":
+        return
+
+    mark = "UPDATE recommendation_state SET stale = 1 WHERE user_id = {}.user_id AND stale = 0;"
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS recommendation_stale_ai AFTER INSERT ON user_movie BEGIN "
+        + mark.format("new") + " END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS recommendation_stale_ad AFTER DELETE ON user_movie BEGIN "
+        + mark.format("old") + " END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS recommendation_stale_au"
+        " AFTER UPDATE OF movie_id, watched, want_to_watch, user_rating ON user_movie BEGIN "
+        + mark.format("new") + " END"
+    ))
+
+
+# Contribution of one collection link {l} on movie {m} to each summary
+# column; the m006 triggers add it (sign +1) or take it back (sign -1)
+_LINK_TOTALS = {
+    "total": "1",
+    "watched": "{l}.watched",
+    "rated": "{l}.user_rating IS NOT NULL",
+    "rating_sum": "coalesce({l}.user_rating, 0)",
+}
+_USER_TOTALS = {
+    **_LINK_TOTALS,
+    "want": "{l}.want_to_watch",
+    "runtime_watched": "CASE WHEN {l}.watched THEN coalesce({m}.runtime, 0) ELSE 0 END",
+    "compared": "{l}.user_rating IS NOT NULL AND {m}.imdb_rating IS NOT NULL",
+    "compared_rating": "CASE WHEN {m}.imdb_rating IS NOT NULL THEN coalesce({l}.user_rating, 0) ELSE 0 END",
+    "compared_imdb": "CASE WHEN {l}.user_rating IS NOT NULL THEN coalesce({m}.imdb_rating, 0) ELSE 0 END",
+}
+
+
+def _stats_upsert(table, keys: dict, totals: dict, source: str, sign: int, link: str, movie: str = "m") -> str:
+    """INSERT ... SELECT ... ON CONFLICT adding sign * totals to the rows
+    of `table` picked by `keys` (column -> expression)."""
+    columns = list(keys) + list(totals)
+    values = list(keys.values()) + [f"{sign} * ({expr})" for expr in totals.values()]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(values)} {source}"
+        f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+        + ", ".join(f"{c} = {c} + excluded.{c}" for c in totals)
+        + ";"
+    )
+    return sql.format(l=link, m=movie)
+
+
+def _link_stats(link: str, sign: int) -> str:
+    """Statements applying one user_movie row ({link} = new / old) to all summaries."""
+    return " ".join([
+        _stats_upsert("user_stats", {"user_id": "{l}.user_id"}, _USER_TOTALS,
+                      "FROM movie m WHERE m.id = {l}.movie_id", sign, link),
+        _stats_upsert("user_decade_stats", {"user_id": "{l}.user_id", "decade": "m.year / 10 * 10"}, _LINK_TOTALS,
+                      "FROM movie m WHERE m.id = {l}.movie_id AND m.year > 0", sign, link),
+        _stats_upsert("user_genre_stats", {"user_id": "{l}.user_id", "genre_id": "g.genre_id"}, _LINK_TOTALS,
+                      "FROM movie_genre g WHERE g.movie_id = {l}.movie_id", sign, link),
+        _stats_upsert("user_country_stats", {"user_id": "{l}.user_id", "country_id": "c.country_id"}, _LINK_TOTALS,
+                      "FROM movie_country c WHERE c.movie_id = {l}.movie_id", sign, link),
+    ])
+
+
+def _movie_stats(movie: str, sign: int) -> str:
+    """Statements applying a movie's year / runtime / IMDb rating ({movie}
+    = new / old) to the summaries of everyone who owns it."""
+    return " ".join([
+        _stats_upsert("user_stats", {"user_id": "l.user_id"}, _USER_TOTALS,
+                      "FROM user_movie l WHERE l.movie_id = {m}.id", sign, "l", movie),
+        _stats_upsert("user_decade_stats", {"user_id": "l.user_id", "decade": "{m}.year / 10 * 10"}, _LINK_TOTALS,
+                      "FROM user_movie l WHERE l.movie_id = {m}.id AND {m}.year > 0", sign, "l", movie),
+    ])
+
+
+def _prune_stats(tables, users: str) -> str:
+    """Statements dropping the rows of `tables` whose total fell to 0 for
+    the users picked by `users` (an SQL expression), so the summaries hold
+    exactly the rows rebuild() would write."""
+    return " ".join(f"DELETE FROM {table} WHERE user_id IN ({users}) AND total = 0;" for table in tables)
+
+
+_SUMMARY_TABLES = ("user_stats", "user_decade_stats", "user_genre_stats", "user_country_stats")
+
+
+def _stats_triggers() -> dict:
+    """name -> (event, body) of the SQLite triggers keeping the summaries current."""
+    owners = "SELECT user_id FROM user_movie WHERE movie_id = {}"
+    triggers = {
+        "user_stats_ai": ("AFTER INSERT ON user_movie", _link_stats("new", 1)),
+        "user_stats_ad": (
+            "AFTER DELETE ON user_movie",
+            _link_stats("old", -1) + " " + _prune_stats(_SUMMARY_TABLES, "old.user_id"),
+        ),
+        "user_stats_au": (
+            "AFTER UPDATE OF user_id, movie_id, watched, want_to_watch, user_rating ON user_movie",
+            _link_stats("old", -1) + " " + _link_stats("new", 1) + " "
+            + _prune_stats(_SUMMARY_TABLES, "old.user_id"),
+        ),
+        "user_stats_movie_au": (
+            "AFTER UPDATE OF year, runtime, imdb_rating ON movie",
+            _movie_stats("old", -1) + " " + _movie_stats("new", 1) + " "
+            + _prune_stats(["user_decade_stats"], owners.format("new.id")),
+        ),
+    }
+    for table, column in (("genre", "genre_id"), ("country", "country_id")):
+        for event, row, sign in (("INSERT", "new", 1), ("DELETE", "old", -1)):
+            body = _stats_upsert(f"user_{table}_stats", {"user_id": "l.user_id", column: f"{row}.{column}"},
+                                 _LINK_TOTALS, f"FROM user_movie l WHERE l.movie_id = {row}.movie_id", sign, "l")
+            if sign < 0:
+                body += " " + _prune_stats([f"user_{table}_stats"], owners.format(f"{row}.movie_id"))
+            triggers[f"user_{table}_stats_a{event[0].lower()}"] = (f"AFTER {event} ON movie_{table}", body)
+    return triggers
+
+
+def m006_collection_stats(conn):
+    """Per-user collection statistics (stats.py). The tables are new, so
+    create_all() creates them; this splits existing movies' genres and
+    countries, fills the summaries and, on SQLite, installs the triggers
+    that keep them current. Other backends rebuild from DataManager's
+    change hook instead."""
+    stats.index_movies(conn)
+    stats.rebuild(conn)
+    if conn.dialect.name != "sqlite":
+        return
+    for name, (when, body) in _stats_triggers().items():
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {when} BEGIN {body} END"))
+
+
+def m007_collection_timestamps(conn):
+    """created_at / updated_at on collection links. Existing links get the
+    upgrade time; the change feed table is new, so create_all() creates it."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for column in ("created_at", "updated_at"):
+        if not _has_column(conn, "user_movie", column):
+            conn.execute(text(f"ALTER TABLE user_movie ADD COLUMN {column} TIMESTAMP"))
+        conn.execute(text(f"UPDATE user_movie SET {column} = :now WHERE {column} IS NULL"), {"now": now})
+
+
+
+def m008_prune_empty_stats(conn):
+    """The first m006 triggers left breakdown rows behind once their total
+    fell to 0. Drop those rows and, on SQLite, reinstall the triggers that
+    now delete them as they empty."""
+    for table in _SUMMARY_TABLES:
+        conn.execute(text(f"DELETE FROM {table} WHERE total = 0"))
+    if conn.dialect.name != "sqlite":
+        return
+    for name, (when, body) in _stats_triggers().items():
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(f"CREATE TRIGGER {name} {when} BEGIN {body} END"))
+
+MIGRATIONS = [
+    (1, "collection sort and filter indexes", m001_collection_indexes),
+    (2, "lookup indexes", m002_lookup_indexes),
+    (3, "movie full-text search", m003_movie_search),
+    (4, "movie enrichment status and refresh time", m004_movie_enrichment),
+    (5, "recommendation staleness triggers", m005_recommendation_triggers),
+    (6, "collection statistics", m006_collection_stats),
+    (7, "collection timestamps", m007_collection_timestamps),
+    (8, "prune empty statistics rows", m008_prune_empty_stats),
+]
+
+
+# ── Runner ─────────────────────────────────────────────
+
+def _ensure_version_table(conn) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " description VARCHAR(200) NOT NULL,"
+        " applied_at VARCHAR(40) NOT NULL)"
+    ))
+
+
+def applied_versions(engine) -> set:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def current_version(engine) -> int:
+    return max(applied_versions(engine), default=0)
+
+
+def pending_migrations(engine) -> list:
+    done = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def upgrade(engine) -> list:
+    """Apply pending migrations in order, one transaction each.
+    Returns the versions that were applied."""
+    applied = []
+    for version, description, migrate in pending_migrations(engine):
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at)"
+                     " VALUES (:version, :description, :applied_at)"),
+                {
+                    "version": version,
+                    "description": description,
+                    "applied_at": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+        applied.append(version)
+    return applied
@@ -1,14 +1,25 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
 
+def utcnow() -> datetime:
+    """Naive UTC timestamp, the form DateTime columns are stored in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class User(db.Model):
     """Store user-related data."""
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_user_name', 'name', unique=True),
+    )
+
 
 class Movie(db.Model):
     """Store movie-related data."""
@@ -26,6 +37,19 @@ class Movie(db.Model):
     poster_url = db.Column(db.String(250), nullable=True)
     imdb_url = db.Column(db.String(250), nullable=False)
     imdb_id = db.Column(db.String(20), nullable=False, unique=True)
+    # NULL once OMDb data is in place; 'pending' / 'not_found' for
+    # placeholders added before the background lookup finished
+    status = db.Column(db.String(20), nullable=True)
+    # Last OMDb metadata fetch; the refresh job picks the oldest first
+    refreshed_at = db.Column(db.DateTime, nullable=True, default=utcnow)
+
+    # Sort / filter columns for collection pages
+    __table_args__ = (
+        db.Index('ix_movie_title', 'title'),
+        db.Index('ix_movie_year', 'year'),
+        db.Index('ix_movie_imdb_rating', 'imdb_rating'),
+        db.Index('ix_movie_refreshed_at', 'refreshed_at'),
+    )
 
 class UserMovie(db.Model):
     """Junction table: one row per (user, movie) pair.
@@ -38,6 +62,9 @@ class UserMovie(db.Model):
     watched       = db.Column(db.Boolean, default=False, nullable=False)
     want_to_watch = db.Column(db.Boolean, default=False, nullable=False)
     user_rating   = db.Column(db.Float, nullable=True)   # 0.0–10.0, user's own rating
+    # Nullable only because migration 7 adds them to existing tables
+    created_at    = db.Column(db.DateTime, nullable=True, default=utcnow)
+    updated_at    = db.Column(db.DateTime, nullable=True, default=utcnow, onupdate=utcnow)
 
     user = db.relationship('User', backref=db.backref('collection', cascade='all, delete-orphan'))
     movie = db.relationship('Movie', backref=db.backref('owners'))
@@ -45,4 +72,210 @@ class UserMovie(db.Model):
     # Prevent same movie added twice per user
     __table_args__ = (
         db.UniqueConstraint('user_id', 'movie_id', name='uq_user_movie'),
-    )
\ No newline at end of file
+        # Status filters and rating sort within one user's collection
+        db.Index('ix_user_movie_user_watched', 'user_id', 'watched', 'id'),
+        db.Index('ix_user_movie_user_want', 'user_id', 'want_to_watch', 'id'),
+        db.Index('ix_user_movie_user_rating', 'user_id', 'user_rating', 'id'),
+        # Orphan checks look up by movie_id alone
+        db.Index('ix_user_movie_movie_id', 'movie_id'),
+    )
+
+
+class Job(db.Model):
+    """Background job, see jobs.py.
+    run_after doubles as the lease expiry while a job is running."""
+    __tablename__ = 'job'
+
+    id         = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind       = db.Column(db.String(50), nullable=False)
+    payload    = db.Column(db.Text, nullable=False, default='{}')   # JSON
+    status     = db.Column(db.String(10), nullable=False, default='queued')  # queued | running | failed
+    attempts   = db.Column(db.Integer, nullable=False, default=0)
+    run_after  = db.Column(db.Float, nullable=False)                # epoch seconds
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+
+class Change(db.Model):
+    """Change feed behind GET /api/v1/changes: one row per collection item
+    written by DataManager, in commit order. op is 'upsert' or 'delete'
+    (a tombstone). Rows superseded by a later one for the same item are
+    compacted away (DataManager.compact_changes)."""
+    __tablename__ = 'collection_change'
+
+    seq        = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # No foreign keys: tombstones outlive the user and movie they describe
+    user_id    = db.Column(db.Integer, nullable=False)
+    movie_id   = db.Column(db.Integer, nullable=False)
+    op         = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = (
+        # Per-user feeds, and compaction by item
+        db.Index('ix_collection_change_user_seq', 'user_id', 'seq'),
+        db.Index('ix_collection_change_item', 'user_id', 'movie_id', 'seq'),
+        # Never reuse a seq, even after the newest rows were compacted away
+        {'sqlite_autoincrement': True},
+    )
+
+
+class MovieSimilarity(db.Model):
+    """Nearest neighbours of a movie, rebuilt by the recommender (recommender.py)."""
+    __tablename__ = 'movie_similarity'
+
+    movie_id   = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), primary_key=True)
+    similar_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), primary_key=True)
+    score      = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        # ON DELETE CASCADE looks rows up by the second movie too
+        db.Index('ix_movie_similarity_similar_id', 'similar_id'),
+    )
+
+
+class Recommendation(db.Model):
+    """Precomputed top-N suggestions for a user, best first by rank."""
+    __tablename__ = 'recommendation'
+
+    user_id  = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    rank     = db.Column(db.Integer, primary_key=True)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), nullable=False)
+    score    = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_recommendation_movie_id', 'movie_id'),
+    )
+
+
+class RecommendationState(db.Model):
+    """Whether a user's recommendations need recomputing. Set stale by
+    triggers on user_movie (migration 5) or DataManager's change hook."""
+    __tablename__ = 'recommendation_state'
+
+    user_id     = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    stale       = db.Column(db.Boolean, nullable=False, default=True)
+    computed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_recommendation_state_stale', 'stale'),
+    )
+
+
+# ── Collection statistics (stats.py) ──────────────────
+
+class Genre(db.Model):
+    """Genre names split out of Movie.genre."""
+    __tablename__ = 'genre'
+    id   = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+
+class Country(db.Model):
+    """Country names split out of Movie.country."""
+    __tablename__ = 'country'
+    id   = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+
+class MovieGenre(db.Model):
+    __tablename__ = 'movie_genre'
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), primary_key=True)
+    genre_id = db.Column(db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True)
+
+
+class MovieCountry(db.Model):
+    __tablename__ = 'movie_country'
+    movie_id   = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), primary_key=True)
+    country_id = db.Column(db.Integer, db.ForeignKey('country.id', ondelete='CASCADE'), primary_key=True)
+
+
+class UserStats(db.Model):
+    """Running totals over a user's collection. Kept up to date by
+    triggers (migration 6) or recomputed by stats.rebuild()."""
+    __tablename__ = 'user_stats'
+
+    user_id         = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    total           = db.Column(db.Integer, nullable=False, default=0)
+    watched         = db.Column(db.Integer, nullable=False, default=0)
+    want            = db.Column(db.Integer, nullable=False, default=0)
+    rated           = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum      = db.Column(db.Float, nullable=False, default=0)
+    runtime_watched = db.Column(db.Integer, nullable=False, default=0)   # minutes
+    # Rated movies that also have an IMDb rating, for "you vs IMDb"
+    compared        = db.Column(db.Integer, nullable=False, default=0)
+    compared_rating = db.Column(db.Float, nullable=False, default=0)
+    compared_imdb   = db.Column(db.Float, nullable=False, default=0)
+
+
+class UserGenreStats(db.Model):
+    """Per-genre breakdown of a user's collection; rows are dropped once their total reaches 0."""
+    __tablename__ = 'user_genre_stats'
+
+    user_id    = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    genre_id   = db.Column(db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True)
+    total      = db.Column(db.Integer, nullable=False, default=0)
+    watched    = db.Column(db.Integer, nullable=False, default=0)
+    rated      = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0)
+
+
+class UserCountryStats(db.Model):
+    __tablename__ = 'user_country_stats'
+
+    user_id    = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    country_id = db.Column(db.Integer, db.ForeignKey('country.id', ondelete='CASCADE'), primary_key=True)
+    total      = db.Column(db.Integer, nullable=False, default=0)
+    watched    = db.Column(db.Integer, nullable=False, default=0)
+    rated      = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0)
+
+
+class UserDecadeStats(db.Model):
+    __tablename__ = 'user_decade_stats'
+
+    user_id    = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    decade     = db.Column(db.Integer, primary_key=True)
+    total      = db.Column(db.Integer, nullable=False, default=0)
+    watched    = db.Column(db.Integer, nullable=False, default=0)
+    rated      = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0)
+
+
+# ── Offline IMDb catalog (catalog.py) ──────────────────
+
+class CatalogTitle(db.Model):
+    """One title from the IMDb bulk datasets. Lets adds resolve titles and
+    IMDb ids without OMDb; plot, poster and country still come from OMDb."""
+    __tablename__ = 'catalog_title'
+
+    imdb_id     = db.Column(db.String(20), primary_key=True)
+    title_type  = db.Column(db.String(20), nullable=False)
+    title       = db.Column(db.String(500), nullable=False)
+    year        = db.Column(db.Integer, nullable=True)
+    runtime     = db.Column(db.Integer, nullable=True)
+    genre       = db.Column(db.String(100), nullable=False, default='')
+    director    = db.Column(db.String(200), nullable=False, default='')
+    actors      = db.Column(db.String(200), nullable=False, default='')
+    imdb_rating = db.Column(db.Float, nullable=True)
+    votes       = db.Column(db.Integer, nullable=True)
+    # CRC32 of the imported fields; re-imports skip rows whose checksum matches
+    checksum    = db.Column(db.Integer, nullable=False)
+
+
+class CatalogName(db.Model):
+    """Person names from name.basics, for directors and actors."""
+    __tablename__ = 'catalog_name'
+
+    nconst = db.Column(db.String(20), primary_key=True)
+    name   = db.Column(db.String(200), nullable=False)
+
+
+# Title lookups in the catalog, like ix_movie_title_lower below
+db.Index('ix_catalog_title_lower', db.func.lower(CatalogTitle.title))
+
+# Case-insensitive local title lookups (DataManager.get_movie_by_title)
+db.Index('ix_movie_title_lower', db.func.lower(Movie.title))
@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by OmdbCache.get when nothing usable is stored for a key.
+# A cached "not found" comes back as None instead.
+MISS = object()
+
+
+def title_key(title: str, year: int | None = None) -> str:
+    """Cache key for a title lookup: case- and whitespace-insensitive."""
+    key = "t:" + " ".join(title.split()).casefold()
+    return f"{key}|{year}" if year else key
+
+
+def imdb_key(imdb_id: str) -> str:
+    return "i:" + imdb_id.strip().lower()
+
+
+class OmdbCache:
+    """Two-level cache for OMDb responses.
+
+    An in-process LRU sits in front of a small SQLite file so entries
+    survive restarts and are shared between worker processes.
+    Found responses and "not found" answers have separate TTLs."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl: int = 7 * 24 * 3600,
+        negative_ttl: int = 24 * 3600,
+        max_entries: int = 1024,
+        max_disk_entries: int = 100_000,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._memory = OrderedDict()   # key -> (expires_at, data)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    # ── Storage ────────────────────────────────────────────
+
+    def _db(self) -> sqlite3.Connection:
+        # Reconnect after a fork: sqlite connections must not cross processes
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS omdb_cache ("
+                " key TEXT PRIMARY KEY,"
+                " payload TEXT,"
+                " expires_at REAL NOT NULL,"
+                " stored_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, expires_at: float, data: dict | None) -> None:
+        self._memory[key] = (expires_at, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # ── Public API ─────────────────────────────────────────
+
+    def get(self, key: str):
+        """Return the cached dict, None for a cached "not found", or MISS."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db().execute(
+                    "SELECT expires_at, payload FROM omdb_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]) if row[1] is not None else None)
+                    self._remember(key, *entry)
+
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._memory.pop(key, None)
+                self.misses += 1
+                return MISS
+
+            self._memory.move_to_end(key)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, data: dict | None) -> None:
+        """Store a response; pass None to cache a "not found" answer."""
+        now = time.time()
+        expires_at = now + (self.ttl if data is not None else self.negative_ttl)
+        payload = json.dumps(data) if data is not None else None
+
+        with self._lock:
+            self._remember(key, expires_at, data)
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO omdb_cache (key, payload, expires_at, stored_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired rows and trim the disk store to max_disk_entries."""
+        conn.execute("DELETE FROM omdb_cache WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM omdb_cache WHERE key IN ("
+            " SELECT key FROM omdb_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            conn.execute("DELETE FROM omdb_cache")
+            conn.commit()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
@@ -0,0 +1,373 @@
+import asyncio
+import functools
+import random
+import ssl
+import threading
+import time
+
+OMDB_URL = "https://www.omdbapi.com/"
+
+# Upstream statuses worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_movie(data: dict) -> dict:
+    """Map an OMDb JSON response onto Movie column values."""
+    year_str = (data.get("Year") or "").strip()
+
+    year = 0
+    if len(year_str) >= 4 and year_str[:4].isdigit():
+        year = int(year_str[:4])
+
+    runtime = 0
+    if data.get("Runtime") and data["Runtime"] != "N/A":
+        runtime = int(data["Runtime"].split()[0])
+
+    rating = 0.0
+    if data.get("imdbRating") and data["imdbRating"] != "N/A":
+        rating = float(data["imdbRating"])
+
+    imdb_id = data.get("imdbID") or ""
+    imdb_url = f"https://www.imdb.com/title/{imdb_id}/" if imdb_id else ""
+
+    return dict(
+        title=data.get("Title", ""),
+        genre=data.get("Genre", ""),
+        year=year,
+        director = data.get("Director", ""),
+        actors = data.get("Actors", ""),
+        country = data.get("Country", ""),
+        plot = data.get("Plot", ""),
+        runtime=runtime,
+        imdb_rating=rating,
+        poster_url=data.get("Poster", ""),
+        imdb_url=imdb_url,
+        imdb_id=imdb_id,
+    )
+
+
+class OmdbError(Exception):
+    """OMDb could not be reached or returned an unusable response."""
+
+
+class CircuitOpenError(OmdbError):
+    """Raised without a network call while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds. It then lets a single trial
+    call through (half-open); success closes it, failure re-opens it."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key.
+
+    The first caller of do(key, fn) runs fn; callers arriving with the same
+    key while it runs wait for it and get the same result (or exception)
+    instead of making their own upstream request. ado() does the same for
+    coroutine functions; both use one table, so threads and event loops
+    looking up the same key share a request."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key) -> tuple:
+        """(flight, leader): the key's running flight, or a new one."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, key, flight) -> None:
+        with self._lock:
+            del self._flights[key]
+        flight.done.set()
+
+    def do(self, key, fn) -> tuple:
+        """Return (fn's result, shared); shared is True for callers that
+        waited on another caller's flight."""
+        flight, leader = self._join(key)
+        if not leader:
+            flight.done.wait()
+            return flight.outcome(), True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.result, False
+
+    async def ado(self, key, fn) -> tuple:
+        """do() for a coroutine function. Waiting on another caller's flight
+        happens in a thread, so the event loop keeps running."""
+        flight, leader = self._join(key)
+        if not leader:
+            await asyncio.to_thread(flight.done.wait)
+            return flight.outcome(), True
+
+        try:
+            flight.result = await fn()
+        except asyncio.CancelledError:
+            # Waiters may be in other threads; they get an error, not the cancellation
+            flight.error = OmdbError("OMDb lookup was cancelled")
+            raise
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.result, False
+
+
+def _lookup_params(api_key: str | None, title: str | None, imdb_id: str | None, year: int | None) -> dict:
+    params = {"i": imdb_id} if imdb_id else {"t": title}
+    if year and not imdb_id:
+        params["y"] = year
+    params["apikey"] = api_key
+    return params
+
+
+class OmdbClient:
+    """OMDb HTTP client with a pooled keep-alive session, bounded retries
+    with jittered exponential backoff and a circuit breaker.
+
+    `base_url` can point at a local stub server in tests. `on_request`,
+    if given, is called as on_request(seconds, outcome) after every HTTP
+    attempt (outcome: ok, retry_status, connection_error, error) and with
+    (0, "circuit_open") for calls the breaker rejects."""
+
+    def __init__(
+        self,
+        api_key: str | None,
+        base_url: str = OMDB_URL,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 10,
+        breaker: CircuitBreaker | None = None,
+        on_request=None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.on_request = on_request or (lambda seconds, outcome: None)
+
+        # Imported here: requests adds ~60 ms to startup and most processes
+        # (CLI commands, workers serving cached data) never call OMDb
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def lookup(self, title: str | None = None, imdb_id: str | None = None, year: int | None = None) -> dict:
+        """Return the raw OMDb JSON for a title or IMDb id.
+        "Not found" is a normal response ({"Response": "False", ...});
+        transport failures raise OmdbError."""
+        return self._get(_lookup_params(self.api_key, title, imdb_id, year))
+
+    def _get(self, params: dict) -> dict:
+        import requests
+
+        if not self.breaker.allow():
+            self.on_request(0.0, "circuit_open")
+            raise CircuitOpenError("OMDb circuit breaker is open")
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Full jitter: sleep somewhere in [0, backoff * 2^(attempt-1)]
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            start = time.perf_counter()
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                if response.status_code in RETRY_STATUSES:
+                    self.on_request(time.perf_counter() - start, "retry_status")
+                    last_error = OmdbError(f"OMDb returned HTTP {response.status_code}")
+                    continue
+                response.raise_for_status()
+                data = response.json()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.on_request(time.perf_counter() - start, "connection_error")
+                last_error = OmdbError(f"OMDb request failed: {e}")
+                continue
+            except (requests.RequestException, ValueError) as e:
+                # 4xx or a malformed body will not improve on retry
+                self.on_request(time.perf_counter() - start, "error")
+                self.breaker.record_failure()
+                raise OmdbError(f"OMDb request failed: {e}") from e
+
+            self.on_request(time.perf_counter() - start, "ok")
+            self.breaker.record_success()
+            return data
+
+        self.breaker.record_failure()
+        raise last_error
+
+    def close(self) -> None:
+        self.session.close()
+
+
+@functools.cache
+def _ssl_context() -> ssl.SSLContext:
+    """TLS settings shared by every AsyncOmdbClient. Loading the CA bundle
+    takes ~50 ms of CPU, too much to repeat for each client."""
+    import certifi
+
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class AsyncOmdbClient:
+    """OmdbClient for asyncio code, on an httpx.AsyncClient: the same
+    retries, backoff, circuit breaker and on_request hook, but a slow OMDb
+    answer suspends the coroutine instead of blocking the thread.
+
+    An httpx.AsyncClient is bound to the event loop that first uses it, so
+    make one per loop (`async with AsyncOmdbClient(...) as client`) and pass
+    the long-lived OmdbClient's breaker so both see the same failures."""
+
+    def __init__(
+        self,
+        api_key: str | None,
+        base_url: str = OMDB_URL,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 10,
+        breaker: CircuitBreaker | None = None,
+        on_request=None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.on_request = on_request or (lambda seconds, outcome: None)
+
+        # Imported here: only async views use httpx
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            verify=_ssl_context(),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def lookup(self, title: str | None = None, imdb_id: str | None = None, year: int | None = None) -> dict:
+        """See OmdbClient.lookup."""
+        return await self._get(_lookup_params(self.api_key, title, imdb_id, year))
+
+    async def _get(self, params: dict) -> dict:
+        import httpx
+
+        if not self.breaker.allow():
+            self.on_request(0.0, "circuit_open")
+            raise CircuitOpenError("OMDb circuit breaker is open")
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            start = time.perf_counter()
+            try:
+                response = await self.client.get(self.base_url, params=params)
+                if response.status_code in RETRY_STATUSES:
+                    self.on_request(time.perf_counter() - start, "retry_status")
+                    last_error = OmdbError(f"OMDb returned HTTP {response.status_code}")
+                    continue
+                response.raise_for_status()
+                data = response.json()
+            except httpx.TransportError as e:
+                # Connection failures and timeouts
+                self.on_request(time.perf_counter() - start, "connection_error")
+                last_error = OmdbError(f"OMDb request failed: {e!r}")
+                continue
+            except (httpx.HTTPError, ValueError) as e:
+                self.on_request(time.perf_counter() - start, "error")
+                self.breaker.record_failure()
+                raise OmdbError(f"OMDb request failed: {e}") from e
+
+            self.on_request(time.perf_counter() - start, "ok")
+            self.breaker.record_success()
+            return data
+
+        self.breaker.record_failure()
+        raise last_error
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
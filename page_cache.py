@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session, make_response
+
+GLOBAL_SCOPE = "global"
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+# ── Backends ───────────────────────────────────────────
+
+class MemoryBackend:
+    """Per-process store. Fine for a single worker; with several worker
+    processes use SQLiteBackend so version bumps reach every worker."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._pages = OrderedDict()   # key -> (expires_at, body)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None or entry[0] <= time.time():
+                self._pages.pop(key, None)
+                return None
+            self._pages.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, body: bytes, ttl: int) -> None:
+        with self._lock:
+            self._pages[key] = (time.time() + ttl, body)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def version(self, scope: str) -> int:
+        with self._lock:
+            # Seed from the clock so versions never repeat across restarts
+            return self._versions.setdefault(scope, time.time_ns())
+
+    def bump(self, scopes) -> None:
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = max(self._versions.get(scope, 0) + 1, time.time_ns())
+
+
+class SQLiteBackend:
+    """Store shared by all worker processes on one host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _db(self) -> sqlite3.Connection:
+        # Reconnect after a fork: sqlite connections must not cross processes
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " key TEXT PRIMARY KEY, body BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS versions (scope TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT body FROM pages WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, body: bytes, ttl: int) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (key, body, expires_at) VALUES (?, ?, ?)",
+                (key, body, now + ttl),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                conn.execute("DELETE FROM pages WHERE expires_at <= ?", (now,))
+            conn.commit()
+
+    def version(self, scope: str) -> int:
+        with self._lock:
+            conn = self._db()
+            row = conn.execute("SELECT version FROM versions WHERE scope = ?", (scope,)).fetchone()
+            if row:
+                return row[0]
+            conn.execute("INSERT OR IGNORE INTO versions (scope, version) VALUES (?, ?)", (scope, time.time_ns()))
+            conn.commit()
+            return conn.execute("SELECT version FROM versions WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def bump(self, scopes) -> None:
+        with self._lock:
+            conn = self._db()
+            conn.executemany(
+                "INSERT INTO versions (scope, version) VALUES (?, ?)"
+                " ON CONFLICT (scope) DO UPDATE SET version = version + 1",
+                [(scope, time.time_ns()) for scope in scopes],
+            )
+            conn.commit()
+
+
+# ── Page cache ─────────────────────────────────────────
+
+class PageCache:
+    """Caches rendered GET pages under keys that embed a data version.
+
+    Writes bump the version of every affected scope (one per user plus a
+    global one for the dashboards), so stale entries are simply never read
+    again. Each response also carries a matching ETag; a conditional GET
+    whose If-None-Match still matches gets a 304 without rendering."""
+
+    def __init__(self, backend=None, ttl: int = 3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def invalidate(self, user_ids=()) -> None:
+        """Bump the given users' versions and the global version."""
+        if self.enabled:
+            self.backend.bump([GLOBAL_SCOPE, *(user_scope(u) for u in user_ids)])
+
+    def init_app(self, app) -> None:
+        """Register as the cache used by cached() views of this app."""
+        app.extensions["page_cache"] = self
+
+    def serve(self, view, view_args: dict, scope_for):
+        """Answer one request from the cache, rendering `view` on a miss."""
+        # Pages showing flash messages are one-off; never cache them
+        if not self.enabled or request.method != "GET" or session.get("_flashes"):
+            return view(**view_args)
+
+        scopes = scope_for(**view_args)
+        if isinstance(scopes, str):
+            scopes = (scopes,)
+        version = "-".join(str(self.backend.version(scope)) for scope in scopes)
+        key = f"{request.full_path}|{version}"
+        etag = hashlib.sha1(key.encode()).hexdigest()
+
+        if etag in request.if_none_match:
+            response = make_response("", 304)
+        else:
+            body = self.backend.get(key)
+            if body is None:
+                self.misses += 1
+                response = make_response(view(**view_args))
+                if response.status_code != 200:
+                    return response
+                self.backend.set(key, response.get_data(), self.ttl)
+            else:
+                self.hits += 1
+                response = make_response(body)
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+
+def cached(scope_for):
+    """Decorator for GET views. scope_for(**view_args) names the scope
+    whose version the page depends on, or a tuple of scopes. Uses the
+    cache registered on the current app (see PageCache.init_app), looked
+    up per request."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            return current_app.extensions["page_cache"].serve(view, view_args, scope_for)
+        return wrapper
+    return decorator
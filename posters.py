@@ -0,0 +1,150 @@
+import functools
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+# Bounding boxes (width, height) for the resized variants
+SIZES = {
+    "thumb": (160, 240),
+    "card": (320, 480),
+}
+
+IMDB_ID_RE = re.compile(r"^tt\d{7,}$")
+MAX_POSTER_BYTES = 5 * 1024 * 1024
+
+
+class PosterError(Exception):
+    """The upstream poster could not be fetched or decoded."""
+
+
+def source_key(url: str) -> str:
+    """Short stable hash of a poster URL; files of one source live under it."""
+    return hashlib.sha1(url.encode()).hexdigest()[:12]
+
+
+@functools.cache
+def _pil_image():
+    """PIL.Image, imported on first use; None when Pillow is not installed
+    (originals are then served as-is)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def http_fetcher(timeout=(3.05, 10), session=None):
+    """Default upstream fetcher: GET the poster URL and return its bytes."""
+    import requests
+
+    session = session or requests.Session()
+
+    def fetch(url: str) -> bytes:
+        try:
+            response = session.get(url, timeout=timeout, stream=True)
+            response.raise_for_status()
+            data = response.raw.read(MAX_POSTER_BYTES + 1, decode_content=True)
+        except requests.RequestException as e:
+            raise PosterError(f"Poster download failed: {e}") from e
+        if len(data) > MAX_POSTER_BYTES:
+            raise PosterError("Poster exceeds size limit")
+        return data
+
+    return fetch
+
+
+class PosterStore:
+    """Disk cache of poster images, downloaded once per movie and poster URL.
+
+    The original is kept as <root>/<imdb_id>/<source_key>/original and
+    resized variants (JPEG or WebP) are derived from it on first request.
+    When a metadata refresh changes the movie's poster URL, the new source
+    gets its own directory and the old one is removed.
+    `fetcher(url) -> bytes` is pluggable so tests can use a stub."""
+
+    def __init__(self, root: str, fetcher=None):
+        self.root = root
+        self.fetcher = fetcher  # default created on the first download
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, imdb_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(imdb_id, threading.Lock())
+
+    def _write(self, path: str, data: bytes) -> None:
+        """Write via a temp file + rename so readers never see partial files."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _source_dir(self, imdb_id: str, source_url: str) -> str:
+        if not IMDB_ID_RE.match(imdb_id):
+            raise ValueError(f"Invalid IMDb id: {imdb_id!r}")
+        return os.path.join(self.root, imdb_id, source_key(source_url))
+
+    def variant_path(self, imdb_id: str, source_url: str, size: str, webp: bool) -> tuple[str, str]:
+        """(path, mimetype) of the file that serves this request."""
+        directory = self._source_dir(imdb_id, source_url)
+        if _pil_image() is None:
+            return os.path.join(directory, "original"), "image/jpeg"
+        ext, mimetype = ("webp", "image/webp") if webp else ("jpg", "image/jpeg")
+        return os.path.join(directory, f"{size}.{ext}"), mimetype
+
+    def get(self, imdb_id: str, source_url: str, size: str, webp: bool) -> tuple[str, str]:
+        """Return (path, mimetype) for a poster variant of the image at
+        source_url, downloading and resizing it if needed."""
+        if not source_url:
+            raise PosterError(f"No poster source for {imdb_id}")
+        path, mimetype = self.variant_path(imdb_id, source_url, size, webp)
+        if os.path.exists(path):
+            return path, mimetype
+
+        with self._lock(imdb_id):
+            if os.path.exists(path):
+                return path, mimetype
+
+            original = os.path.join(os.path.dirname(path), "original")
+            if not os.path.exists(original):
+                if self.fetcher is None:
+                    self.fetcher = http_fetcher()
+                self._write(original, self.fetcher(source_url))
+                self._remove_other_sources(imdb_id, source_url)
+
+            if path != original:
+                self._write(path, self._resize(original, SIZES[size], webp))
+        return path, mimetype
+
+    def has_variant(self, imdb_id: str, source_url: str, size: str, webp: bool) -> bool:
+        return os.path.exists(self.variant_path(imdb_id, source_url, size, webp)[0])
+
+    def _remove_other_sources(self, imdb_id: str, source_url: str) -> None:
+        """Drop the files of this movie's previous poster URLs."""
+        keep = source_key(source_url)
+        movie_dir = os.path.join(self.root, imdb_id)
+        for entry in os.scandir(movie_dir):
+            if entry.name != keep:
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)  # flat layout from before source keys
+
+    def _resize(self, original: str, box: tuple, webp: bool) -> bytes:
+        try:
+            with _pil_image().open(original) as image:
+                image = image.convert("RGB")
+                image.thumbnail(box)
+                out = io.BytesIO()
+                if webp:
+                    image.save(out, "WEBP", quality=80, method=4)
+                else:
+                    image.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+        except OSError as e:
+            raise PosterError(f"Poster could not be decoded: {e}") from e
+        return out.getvalue()
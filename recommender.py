@@ -0,0 +1,268 @@
+"""Movie recommendations from the user x movie matrix in user_movie.
+
+Two stages, both run as background jobs:
+
+build_similarity()  nearest neighbours for every movie: cosine similarity
+                    of the movies' columns in the interaction matrix,
+                    blended with content similarity (genres, director,
+                    actors). Stored in movie_similarity.
+refresh_stale()     top-N suggestions for users whose collections changed,
+                    scored from the neighbours of the movies they liked.
+                    Stored in recommendation, so a page reads a handful
+                    of rows by primary key."""
+import heapq
+import math
+import time
+from collections import defaultdict
+from operator import itemgetter
+
+from sqlalchemy import insert, or_
+
+from models import db, User, Movie, UserMovie, MovieSimilarity, Recommendation, RecommendationState, utcnow
+
+# Share of the neighbour score that comes from co-ratings; the rest is content
+CF_WEIGHT = 0.7
+# Neighbour candidates kept per movie from the rating matrix
+CANDIDATES = 100
+# Director / actor tokens shared by more movies than this do not propose candidates
+MAX_TOKEN_MOVIES = 200
+# Actors taken from the (billing-ordered) actors list
+MAX_ACTORS = 4
+# Liked movies used to score a user's candidates, and the "liked" cut-off
+MAX_SEEDS = 50
+LIKE_THRESHOLD = 0.5
+# Columns per sparse block product in the similarity build
+BLOCK = 1000
+# Seconds the popularity fallback list is reused
+POPULAR_TTL = 3600
+
+INSERT_BATCH = 10_000
+
+
+def interaction(watched: bool, want_to_watch: bool, rating: float | None) -> float:
+    """How much a collection link says the user likes a movie, 0..1."""
+    if rating:
+        return rating / 10
+    if watched:
+        return 0.7
+    return 0.4 if want_to_watch else 0.2
+
+
+def content_tokens(genre: str | None, director: str | None, actors: str | None) -> set:
+    """Normalised genre / director / actor tokens of a movie."""
+    def split(value, prefix, limit=None):
+        names = [n.strip().lower() for n in (value or "").split(",")]
+        return {prefix + n for n in names[:limit] if n and n != "n/a"}
+
+    return split(genre, "g:") | split(director, "d:") | split(actors, "a:", MAX_ACTORS)
+
+
+def _cf_similarity(user_items: dict) -> dict:
+    """{movie_id: {other_id: cosine}} for movies sharing collections: cosine
+    of the columns of the sparse user x movie matrix, one block of columns
+    at a time, keeping the CANDIDATES best per movie."""
+    # Imported here: NumPy + SciPy add ~150 ms to startup and only the
+    # build_similarity job needs them
+    import numpy as np
+    from scipy import sparse
+
+    rows, cols, values = [], [], []
+    column = {}
+    for u, items in enumerate(user_items.values()):
+        for movie_id, value in items:
+            rows.append(u)
+            cols.append(column.setdefault(movie_id, len(column)))
+            values.append(value)
+    ids = np.fromiter(column, dtype=np.int64, count=len(column))
+
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(user_items), len(column)), dtype=np.float64)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    matrix = (matrix @ sparse.diags(1 / norms)).tocsc()
+
+    result = {}
+    for start in range(0, matrix.shape[1], BLOCK):
+        block = (matrix[:, start:start + BLOCK].T @ matrix).tocsr()
+        for r in range(block.shape[0]):
+            lo, hi = block.indptr[r], block.indptr[r + 1]
+            others, sims = block.indices[lo:hi], block.data[lo:hi]
+            keep = others != start + r
+            others, sims = others[keep], sims[keep]
+            if len(sims) > CANDIDATES:
+                top = np.argpartition(-sims, CANDIDATES)[:CANDIDATES]
+                others, sims = others[top], sims[top]
+            result[int(ids[start + r])] = dict(zip(ids[others].tolist(), sims.tolist()))
+    return result
+
+
+class Recommender:
+    """Builds and serves precomputed recommendations.
+
+    on_update(user_ids), if given, runs after users' suggestions were
+    rewritten (the page cache uses it like DataManager's on_change)."""
+
+    def __init__(self, neighbours: int = 30, count: int = 20, on_update=None):
+        self.neighbours = neighbours
+        self.count = count
+        self.on_update = on_update
+        self._popular = (0.0, [])
+
+    # ── Movie neighbours ───────────────────────────────
+
+    def _user_items(self) -> dict:
+        user_items = defaultdict(list)
+        links = db.session.query(
+            UserMovie.user_id, UserMovie.movie_id, UserMovie.watched, UserMovie.want_to_watch, UserMovie.user_rating,
+        ).yield_per(INSERT_BATCH)
+        for user_id, movie_id, watched, want, rating in links:
+            user_items[user_id].append((movie_id, interaction(watched, want, rating)))
+        return user_items
+
+    def _content(self, movie_ids) -> tuple[dict, dict]:
+        """Token sets per movie and idf weights per token."""
+        tokens = {}
+        for start in range(0, len(movie_ids), INSERT_BATCH):
+            chunk = movie_ids[start:start + INSERT_BATCH]
+            rows = db.session.query(Movie.id, Movie.genre, Movie.director, Movie.actors).filter(Movie.id.in_(chunk))
+            for movie_id, genre, director, actors in rows:
+                tokens[movie_id] = content_tokens(genre, director, actors)
+
+        df = defaultdict(int)
+        for movie_tokens in tokens.values():
+            for token in movie_tokens:
+                df[token] += 1
+        idf = {token: math.log(1 + len(tokens) / n) for token, n in df.items()}
+        return tokens, idf
+
+    def build_similarity(self) -> int:
+        """Recompute every movie's neighbours and mark all users stale.
+        Returns the number of movies with neighbours."""
+        user_items = self._user_items()
+        cf = _cf_similarity(user_items) if user_items else {}
+        movie_ids = sorted({movie_id for items in user_items.values() for movie_id, _ in items})
+        tokens, idf = self._content(movie_ids)
+        del user_items
+
+        # Rare director / actor tokens propose content-only candidates
+        by_token = defaultdict(list)
+        for movie_id, movie_tokens in tokens.items():
+            for token in movie_tokens:
+                if not token.startswith("g:"):
+                    by_token[token].append(movie_id)
+        norms = {m: math.sqrt(sum(idf[t] ** 2 for t in ts)) or 1.0 for m, ts in tokens.items()}
+
+        def content_score(i, j):
+            shared = tokens.get(i, set()) & tokens.get(j, set())
+            return sum(idf[t] ** 2 for t in shared) / (norms[i] * norms[j]) if shared else 0.0
+
+        written = 0
+        rows = []
+        for movie_id in movie_ids:
+            candidates = dict(cf.get(movie_id, {}))
+            for token in tokens.get(movie_id, ()):
+                movies = by_token.get(token, ())
+                if len(movies) <= MAX_TOKEN_MOVIES:
+                    for other in movies:
+                        candidates.setdefault(other, 0.0)
+            candidates.pop(movie_id, None)
+
+            scored = (
+                (other, CF_WEIGHT * co + (1 - CF_WEIGHT) * content_score(movie_id, other))
+                for other, co in candidates.items() if other in tokens
+            )
+            best = heapq.nlargest(self.neighbours, scored, key=itemgetter(1))
+            rows.extend({"movie_id": movie_id, "similar_id": other, "score": score}
+                        for other, score in best if score > 0)
+            written += bool(best)
+
+        # Replace the table in one transaction so readers never see it half built
+        MovieSimilarity.query.delete(synchronize_session=False)
+        for start in range(0, len(rows), INSERT_BATCH):
+            db.session.execute(insert(MovieSimilarity), rows[start:start + INSERT_BATCH])
+        RecommendationState.query.update({RecommendationState.stale: True}, synchronize_session=False)
+        db.session.commit()
+        self._popular = (0.0, [])
+        return written
+
+    # ── Per-user suggestions ───────────────────────────
+
+    def popular(self) -> list:
+        """Most watched movies, best rated first among equals; the fallback
+        for users with few or no liked movies."""
+        expires, movie_ids = self._popular
+        if expires > time.monotonic():
+            return movie_ids
+        movie_ids = [
+            movie_id for (movie_id,) in
+            db.session.query(UserMovie.movie_id)
+            .filter(UserMovie.watched)
+            .group_by(UserMovie.movie_id)
+            .order_by(db.func.count().desc(), db.func.avg(UserMovie.user_rating).desc())
+            .limit(self.count * 5)
+        ]
+        self._popular = (time.monotonic() + POPULAR_TTL, movie_ids)
+        return movie_ids
+
+    def refresh_user(self, user_id: int) -> list:
+        """Recompute and store one user's suggestions. Returns the movie ids."""
+        # Clear the flag first: a change made while this runs marks the user again
+        db.session.merge(RecommendationState(user_id=user_id, stale=False, computed_at=utcnow()))
+        db.session.commit()
+
+        links = db.session.query(
+            UserMovie.movie_id, UserMovie.watched, UserMovie.want_to_watch, UserMovie.user_rating,
+        ).filter(UserMovie.user_id == user_id).all()
+        owned = {movie_id for movie_id, *_ in links}
+        liked = [(movie_id, interaction(w, want, r)) for movie_id, w, want, r in links]
+        seeds = dict(heapq.nlargest(MAX_SEEDS, (s for s in liked if s[1] >= LIKE_THRESHOLD), key=itemgetter(1)))
+
+        scores = defaultdict(float)
+        if seeds:
+            neighbours = db.session.query(MovieSimilarity.movie_id, MovieSimilarity.similar_id, MovieSimilarity.score)
+            for movie_id, similar_id, score in neighbours.filter(MovieSimilarity.movie_id.in_(seeds)):
+                if similar_id not in owned:
+                    scores[similar_id] += score * seeds[movie_id]
+        best = heapq.nlargest(self.count, scores.items(), key=itemgetter(1))
+
+        if len(best) < self.count:
+            chosen = owned | {movie_id for movie_id, _ in best}
+            filler = [movie_id for movie_id in self.popular() if movie_id not in chosen]
+            best += [(movie_id, 0.0) for movie_id in filler[:self.count - len(best)]]
+
+        Recommendation.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        if best:
+            db.session.execute(insert(Recommendation), [
+                {"user_id": user_id, "rank": rank, "movie_id": movie_id, "score": round(score, 4)}
+                for rank, (movie_id, score) in enumerate(best)
+            ])
+        db.session.commit()
+        return [movie_id for movie_id, _ in best]
+
+    def stale_users(self, limit: int) -> list:
+        """Users never computed or marked stale since."""
+        return [
+            user_id for (user_id,) in
+            db.session.query(User.id)
+            .outerjoin(RecommendationState, RecommendationState.user_id == User.id)
+            .filter(or_(RecommendationState.user_id.is_(None), RecommendationState.stale))
+            .limit(limit)
+        ]
+
+    def refresh_stale(self, limit: int = 500) -> int:
+        """Refresh up to `limit` stale users. Returns how many were refreshed."""
+        user_ids = self.stale_users(limit)
+        for user_id in user_ids:
+            self.refresh_user(user_id)
+        if user_ids and self.on_update:
+            self.on_update(user_ids)
+        return len(user_ids)
+
+    def mark_stale(self, user_ids) -> None:
+        """Flag users for the next refresh (backends without the triggers)."""
+        if not user_ids:
+            return
+        (
+            RecommendationState.query
+            .filter(RecommendationState.user_id.in_(list(user_ids)), ~RecommendationState.stale)
+            .update({RecommendationState.stale: True}, synchronize_session=False)
+        )
+        db.session.commit()
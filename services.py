@@ -0,0 +1,416 @@
+"""Per-app services: data manager, caches, OMDb access and background jobs.
+
+create_app() builds one MovieHub per app and stores it as
+app.extensions["moviehub"]; views, the API and CLI commands reach it
+through current_app, so several apps can live in one process. The OMDb
+HTTP client is only created when something actually needs OMDb."""
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import catalog
+from data_manager import DataManager, PENDING
+from jobs import JobQueue, RateLimiter, RetryLater
+from metrics import Registry
+from models import db, Movie, utcnow
+from omdb_cache import OmdbCache, MISS, title_key, imdb_key
+from omdb_client import AsyncOmdbClient, OmdbClient, OmdbError, CircuitBreaker, SingleFlight, parse_movie
+from page_cache import PageCache, MemoryBackend, SQLiteBackend
+from posters import PosterStore
+from recommender import Recommender
+import stats
+
+
+def page_backend(config: dict):
+    """Page cache backend named by PAGE_CACHE_BACKEND, or None (disabled)."""
+    backend = config["PAGE_CACHE_BACKEND"]
+    if backend == "sqlite":
+        return SQLiteBackend(config["PAGE_CACHE_PATH"])
+    if backend == "memory":
+        return MemoryBackend(max_entries=config["PAGE_CACHE_SIZE"])
+    return None
+
+
+class MovieHub:
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.config = config
+
+        self.metrics = Registry()
+        self.omdb_requests = self.metrics.histogram(
+            "moviehub_omdb_request_duration_seconds", "OMDb HTTP attempts by outcome.", ("outcome",))
+        self.omdb_coalesced = self.metrics.counter(
+            "moviehub_omdb_coalesced_total", "OMDb lookups that shared another caller's in-flight request.")
+
+        self.omdb_cache = OmdbCache(
+            config["OMDB_CACHE_PATH"],
+            ttl=config["OMDB_CACHE_TTL"],
+            negative_ttl=config["OMDB_NEGATIVE_CACHE_TTL"],
+            max_entries=config["OMDB_CACHE_SIZE"],
+        )
+        self.page_cache = PageCache(page_backend(config), ttl=config["PAGE_CACHE_TTL"])
+        self.page_cache.init_app(app)
+        self.dm = DataManager(on_change=self._on_change)
+        self.recommender = Recommender(
+            neighbours=config["SIMILAR_MOVIES"], count=config["RECOMMEND_COUNT"], on_update=self.page_cache.invalidate)
+        self.poster_store = PosterStore(config["POSTER_CACHE_DIR"])
+
+        self.omdb_limiter = RateLimiter(per_day=config["OMDB_DAILY_QUOTA"])
+        self.job_queue = JobQueue(max_attempts=config["JOB_MAX_ATTEMPTS"], backoff=config["JOB_BACKOFF"])
+        self.job_queue.handler("enrich_movie", on_failure=self._enrich_failed)(self.enrich_movie)
+        self.job_queue.handler("complete_movie")(self.complete_movie)
+        self.job_queue.handler("refresh_movies", every=config["MOVIE_REFRESH_INTERVAL"])(self.refresh_movies)
+        self.job_queue.handler("build_similarity", every=config["SIMILARITY_INTERVAL"])(self.build_similarity)
+        self.job_queue.handler("refresh_recommendations", every=config["RECOMMEND_INTERVAL"])(
+            self.refresh_recommendations)
+        self.job_queue.handler("compact_changes", every=config["CHANGE_COMPACT_INTERVAL"])(self.compact_changes)
+
+        self.omdb_breaker = CircuitBreaker(
+            failure_threshold=config["OMDB_BREAKER_THRESHOLD"], reset_timeout=config["OMDB_BREAKER_RESET"])
+        self._omdb_client = None
+        self._omdb_flights = SingleFlight()
+        self._client_lock = threading.Lock()
+        self._register_metrics()
+
+    @property
+    def logger(self):
+        return self.app.logger
+
+    def _omdb_options(self) -> dict:
+        config = self.config
+        return dict(
+            base_url=config["OMDB_BASE_URL"],
+            connect_timeout=config["OMDB_CONNECT_TIMEOUT"],
+            read_timeout=config["OMDB_READ_TIMEOUT"],
+            max_retries=config["OMDB_MAX_RETRIES"],
+            breaker=self.omdb_breaker,
+            on_request=lambda seconds, outcome: self.omdb_requests.observe(seconds, outcome),
+        )
+
+    @property
+    def omdb_client(self) -> OmdbClient:
+        """Shared OMDb client (pooled session, retries, circuit breaker),
+        created on first use."""
+        if self._omdb_client is None:
+            with self._client_lock:
+                if self._omdb_client is None:
+                    self._omdb_client = OmdbClient(self.config["OMDB_API_KEY"], **self._omdb_options())
+        return self._omdb_client
+
+    def async_omdb_client(self) -> AsyncOmdbClient:
+        """A new OMDb client for the calling event loop, sharing the circuit
+        breaker and metrics of omdb_client. Use it with `async with`."""
+        return AsyncOmdbClient(self.config["OMDB_API_KEY"], **self._omdb_options())
+
+    def _register_metrics(self) -> None:
+        # Scrape-time values from the caches, the OMDb circuit breaker and the job table
+        metrics = self.metrics
+        metrics.callback(
+            "moviehub_omdb_cache_lookups_total", "OMDb cache lookups by result.",
+            lambda: {(k,): v for k, v in self.omdb_cache.stats().items() if k != "memory_entries"},
+            labels=("result",), kind="counter",
+        )
+        metrics.callback(
+            "moviehub_omdb_cache_memory_entries", "OMDb responses held in memory.",
+            lambda: {(): self.omdb_cache.stats()["memory_entries"]},
+        )
+        metrics.callback(
+            "moviehub_omdb_circuit_open", "1 while the OMDb circuit breaker rejects calls.",
+            lambda: {(): int(self.omdb_breaker.state == "open")},
+        )
+        metrics.callback(
+            "moviehub_page_cache_lookups_total", "Rendered page cache lookups by result.",
+            lambda: {("hit",): self.page_cache.hits, ("miss",): self.page_cache.misses},
+            labels=("result",), kind="counter",
+        )
+        metrics.callback("moviehub_jobs", "Background jobs by status.", self._job_counts, labels=("status",))
+
+    def _on_change(self, user_ids) -> None:
+        self.page_cache.invalidate(user_ids)
+        # SQLite marks recommendations stale and updates collection stats
+        # with triggers (migrations 5 and 6)
+        if user_ids and db.engine.dialect.name != "sqlite":
+            self.recommender.mark_stale(user_ids)
+            stats.rebuild(db.session, user_ids)
+            db.session.commit()
+
+    def _job_counts(self) -> dict:
+        try:
+            return {(status,): count for status, count in self.job_queue.counts().items()}
+        except SQLAlchemyError:
+            db.session.rollback()  # e.g. job table not created yet
+            return {}
+
+    # ── OMDb ───────────────────────────────────────────
+
+    def lookup_omdb(
+        self,
+        title: str | None = None,
+        imdb_id: str | None = None,
+        year: int | None = None,
+        raise_errors: bool = False,
+    ) -> dict | None:
+        """Return OMDb data for a title or IMDb id from the cache or the API.
+        Does not touch the database, so it is safe to call from worker threads.
+        Concurrent lookups of the same title or id share one API request.
+        With raise_errors, transient OMDb failures raise OmdbError instead of
+        returning None, so callers that can retry tell them apart from not-found."""
+        key = imdb_key(imdb_id) if imdb_id else title_key(title, year)
+        data = self._cached_omdb(key, title, imdb_id)
+        if data is not MISS:
+            return data
+
+        try:
+            data, shared = self._omdb_flights.do(key, lambda: self._request_omdb(key, title, imdb_id, year))
+        except OmdbError:
+            if raise_errors:
+                raise
+            return None
+        if shared:
+            self.omdb_coalesced.inc()
+        return data
+
+    async def alookup_omdb(
+        self,
+        client: AsyncOmdbClient,
+        title: str | None = None,
+        imdb_id: str | None = None,
+        year: int | None = None,
+        raise_errors: bool = False,
+    ) -> dict | None:
+        """lookup_omdb for async code: the API call goes through `client`
+        (see async_omdb_client) and waiting on it does not block the event
+        loop. In-flight requests are shared with lookup_omdb callers."""
+        key = imdb_key(imdb_id) if imdb_id else title_key(title, year)
+        data = self._cached_omdb(key, title, imdb_id)
+        if data is not MISS:
+            return data
+
+        try:
+            data, shared = await self._omdb_flights.ado(
+                key, lambda: self._arequest_omdb(client, key, title, imdb_id, year))
+        except OmdbError:
+            if raise_errors:
+                raise
+            return None
+        if shared:
+            self.omdb_coalesced.inc()
+        return data
+
+    def _cached_omdb(self, key: str, title: str | None, imdb_id: str | None):
+        """The cached answer for `key` (None for a cached not-found), or MISS
+        when the API has to be asked."""
+        data = self.omdb_cache.get(key)
+        if data is None:
+            self.logger.info("OMDb not found (cached) title=%r imdb_id=%s", title, imdb_id)
+            return None
+        if data is MISS and not self.config["OMDB_API_KEY"]:
+            raise RuntimeError("OMDB_API_KEY environment variable is not set.")
+        return data
+
+    def _request_omdb(self, key: str, title: str | None, imdb_id: str | None, year: int | None) -> dict | None:
+        """One OMDb API call for lookup_omdb; caches the answer under `key`."""
+        # A flight for this key may have finished since the caller's cache check
+        data = self.omdb_cache.get(key)
+        if data is not MISS:
+            return data
+
+        # OMDB request with error handling
+        try:
+            data = self.omdb_client.lookup(title=title, imdb_id=imdb_id, year=year)
+        except OmdbError:
+            # Transient failures are not cached
+            self.logger.warning("OMDb request failed title=%r imdb_id=%s", title, imdb_id, exc_info=True)
+            raise
+        return self._store_omdb(key, title, imdb_id, data)
+
+    async def _arequest_omdb(self, client: AsyncOmdbClient, key: str, title: str | None, imdb_id: str | None,
+                             year: int | None) -> dict | None:
+        """_request_omdb through an AsyncOmdbClient."""
+        data = self.omdb_cache.get(key)
+        if data is not MISS:
+            return data
+
+        try:
+            data = await client.lookup(title=title, imdb_id=imdb_id, year=year)
+        except OmdbError:
+            self.logger.warning("OMDb request failed title=%r imdb_id=%s", title, imdb_id, exc_info=True)
+            raise
+        return self._store_omdb(key, title, imdb_id, data)
+
+    def _store_omdb(self, key: str, title: str | None, imdb_id: str | None, data: dict) -> dict | None:
+        """Cache an API answer; returns the movie data, or None for not-found."""
+        if data.get("Response") == "False":
+            self.logger.info("OMDb not found title=%r imdb_id=%s error=%r", title, imdb_id, data.get("Error"))
+            self.omdb_cache.set(key, None)
+            return None
+
+        self.omdb_cache.set(key, data)
+        if data.get("imdbID"):
+            self.omdb_cache.set(imdb_key(data["imdbID"]), data)
+        self.logger.info("OMDb fetched title=%r imdb_id=%s", data.get("Title"), data.get("imdbID"))
+        return data
+
+    def fetch_movie(self, title: str | None = None, imdb_id: str | None = None) -> Movie | None:
+        """Resolve a movie by title or IMDb id. Checks the local movie table,
+        then the IMDb catalog, then the OMDb cache, then the OMDb API.
+        Catalog matches lack plot, poster and country; see queue_details."""
+        dm = self.dm
+        local = dm.get_movie_by_imdb_id(imdb_id) if imdb_id else dm.get_movie_by_title(title)
+        if local:
+            self.logger.info("OMDb skipped: local match title=%r imdb_id=%s", local.title, local.imdb_id)
+            return local
+
+        entry = catalog.find(title=title, imdb_id=imdb_id)
+        if entry:
+            self.logger.info("OMDb skipped: catalog match title=%r imdb_id=%s", entry.title, entry.imdb_id)
+            return dm.get_movie_by_imdb_id(entry.imdb_id) or Movie(**catalog.movie_values(entry))
+
+        data = self.lookup_omdb(title=title, imdb_id=imdb_id)
+        if data is None:
+            return None
+
+        # A cached title may resolve to a movie another user already added
+        existing = dm.get_movie_by_imdb_id(data.get("imdbID") or "")
+        if existing:
+            return existing
+
+        return Movie(**parse_movie(data))
+
+    def queue_movie(self, user_id: int, title: str | None = None, imdb_id: str | None = None) -> Movie | None:
+        """Add a pending placeholder right away and let a background job fetch
+        the OMDb data. Returns None when the add needs no network call (local
+        or catalog match, cached OMDb answer) or ASYNC_ADDS is off; use the
+        inline path then."""
+        dm = self.dm
+        if not self.config["ASYNC_ADDS"]:
+            return None
+        if dm.get_movie_by_imdb_id(imdb_id) if imdb_id else dm.get_movie_by_title(title):
+            return None
+        if catalog.find(title=title, imdb_id=imdb_id):
+            return None
+        if self.omdb_cache.get(imdb_key(imdb_id) if imdb_id else title_key(title)) is not MISS:
+            return None
+
+        movie = dm.add_pending_movie(user_id, title or imdb_id)
+        try:
+            self.job_queue.enqueue("enrich_movie", {"movie_id": movie.id, "title": title, "imdb_id": imdb_id})
+        except SQLAlchemyError:
+            db.session.rollback()
+            dm.delete_movie(user_id, movie.id)
+            raise
+        self.logger.info("Movie queued user_id=%s movie_id=%s title=%r imdb_id=%s", user_id, movie.id, title,
+                         imdb_id)
+        return movie
+
+    def queue_details(self, movie: Movie) -> None:
+        """After adding a movie built from the IMDb catalog, fetch what the
+        catalog lacks (plot, poster, country) from OMDb in the background.
+        Placeholders have no IMDb id to look up; enrich_movie handles them."""
+        if movie.status is not None or not (movie.imdb_id or "").startswith("tt"):
+            return
+        if movie.plot or not self.config["OMDB_API_KEY"]:
+            return
+        self.job_queue.enqueue("complete_movie", {"movie_id": movie.id, "imdb_id": movie.imdb_id})
+
+    # ── Background jobs ────────────────────────────────
+
+    def _enrich_failed(self, payload, error):
+        self.dm.mark_movie_not_found(payload["movie_id"])
+
+    def enrich_movie(self, payload):
+        """Fill in a pending placeholder from OMDb."""
+        movie_id = payload["movie_id"]
+        movie = self.dm.get_movie(movie_id)
+        if movie is None or movie.status != PENDING:
+            return  # deleted or resolved meanwhile
+
+        wait = self.omdb_limiter.acquire()
+        if wait:
+            raise RetryLater(wait)
+
+        data = self.lookup_omdb(title=payload.get("title"), imdb_id=payload.get("imdb_id"), raise_errors=True)
+        if data is None:
+            self.dm.mark_movie_not_found(movie_id)
+            self.logger.info("Pending movie not found movie_id=%s title=%r", movie_id, payload.get("title"))
+            return
+
+        # The placeholder row may be merged into an existing movie and deleted
+        self.dm.resolve_pending_movie(movie_id, parse_movie(data))
+        self.logger.info("Pending movie resolved movie_id=%s imdb_id=%s", movie_id, data.get("imdbID"))
+
+    def complete_movie(self, payload):
+        """Fill in plot, poster and country of a catalog-built movie."""
+        wait = self.omdb_limiter.acquire()
+        if wait:
+            raise RetryLater(wait)
+
+        data = self.lookup_omdb(imdb_id=payload["imdb_id"], raise_errors=True)
+        if data is None:
+            self.dm.refresh_movie(payload["movie_id"], {})  # nothing more to get; stamp it
+            return
+        self.dm.complete_movie(payload["movie_id"], parse_movie(data))
+
+    def refresh_movies(self, payload):
+        """Re-fetch rating, poster and plot for the least recently refreshed movies."""
+        before = utcnow() - timedelta(seconds=self.config["MOVIE_REFRESH_MAX_AGE"])
+        refreshed = 0
+        for movie_id, imdb_id in self.dm.get_stale_movies(self.config["MOVIE_REFRESH_BATCH"], before):
+            if self.omdb_limiter.acquire():
+                break  # quota used up; the rest wait for the next run
+            try:
+                data = self.omdb_client.lookup(imdb_id=imdb_id)
+            except OmdbError:
+                self.logger.warning("Movie refresh stopped: OMDb unavailable imdb_id=%s", imdb_id, exc_info=True)
+                break
+            if data.get("Response") == "False":
+                self.dm.refresh_movie(movie_id, {})  # keep the old data, try again next cycle
+                continue
+            self.omdb_cache.set(imdb_key(imdb_id), data)
+            self.dm.refresh_movie(movie_id, parse_movie(data))
+            refreshed += 1
+        if refreshed:
+            self.logger.info("Movies refreshed count=%s", refreshed)
+
+    def build_similarity(self, payload):
+        """Rebuild movie neighbours from all collections."""
+        started = time.perf_counter()
+        movies = self.recommender.build_similarity()
+        self.logger.info("Movie similarity rebuilt movies=%s seconds=%.1f", movies, time.perf_counter() - started)
+
+    def refresh_recommendations(self, payload):
+        """Recompute suggestions for users whose collections changed."""
+        refreshed = self.recommender.refresh_stale(self.config["RECOMMEND_BATCH"])
+        if refreshed:
+            self.logger.info("Recommendations refreshed users=%s", refreshed)
+
+    def compact_changes(self, payload):
+        """Drop change feed rows superseded by newer ones."""
+        removed = self.dm.compact_changes()
+        if removed:
+            self.logger.info("Change feed compacted removed=%s", removed)
+
+    def orphan_gc_loop(self, interval: int) -> None:
+        """Background sweep used when ORPHAN_GC_INTERVAL is set."""
+        while True:
+            time.sleep(interval)
+            with self.app.app_context():
+                try:
+                    deleted = self.dm.delete_orphan_movies()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    self.logger.exception("DB error in orphaned movie sweep")
+                    continue
+            if deleted:
+                self.logger.info("Orphaned movies deleted count=%s", deleted)
+
+    def start_background(self) -> None:
+        """Start the orphan sweep and job worker threads the config asks for."""
+        if self.config["ORPHAN_GC_INTERVAL"]:
+            threading.Thread(target=self.orphan_gc_loop, args=(self.config["ORPHAN_GC_INTERVAL"],),
+                             daemon=True, name="orphan-gc").start()
+        if self.config["JOB_WORKERS"]:
+            self.job_queue.start(self.app, self.config["JOB_WORKERS"])
@@ -0,0 +1,160 @@
+"""Per-user collection statistics.
+
+user_stats holds running totals per user; user_genre_stats,
+user_country_stats and user_decade_stats hold the breakdowns. On SQLite,
+triggers (migrations 6 and 8) apply every user_movie change as a delta, so the
+stats page reads a few rows instead of walking the collection. Other
+backends call rebuild() for the users DataManager reports as changed.
+
+Movie.genre and Movie.country are comma-separated strings; index_movies()
+splits them once into the genre / country lookup tables."""
+from sqlalchemy import case, delete, func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import (
+    Movie, UserMovie, Genre, Country, MovieGenre, MovieCountry,
+    UserStats, UserGenreStats, UserCountryStats, UserDecadeStats,
+)
+
+# Movies / users per IN (...) list
+BATCH_SIZE = 500
+
+# (lookup table, link table, link column, Movie column)
+TAGS = (
+    (Genre, MovieGenre, MovieGenre.genre_id, Movie.genre),
+    (Country, MovieCountry, MovieCountry.country_id, Movie.country),
+)
+
+
+def split_names(value: str | None) -> list:
+    """'Drama, Romance' -> ['Drama', 'Romance']; drops blanks and N/A."""
+    names = []
+    for name in (value or "").split(","):
+        name = name.strip()
+        if name and name != "N/A" and name not in names:
+            names.append(name)
+    return names
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+# ── Genre / country lookup tables ──────────────────────
+
+def _insert_ignore(conn, model, rows) -> None:
+    """INSERT skipping rows that hit a unique constraint (a concurrent
+    writer may have added the same name)."""
+    dialect = conn.dialect if hasattr(conn, "dialect") else conn.get_bind().dialect
+    module = {"sqlite": sqlite, "postgresql": postgresql}.get(dialect.name)
+    if module is None:
+        conn.execute(insert(model), rows)
+    else:
+        conn.execute(module.insert(model).on_conflict_do_nothing(), rows)
+
+
+def _lookup_ids(conn, model, names) -> dict:
+    """name -> id, adding the names that are new."""
+    ids = {}
+    for chunk in _batches(names):
+        ids.update(conn.execute(select(model.name, model.id).where(model.name.in_(chunk))).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        _insert_ignore(conn, model, [{"name": name} for name in missing])
+        for chunk in _batches(missing):
+            ids.update(conn.execute(select(model.name, model.id).where(model.name.in_(chunk))).all())
+    return ids
+
+
+def index_movies(conn, movie_ids=None) -> int:
+    """Split genre / country of the given movies (default: all) into the
+    lookup tables. Only changed pairs are written, so re-running is cheap.
+    `conn` is a Connection or Session; the caller commits.
+    Returns the number of movies looked at."""
+    if movie_ids is None:
+        movie_ids = conn.execute(select(Movie.id)).scalars().all()
+    count = 0
+    for chunk in _batches(movie_ids):
+        for lookup, link, column, source in TAGS:
+            names = {
+                movie_id: split_names(value)
+                for movie_id, value in conn.execute(select(Movie.id, source).where(Movie.id.in_(chunk)))
+            }
+            ids = _lookup_ids(conn, lookup, sorted({n for movie_names in names.values() for n in movie_names}))
+            wanted = {(movie_id, ids[n]) for movie_id, movie_names in names.items() for n in movie_names}
+            current = set(conn.execute(select(link.movie_id, column).where(link.movie_id.in_(chunk))).all())
+
+            removed = current - wanted
+            if removed:
+                conn.execute(delete(link).where(tuple_(link.movie_id, column).in_(removed)))
+            added = wanted - current
+            if added:
+                conn.execute(insert(link), [{"movie_id": m, column.key: t} for m, t in added])
+        count += len(chunk)
+    return count
+
+
+# ── Summary rows ───────────────────────────────────────
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def _link_totals() -> list:
+    """total, watched, rated, rating_sum over user_movie rows."""
+    return [
+        func.count(),
+        _count_if(UserMovie.watched),
+        _count_if(UserMovie.user_rating.isnot(None)),
+        func.sum(func.coalesce(UserMovie.user_rating, 0.0)),
+    ]
+
+
+def _rebuild_queries() -> list:
+    """(summary model, SELECT producing its rows) per summary table."""
+    compared = UserMovie.user_rating.isnot(None) & Movie.imdb_rating.isnot(None)
+    decade = (Movie.year // 10) * 10
+    return [
+        (UserStats, select(
+            UserMovie.user_id,
+            func.count(),
+            _count_if(UserMovie.watched),
+            _count_if(UserMovie.want_to_watch),
+            _count_if(UserMovie.user_rating.isnot(None)),
+            func.sum(func.coalesce(UserMovie.user_rating, 0.0)),
+            func.sum(case((UserMovie.watched, func.coalesce(Movie.runtime, 0)), else_=0)),
+            _count_if(compared),
+            func.sum(case((compared, UserMovie.user_rating), else_=0.0)),
+            func.sum(case((compared, Movie.imdb_rating), else_=0.0)),
+        ).join(Movie, Movie.id == UserMovie.movie_id).group_by(UserMovie.user_id)),
+
+        (UserGenreStats, select(UserMovie.user_id, MovieGenre.genre_id, *_link_totals())
+            .join(MovieGenre, MovieGenre.movie_id == UserMovie.movie_id)
+            .group_by(UserMovie.user_id, MovieGenre.genre_id)),
+
+        (UserCountryStats, select(UserMovie.user_id, MovieCountry.country_id, *_link_totals())
+            .join(MovieCountry, MovieCountry.movie_id == UserMovie.movie_id)
+            .group_by(UserMovie.user_id, MovieCountry.country_id)),
+
+        (UserDecadeStats, select(UserMovie.user_id, decade, *_link_totals())
+            .join(Movie, Movie.id == UserMovie.movie_id)
+            .where(Movie.year > 0)
+            .group_by(UserMovie.user_id, decade)),
+    ]
+
+
+def rebuild(conn, user_ids=None) -> None:
+    """Recompute the summary rows of the given users (default: everyone)
+    from user_movie. `conn` is a Connection or Session; the caller commits."""
+    chunks = [None] if user_ids is None else list(_batches(user_ids))
+    for model, query in _rebuild_queries():
+        columns = [c.key for c in model.__table__.columns]
+        for chunk in chunks:
+            if chunk is None:
+                conn.execute(delete(model))
+                conn.execute(insert(model).from_select(columns, query))
+            else:
+                conn.execute(delete(model).where(model.user_id.in_(chunk)))
+                conn.execute(insert(model).from_select(columns, query.where(UserMovie.user_id.in_(chunk))))
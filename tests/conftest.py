@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models import Movie, db  # noqa: E402
+import migrations  # noqa: E402
+
+
+def omdb_movie(title: str, imdb_id: str = "tt0000001", **fields) -> dict:
+    """An OMDb "found" response body."""
+    return {
+        "Title": title, "Year": "2001", "imdbID": imdb_id, "Genre": "Drama", "Director": "Stub",
+        "Actors": "A, B", "Country": "USA", "Plot": "A plot.", "Runtime": "100 min",
+        "imdbRating": "7.0", "Poster": "N/A", "Response": "True", **fields,
+    }
+
+
+NOT_FOUND = {"Response": "False", "Error": "Movie not found!"}
+
+
+def make_movie(title: str, imdb_id: str = "tt0000001", **fields) -> Movie:
+    """An unsaved Movie with empty details; `fields` set any other column."""
+    return Movie(**{
+        "title": title, "genre": "Drama", "year": 2001, "actors": "", "country": "", "plot": "",
+        "imdb_url": "", "imdb_id": imdb_id, **fields,
+    })
+
+
+class OmdbStub:
+    """Local OMDb stand-in. Queued (status, body) replies are served first,
+    then `default`; every request's query parameters are kept in `calls`."""
+
+    def __init__(self):
+        self.replies = []
+        self.default = (200, NOT_FOUND)
+        self.delay = 0.0
+        self.calls = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.calls.append({k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()})
+                    status, body = stub.replies.pop(0) if stub.replies else stub.default
+                if stub.delay:
+                    time.sleep(stub.delay)
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def omdb():
+    stub = OmdbStub()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def app(tmp_path, omdb):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'movies.db'}",
+        "OMDB_API_KEY": "test",
+        "OMDB_BASE_URL": omdb.url,
+        "OMDB_MAX_RETRIES": 0,
+        "OMDB_CACHE_PATH": str(tmp_path / "omdb_cache.db"),
+        "PAGE_CACHE_BACKEND": "memory",
+        "POSTER_CACHE_DIR": str(tmp_path / "posters"),
+        "LOG_FILE": "",
+        "LOG_CONSOLE": False,
+        "LOG_REQUESTS": False,
+        "JOB_WORKERS": 0,
+        "ASYNC_ADDS": True,  # tests run the queued jobs themselves
+    })
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade(db.engine)
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def services(app):
+    return app.extensions["moviehub"]
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,55 @@
+from conftest import make_movie
+
+
+def add(services, user_id):
+    return services.dm.add_movie(make_movie("Heat", "tt0113277", genre="Crime", year=1995), user_id)
+
+
+def test_patch_rejects_rating_an_unwatched_movie(services, client):
+    user = services.dm.create_user("a")
+    movie_id = add(services, user.id).id
+    url = f"/api/v1/users/{user.id}/movies/{movie_id}"
+
+    response = client.patch(url, json={"watched": False, "user_rating": 7})
+    assert response.status_code == 400
+    item = client.get(url).json
+    assert item["watched"] is False and item["user_rating"] is None
+
+
+def test_patch_applies_the_status_rules(services, client):
+    user = services.dm.create_user("a")
+    movie_id = add(services, user.id).id
+    url = f"/api/v1/users/{user.id}/movies/{movie_id}"
+
+    item = client.patch(url, json={"user_rating": 7}).json
+    assert item["watched"] is True and item["user_rating"] == 7
+    item = client.patch(url, json={"watched": False}).json
+    assert item["watched"] is False and item["user_rating"] is None
+    item = client.patch(url, json={"watched": False, "user_rating": None}).json
+    assert item["watched"] is False
+
+
+def test_rejected_patch_changes_nothing(services, client):
+    user = services.dm.create_user("a")
+    movie_id = add(services, user.id).id
+    url = f"/api/v1/users/{user.id}/movies/{movie_id}"
+    before = client.get(url).json
+
+    for body in ({"watched": True, "title": "   "}, {"user_rating": 7, "title": ""},
+                 {"watched": True, "user_rating": 11}, {"want_to_watch": True, "rating": 3}):
+        assert client.patch(url, json=body).status_code == 400
+    assert client.get(url).json == before
+
+    other = services.dm.create_user("b")
+    response = client.patch(f"/api/v1/users/{other.id}/movies/{movie_id}", json={"title": "Mine"})
+    assert response.status_code == 404
+    assert client.get(url).json["title"] == "Heat"
+
+
+def test_patch_updates_status_and_title_together(services, client):
+    user = services.dm.create_user("a")
+    movie_id = add(services, user.id).id
+    url = f"/api/v1/users/{user.id}/movies/{movie_id}"
+
+    item = client.patch(url, json={"user_rating": 8, "title": "Heat (1995)"}).json
+    assert (item["title"], item["watched"], item["user_rating"]) == ("Heat (1995)", True, 8)
@@ -0,0 +1,71 @@
+from app import create_app
+from config import load_config
+from database import engine_options
+from models import db
+import migrations
+from services import MovieHub
+
+
+def test_pool_options_only_for_pooled_backends():
+    assert "pool_size" not in engine_options("sqlite://")
+    assert "pool_size" not in engine_options("sqlite:///:memory:")
+    assert "pool_size" not in engine_options("sqlite:///file:mem?mode=memory&uri=true")
+    assert engine_options("sqlite:////tmp/movies.db")["pool_size"] == 5
+    assert engine_options("postgresql://localhost/movies")["pool_size"] == 5
+
+
+def test_in_memory_app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "OMDB_CACHE_PATH": str(tmp_path / "omdb_cache.db"),
+        "PAGE_CACHE_BACKEND": "memory",
+        "LOG_FILE": "",
+        "LOG_CONSOLE": False,
+        "JOB_WORKERS": 0,
+    })
+    with app.app_context():
+        db.create_all()
+        migrations.upgrade(db.engine)
+        app.extensions["moviehub"].dm.create_user("ada")
+    assert app.test_client().get("/api/v1/users").json["items"][0]["name"] == "ada"
+
+
+def test_background_threads_are_opt_in(tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(MovieHub, "start_background", lambda self: started.append(self))
+    config = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'movies.db'}",
+        "OMDB_CACHE_PATH": str(tmp_path / "omdb_cache.db"),
+        "LOG_FILE": "",
+        "LOG_CONSOLE": False,
+    }
+    create_app(config)
+    assert started == []
+    serving = create_app({**config, "START_BACKGROUND": True})
+    assert started == [serving.extensions["moviehub"]]
+
+
+def test_sqlite_pragmas_follow_the_app_config(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'movies.db'}",
+        "OMDB_CACHE_PATH": str(tmp_path / "omdb_cache.db"),
+        "LOG_FILE": "",
+        "LOG_CONSOLE": False,
+        "SQLITE_PRAGMAS": {"journal_mode": "DELETE", "busy_timeout": 1234},
+    })
+    with app.app_context(), db.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+    assert app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"]["timeout"] == 1.234
+
+
+def test_async_adds_only_with_job_workers(monkeypatch):
+    monkeypatch.delenv("ASYNC_ADDS", raising=False)
+    assert load_config()["ASYNC_ADDS"] is False
+    assert load_config({"START_BACKGROUND": True})["ASYNC_ADDS"] is True
+    assert load_config({"START_BACKGROUND": True, "JOB_WORKERS": 0})["ASYNC_ADDS"] is False
+
+    # Explicitly on, for web processes with a separate run-jobs process
+    monkeypatch.setenv("ASYNC_ADDS", "1")
+    assert load_config()["ASYNC_ADDS"] is True
+    assert load_config({"ASYNC_ADDS": False})["ASYNC_ADDS"] is False
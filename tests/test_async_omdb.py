@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from conftest import omdb_movie
+from omdb_client import AsyncOmdbClient, CircuitBreaker, CircuitOpenError, OmdbError
+
+
+def test_retries_and_breaker(omdb):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    outcomes = []
+    omdb.replies = [(503, {})]
+    omdb.default = (200, omdb_movie("Heat", "tt0113277"))
+
+    async def run():
+        async with AsyncOmdbClient("key", base_url=omdb.url, max_retries=1, backoff=0, breaker=breaker,
+                                   on_request=lambda seconds, outcome: outcomes.append(outcome)) as client:
+            assert (await client.lookup(title="Heat", year=1995))["imdbID"] == "tt0113277"
+            omdb.default = (500, {})
+            with pytest.raises(OmdbError):
+                await client.lookup(imdb_id="tt0113277")
+            with pytest.raises(CircuitOpenError):
+                await client.lookup(title="Heat")
+
+    asyncio.run(run())
+    assert outcomes == ["retry_status", "ok", "retry_status", "retry_status", "circuit_open"]
+    assert omdb.calls[0] == {"t": "Heat", "y": "1995", "apikey": "key"}
+    assert omdb.calls[2] == {"i": "tt0113277", "apikey": "key"}
+    assert len(omdb.calls) == 4
+
+
+def test_timeouts_count_as_connection_errors(omdb):
+    outcomes = []
+    omdb.delay = 0.3
+
+    async def run():
+        async with AsyncOmdbClient("key", base_url=omdb.url, max_retries=1, backoff=0, read_timeout=0.05,
+                                   on_request=lambda seconds, outcome: outcomes.append(outcome)) as client:
+            with pytest.raises(OmdbError):
+                await client.lookup(title="Heat")
+
+    asyncio.run(run())
+    assert outcomes == ["connection_error", "connection_error"]
+
+
+def test_async_and_thread_lookups_share_one_request(services, omdb):
+    omdb.default = (200, omdb_movie("Heat", "tt0113277"))
+    omdb.delay = 0.3
+    results = []
+
+    async def run():
+        async with services.async_omdb_client() as client:
+            return await asyncio.gather(*(services.alookup_omdb(client, title="Heat") for _ in range(3)))
+
+    thread = threading.Thread(target=lambda: results.append(services.lookup_omdb(title="Heat")))
+    thread.start()
+    results += asyncio.run(run())
+    thread.join()
+
+    assert [r["imdbID"] for r in results] == ["tt0113277"] * 4
+    assert len(omdb.calls) == 1
+
+
+def test_import_view_runs_lookups_concurrently(services, client, omdb):
+    pytest.importorskip("asgiref")
+    user = services.dm.create_user("a")
+    omdb.default = (200, omdb_movie("Heat", "tt0113277"))
+    omdb.delay = 0.3
+
+    start = time.perf_counter()
+    response = client.post(f"/users/{user.id}/import", data={"titles": "One\nTwo\nThree\nFour\nOne"})
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    assert len(omdb.calls) == 4  # one per distinct title
+    assert elapsed < 0.9  # 1.2 s one after another
+    assert services.dm.movie_exists_for_user(user.id, "tt0113277")
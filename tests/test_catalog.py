@@ -0,0 +1,75 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+import catalog
+from models import CatalogTitle, db
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "imdb")
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    """Copies of the fixture dumps, with title.basics gzipped like the real ones."""
+    paths = {}
+    for role, name in catalog.FILES.items():
+        plain = name[:-len(".gz")]
+        if role == "basics":
+            with open(os.path.join(FIXTURES, plain), "rb") as src, gzip.open(tmp_path / name, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            paths[role] = str(tmp_path / name)
+        else:
+            paths[role] = shutil.copy(os.path.join(FIXTURES, plain), tmp_path / plain)
+    return paths
+
+
+def test_merge_join(app, dumps):
+    result = catalog.ingest(db.engine, dumps)
+    assert result == {"names": 7, "titles": 3, "inserted": 3, "updated": 0}
+
+    heat = db.session.get(CatalogTitle, "tt0000001")
+    assert (heat.title, heat.year, heat.runtime, heat.genre) == ("Heat", 1995, 170, "Crime, Drama, Thriller")
+    assert (heat.imdb_rating, heat.votes, heat.director) == (8.3, 700000, "Michael Mann")
+    # Billing order, actors only, at most MAX_ACTORS
+    assert heat.actors == "Al Pacino, Diane Venora, Robert De Niro, Val Kilmer"
+
+    other = db.session.get(CatalogTitle, "tt0000003")
+    assert other.director == "Someone Else, Michael Mann"
+    blink = db.session.get(CatalogTitle, "tt0000010")
+    assert (blink.runtime, blink.imdb_rating, blink.genre, blink.director) == (None, None, "", "")
+    assert db.session.get(CatalogTitle, "tt0000002") is None  # episodes are skipped
+
+
+def test_reimport_only_writes_changed_rows(app, dumps):
+    catalog.ingest(db.engine, dumps)
+    assert catalog.ingest(db.engine, dumps) == {"names": 0, "titles": 3, "inserted": 0, "updated": 0}
+
+    with open(dumps["ratings"], encoding="utf-8") as f:
+        ratings = f.read().replace("8.3\t700000", "8.4\t700100")
+    with open(dumps["ratings"], "w", encoding="utf-8") as f:
+        f.write(ratings)
+    assert catalog.ingest(db.engine, dumps) == {"names": 0, "titles": 3, "inserted": 0, "updated": 1}
+    db.session.expire_all()
+    assert db.session.get(CatalogTitle, "tt0000001").imdb_rating == 8.4
+
+
+def test_unsorted_dump_is_rejected(app, dumps, tmp_path):
+    path = tmp_path / "title.principals.tsv"
+    header, *rows = open(path, encoding="utf-8").read().splitlines()
+    path.write_text("\n".join([header, rows[-1], *rows[:-1]]) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="not sorted"):
+        catalog.ingest(db.engine, dumps)
+
+
+def test_lookups(app, dumps):
+    catalog.ingest(db.engine, dumps)
+    assert catalog.find(title="  heat ").imdb_id == "tt0000001"  # most voted
+    assert catalog.find(title="Heat", year=1986).imdb_id == "tt0000003"
+    assert catalog.find(imdb_id="tt0000010").title == "Blink"
+    assert catalog.find(title="Nothing") is None
+
+    values = catalog.movie_values(catalog.find(imdb_id="tt0000001"))
+    assert values["imdb_url"] == "https://www.imdb.com/title/tt0000001/"
+    assert (values["director"], values["plot"], values["country"]) == ("Michael Mann", "", "")
@@ -0,0 +1,72 @@
+from conftest import make_movie
+
+
+def add(services, user_id, title, imdb_id):
+    return services.dm.add_movie(make_movie(title, imdb_id), user_id).id
+
+
+def feed(client, **params):
+    response = client.get("/api/v1/changes", query_string=params)
+    assert response.status_code == 200
+    return response.json
+
+
+def test_deleted_items_come_back_as_tombstones(services, client):
+    user = services.dm.create_user("a").id
+    kept = add(services, user, "Kept", "tt0000301")
+    gone = add(services, user, "Gone", "tt0000302")
+    services.dm.rate_movie(user, gone, 6)
+    services.dm.delete_movie(user, gone)
+
+    page = feed(client, fields="title,user_rating")
+    # The upserts of the deleted item are skipped; only its tombstone is left
+    assert [(c["movie_id"], c["op"]) for c in page["items"]] == [(kept, "upsert"), (gone, "delete")]
+    assert page["items"][0]["item"] == {"title": "Kept", "user_rating": None}
+    assert "item" not in page["items"][1]
+    assert page["has_more"] is False
+
+
+def test_pages_follow_next_cursor(services, client):
+    user = services.dm.create_user("a").id
+    other = services.dm.create_user("b").id
+    ids = [add(services, user, f"Movie {i}", f"tt000031{i}") for i in range(3)]
+    add(services, other, "Other", "tt0000319")
+
+    first = feed(client, user_id=user, limit=2)
+    assert [c["movie_id"] for c in first["items"]] == ids[:2]
+    assert first["has_more"] is True
+    second = feed(client, user_id=user, limit=2, since=first["next_cursor"])
+    assert [c["movie_id"] for c in second["items"]] == ids[2:]
+    assert second["has_more"] is False
+    # Nothing new: the cursor stays put
+    third = feed(client, user_id=user, since=second["next_cursor"])
+    assert third == {"items": [], "next_cursor": second["next_cursor"], "has_more": False}
+
+
+def test_since_must_be_a_cursor(client):
+    for since in ("abc", "-1", "1.5", ""):
+        response = client.get("/api/v1/changes", query_string={"since": since})
+        assert response.status_code == 400
+    assert client.get("/api/v1/changes?fields=nope").status_code == 400
+
+
+def test_cursors_survive_compaction(services, client):
+    dm = services.dm
+    user = dm.create_user("a").id
+    first = add(services, user, "First", "tt0000321")
+    second = add(services, user, "Second", "tt0000322")
+    cursor = feed(client)["next_cursor"]
+    dm.rate_movie(user, first, 7)
+    dm.rate_movie(user, first, 9)
+    dm.delete_movie(user, second)
+
+    before = feed(client, since=cursor, fields="user_rating")
+    assert dm.compact_changes() > 0
+    after = feed(client, since=cursor, fields="user_rating")
+    # Compaction only drops superseded rows: the latest state of each item remains
+    assert after["items"] == [c for c in before["items"] if c in after["items"]]
+    assert {(c["movie_id"], c["op"]) for c in after["items"]} == {(first, "upsert"), (second, "delete")}
+    assert [c["item"] for c in after["items"] if c["op"] == "upsert"] == [{"user_rating": 9}]
+    assert after["next_cursor"] == before["next_cursor"]
+    # From the start, one row per item
+    assert len(feed(client)["items"]) == 2
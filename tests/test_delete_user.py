@@ -0,0 +1,44 @@
+from sqlalchemy import event
+
+from conftest import make_movie
+from models import Movie, User, UserMovie, db
+
+
+def test_orphans_are_removed(services):
+    dm = services.dm
+    a = dm.create_user("a")
+    b = dm.create_user("b")
+    own = dm.add_movie(make_movie("Own", "tt0000101"), a.id).id
+    shared = dm.add_movie(make_movie("Shared", "tt0000102"), a.id).id
+    dm.add_movie(make_movie("Shared", "tt0000102"), b.id)
+
+    assert dm.delete_user(a.id)
+    assert db.session.get(Movie, own) is None
+    assert db.session.get(Movie, shared) is not None
+
+
+def test_movie_linked_before_the_orphan_delete_survives(services):
+    dm = services.dm
+    a = dm.create_user("a")
+    b = dm.create_user("b")
+    target = dm.add_movie(make_movie("Contested", "tt0000103"), a.id)
+    a_id, b_id, target_id = a.id, b.id, target.id
+    linked = []
+
+    # Link the movie to B right before delete_user removes its orphans,
+    # as a concurrent add would
+    def link_once(conn, cursor, statement, *args):
+        if not linked and statement.lstrip().upper().startswith("DELETE FROM MOVIE"):
+            linked.append(True)
+            conn.exec_driver_sql("INSERT INTO user_movie (user_id, movie_id, watched, want_to_watch) "
+                                 f"VALUES ({b_id}, {target_id}, 0, 0)")
+
+    event.listen(db.engine, "before_cursor_execute", link_once)
+    try:
+        assert dm.delete_user(a_id)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", link_once)
+
+    assert db.session.get(Movie, target_id) is not None
+    assert UserMovie.query.filter_by(user_id=b_id, movie_id=target_id).count() == 1
+    assert db.session.get(User, a_id) is None
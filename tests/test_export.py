@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+
+import export
+from conftest import make_movie
+from data_manager import COLLECTION_FIELDS
+
+
+def collection(services):
+    a = services.dm.create_user("Ann").id
+    b = services.dm.create_user("Bob").id
+    services.dm.add_movie(make_movie("Heat", "tt0113277"), a)
+    services.dm.add_movie(make_movie("Ronin, Part 1", "tt0122690"), a)
+    services.dm.add_movie(make_movie("Heat", "tt0113277"), b)
+    services.dm.rate_movie(a, services.dm.get_movie_by_title("Heat").id, 8)
+    return a, b
+
+
+def test_view_streams_csv_and_jsonl(services, client, monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_ROWS", 1)
+    a, _ = collection(services)
+
+    response = client.get(f"/users/{a}/export.csv")
+    assert response.status_code == 200
+    assert response.content_type == export.FORMATS["csv"]
+    assert response.headers["Content-Disposition"] == f'attachment; filename="movies-{a}.csv"'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == list(COLLECTION_FIELDS)
+    records = [dict(zip(rows[0], row)) for row in rows[1:]]
+    assert sorted((r["title"], r["user_rating"]) for r in records) == [("Heat", "8.0"), ("Ronin, Part 1", "")]
+
+    response = client.get(f"/users/{a}/export.jsonl")
+    assert response.content_type == export.FORMATS["jsonl"]
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted((r["title"], r["user_rating"]) for r in records) == [("Heat", 8), ("Ronin, Part 1", None)]
+    assert set(records[0]) == set(COLLECTION_FIELDS)
+
+
+def test_view_rejects_unknown_users_and_formats(services, client):
+    a, _ = collection(services)
+    assert client.get(f"/users/{a}/export.xml").status_code == 404
+    response = client.get("/users/999/export.csv")
+    assert response.status_code == 302 and response.headers["Location"] == "/"
+
+
+def test_cli_exports_every_user(app, services):
+    a, b = collection(services)
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["export"])
+    assert result.exit_code == 0, result.output
+    rows = list(csv.reader(io.StringIO(result.output)))
+    assert rows[0] == list(COLLECTION_FIELDS) + ["user_id", "user_name"]
+    records = [dict(zip(rows[0], row)) for row in rows[1:]]
+    assert sorted((r["user_id"], r["user_name"], r["title"]) for r in records) == [
+        (str(a), "Ann", "Heat"), (str(a), "Ann", "Ronin, Part 1"), (str(b), "Bob", "Heat"),
+    ]
+
+    result = runner.invoke(args=["export", "--format", "jsonl", "--user", str(b)])
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [r["title"] for r in records] == ["Heat"]
+    assert "user_name" not in records[0]
+
+
+def test_cli_rejects_unknown_users_and_formats(app, services):
+    collection(services)
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["export", "--user", "999"])
+    assert result.exit_code != 0
+    assert "User 999 not found." in result.output
+    result = runner.invoke(args=["export", "--format", "xml"])
+    assert result.exit_code != 0
+    assert "Invalid value for '--format'" in result.output
@@ -0,0 +1,19 @@
+from conftest import omdb_movie
+from importer import import_movies, parse_import
+
+
+def test_bad_omdb_data_fails_only_its_entry(services):
+    user = services.dm.create_user("a")
+    replies = {
+        "Heat": omdb_movie("Heat", "tt0113277"),
+        "Ronin": omdb_movie("Ronin", "tt0122690", Runtime="about two hours"),
+        "Alien": omdb_movie("Alien", "tt0078748", imdbRating="great"),
+    }
+
+    def lookup(title=None, imdb_id=None, year=None):
+        return replies[title]
+
+    results = import_movies(services.dm, user.id, parse_import("Heat\nRonin\nAlien\nRonin"), lookup)
+    assert [r["status"] for r in results] == ["added", "error", "error", "error"]
+    assert results[1]["error"].startswith("Unreadable OMDb data")
+    assert [m.title for m in services.dm.get_movies(user.id)] == ["Heat"]
@@ -0,0 +1,6 @@
+def test_claim_only_takes_the_given_kinds(app, services):
+    queue = services.job_queue
+    queue.enqueue("complete_movie", {"movie_id": 1, "imdb_id": "tt0000001"})
+
+    assert queue.claim(kinds=("enrich_movie",)) is None
+    assert queue.claim(kinds=("enrich_movie", "complete_movie")).kind == "complete_movie"
@@ -0,0 +1,36 @@
+import logging
+
+from flask import Flask
+from flask.logging import default_handler
+
+from logging_setup import configure_logging
+
+
+def test_no_synchronous_stderr_handler_without_console(capsys):
+    app = Flask("logging_test")
+    # Flask skips its handler when the root logger already has one (as under pytest)
+    app.logger.addHandler(default_handler)
+    listener = configure_logging(app, None, console=False)
+    try:
+        assert default_handler not in app.logger.handlers
+        app.logger.warning("should not reach stderr")
+    finally:
+        listener.stop()
+    assert "should not reach stderr" not in capsys.readouterr().err
+    assert all(not isinstance(h, logging.StreamHandler) for h in listener.handlers)
+
+
+def test_apps_keep_their_own_handlers(tmp_path):
+    first, second = Flask("logging_pair"), Flask("logging_pair")
+    listeners = [configure_logging(app, str(tmp_path / f"{n}.log"), console=False)
+                 for n, app in enumerate((first, second))]
+    try:
+        assert first.logger is not second.logger
+        first.logger.warning("from the first app")
+        second.logger.warning("from the second app")
+    finally:
+        for listener in listeners:
+            listener.stop()
+    assert "from the first app" in (tmp_path / "0.log").read_text()
+    assert "from the second app" not in (tmp_path / "0.log").read_text()
+    assert "from the second app" in (tmp_path / "1.log").read_text()
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from metrics import Registry, RequestMetrics
+
+
+def _sample(histogram, suffix):
+    (value,) = [v for name, _, v in histogram.samples() if name.endswith(suffix)]
+    return value
+
+
+def test_failed_statements_leave_no_timing_state(app):
+    engine = create_engine("sqlite://")
+    metrics = RequestMetrics(Registry(), app.logger)
+    metrics.init_app(app, engine)
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+        conn.execute(text("SELECT 1"))
+        assert not any(isinstance(value, list) and value for value in conn.info.values())
+
+    assert _sample(metrics.query_time, "_count") == 1
+    assert _sample(metrics.query_time, "_sum") < 1
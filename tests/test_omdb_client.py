@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from conftest import omdb_movie
+from omdb_client import CircuitBreaker, CircuitOpenError, OmdbClient, OmdbError, SingleFlight
+
+
+def client_for(omdb, **options):
+    outcomes = []
+    options.setdefault("backoff", 0)
+    client = OmdbClient("key", base_url=omdb.url, on_request=lambda seconds, outcome: outcomes.append(outcome),
+                        **options)
+    return client, outcomes
+
+
+def test_lookup_parameters(omdb):
+    client, _ = client_for(omdb)
+    omdb.default = (200, omdb_movie("Heat", "tt0113277"))
+    assert client.lookup(title="Heat", year=1995)["imdbID"] == "tt0113277"
+    client.lookup(imdb_id="tt0113277", year=1995)
+    assert omdb.calls == [{"t": "Heat", "y": "1995", "apikey": "key"}, {"i": "tt0113277", "apikey": "key"}]
+
+
+def test_retryable_statuses_are_retried(omdb):
+    client, outcomes = client_for(omdb, max_retries=2)
+    omdb.replies = [(503, {}), (429, {})]
+    omdb.default = (200, omdb_movie("Heat"))
+    assert client.lookup(title="Heat")["Title"] == "Heat"
+    assert outcomes == ["retry_status", "retry_status", "ok"]
+
+
+def test_retries_are_bounded(omdb):
+    client, outcomes = client_for(omdb, max_retries=2)
+    omdb.default = (500, {})
+    with pytest.raises(OmdbError):
+        client.lookup(title="Heat")
+    assert len(omdb.calls) == 3
+    assert client.breaker._failures == 1
+
+
+def test_client_errors_and_bad_bodies_are_not_retried(omdb):
+    client, outcomes = client_for(omdb, max_retries=2)
+    omdb.replies = [(401, {"Error": "Invalid API key!"})]
+    with pytest.raises(OmdbError):
+        client.lookup(title="Heat")
+    omdb.replies = [(200, b"<html>")]
+    with pytest.raises(OmdbError):
+        client.lookup(title="Heat")
+    assert len(omdb.calls) == 2
+    assert outcomes == ["error", "error"]
+
+
+def test_timeouts_count_as_connection_errors(omdb):
+    client, outcomes = client_for(omdb, max_retries=1, read_timeout=0.05)
+    omdb.delay = 0.3
+    with pytest.raises(OmdbError):
+        client.lookup(title="Heat")
+    assert outcomes == ["connection_error", "connection_error"]
+
+
+def test_breaker_opens_then_lets_one_trial_through(omdb):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    client, outcomes = client_for(omdb, max_retries=0, breaker=breaker)
+    omdb.default = (503, {})
+    for _ in range(2):
+        with pytest.raises(OmdbError):
+            client.lookup(title="Heat")
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        client.lookup(title="Heat")
+    assert len(omdb.calls) == 2
+    assert outcomes[-1] == "circuit_open"
+
+    time.sleep(0.25)
+    assert breaker.state == "half-open"
+    omdb.default = (200, omdb_movie("Heat"))
+    assert client.lookup(title="Heat")["Title"] == "Heat"
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker(omdb):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    client, _ = client_for(omdb, max_retries=0, breaker=breaker)
+    omdb.default = (503, {})
+    with pytest.raises(OmdbError):
+        client.lookup(title="Heat")
+    time.sleep(0.15)
+    assert breaker.allow() and not breaker.allow()  # a single trial call
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_concurrent_lookups_share_one_request(services, omdb):
+    omdb.default = (200, omdb_movie("Heat", "tt0113277"))
+    omdb.delay = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(services.lookup_omdb(title="Heat")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r["imdbID"] for r in results] == ["tt0113277"] * 8
+    assert len(omdb.calls) == 1
+
+
+def test_waiters_get_the_leaders_error():
+    flights = SingleFlight()
+    started = threading.Event()
+    ran, errors = [], []
+
+    def fail():
+        ran.append("leader")
+        started.set()
+        time.sleep(0.2)
+        raise OmdbError("down")
+
+    def call(fn):
+        try:
+            flights.do("k", fn)
+        except OmdbError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call, args=(fail,))
+    leader.start()
+    started.wait()
+    waiters = [threading.Thread(target=call, args=(lambda: ran.append("waiter"),)) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    for thread in [leader, *waiters]:
+        thread.join()
+
+    assert ran == ["leader"]
+    assert len(errors) == 5 and all(e is errors[0] for e in errors)
+    assert flights.do("k", lambda: 1) == (1, False)  # the failed flight is gone
@@ -0,0 +1,28 @@
+from conftest import make_movie
+
+
+def test_suggestions_follow_other_users_adds(services, client):
+    dm = services.dm
+    a = dm.create_user("a")
+    b = dm.create_user("b")
+    dm.add_movie(make_movie("Night One", "tt0000101"), b.id)
+
+    page = client.get(f"/users/{a.id}/search?q=night&suggest=1")
+    assert b"Night One" in page.data and b"Night Two" not in page.data
+
+    dm.add_movie(make_movie("Night Two", "tt0000102"), b.id)
+    page = client.get(f"/users/{a.id}/search?q=night&suggest=1")
+    assert b"Night Two" in page.data
+
+
+def test_collection_search_is_still_cached_per_user(services, client):
+    dm = services.dm
+    a = dm.create_user("a")
+    b = dm.create_user("b")
+    dm.add_movie(make_movie("Night One", "tt0000101"), a.id)
+    client.get(f"/users/{a.id}/search?q=night")
+    hits = services.page_cache.hits
+
+    dm.add_movie(make_movie("Night Two", "tt0000102"), b.id)
+    client.get(f"/users/{a.id}/search?q=night")
+    assert services.page_cache.hits == hits + 1
@@ -0,0 +1,71 @@
+from conftest import omdb_movie
+from data_manager import NOT_FOUND as STATUS_NOT_FOUND, PENDING
+from models import db, Job, UserMovie
+
+
+def run_jobs(app, services):
+    while services.job_queue.run_one(app.logger):
+        pass
+
+
+def user_links(user_id):
+    return db.session.query(UserMovie.movie_id).filter_by(user_id=user_id).all()
+
+
+def dead_placeholder(app, services, client):
+    """User A adds a title OMDb does not know; returns (A, B, placeholder)."""
+    a = services.dm.create_user("a")
+    b = services.dm.create_user("b")
+    client.post(f"/users/{a.id}/movies", data={"title": "zzqx", "force": "1"})
+    run_jobs(app, services)
+    (movie_id,) = user_links(a.id)[0]
+    placeholder = services.dm.get_movie(movie_id)
+    assert placeholder.status == STATUS_NOT_FOUND
+    return a, b, placeholder
+
+
+def test_lookups_skip_placeholders(app, services, client):
+    _, _, placeholder = dead_placeholder(app, services, client)
+    dm = services.dm
+    assert dm.get_movie_by_title("zzqx") is None
+    assert dm.get_movie_by_imdb_id(placeholder.imdb_id) is None
+    assert dm.get_movies_by_titles(["zzqx"]) == {}
+    assert dm.suggest_movies("zzqx") == []
+
+
+def test_second_user_is_not_linked_to_a_dead_placeholder(app, services, client, omdb):
+    _, b, placeholder = dead_placeholder(app, services, client)
+
+    # Negative cache: B is told the title was not found
+    response = client.post(f"/users/{b.id}/movies", data={"title": "zzqx", "force": "1"}, follow_redirects=True)
+    assert b"not found" in response.data
+    assert user_links(b.id) == []
+
+    # Once OMDb knows it, B gets a fresh placeholder of its own
+    services.omdb_cache.clear()
+    omdb.default = (200, omdb_movie("Zzqx", "tt0999999"))
+    client.post(f"/users/{b.id}/movies", data={"title": "zzqx", "force": "1"})
+    ((movie_id,),) = user_links(b.id)
+    assert movie_id != placeholder.id
+    assert services.dm.get_movie(movie_id).status == PENDING
+
+
+def test_api_add_does_not_reuse_placeholder(app, services, client, omdb):
+    _, b, placeholder = dead_placeholder(app, services, client)
+    services.omdb_cache.clear()
+    omdb.default = (200, omdb_movie("Zzqx", "tt0999999"))
+
+    response = client.post(f"/api/v1/users/{b.id}/movies", json={"title": "zzqx"})
+    assert response.status_code == 202
+    assert response.json["id"] != placeholder.id
+    run_jobs(app, services)
+    ((movie_id,),) = user_links(b.id)
+    movie = services.dm.get_movie(movie_id)
+    assert movie.imdb_id == "tt0999999" and movie.status is None
+
+
+def test_queue_details_skips_placeholders(app, services, client):
+    _, _, placeholder = dead_placeholder(app, services, client)
+    services.queue_details(placeholder)
+    assert Job.query.filter_by(kind="complete_movie").count() == 0
+
@@ -0,0 +1,92 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from conftest import make_movie
+from models import db
+from posters import PosterError, PosterStore, source_key
+
+IMDB_ID = "tt0000001"
+
+
+def image_bytes(color, size=(1000, 1500), fmt="PNG") -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, fmt)
+    return out.getvalue()
+
+
+class Fetcher:
+    def __init__(self, images: dict):
+        self.images = images
+        self.calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        return self.images[url]
+
+
+@pytest.fixture
+def fetcher():
+    return Fetcher({"http://img/red.png": image_bytes("red"), "http://img/blue.png": image_bytes("blue")})
+
+
+@pytest.fixture
+def store(tmp_path, fetcher):
+    return PosterStore(str(tmp_path / "posters"), fetcher=fetcher)
+
+
+def test_variants_are_resized_and_fetched_once(store, fetcher):
+    path, mimetype = store.get(IMDB_ID, "http://img/red.png", "card", webp=False)
+    assert mimetype == "image/jpeg"
+    with Image.open(path) as image:
+        assert image.format == "JPEG" and image.size == (320, 480)
+
+    path, mimetype = store.get(IMDB_ID, "http://img/red.png", "thumb", webp=True)
+    assert mimetype == "image/webp"
+    with Image.open(path) as image:
+        assert image.format == "WEBP" and image.size == (160, 240)
+
+    assert store.get(IMDB_ID, "http://img/red.png", "card", webp=False)[0].endswith("card.jpg")
+    assert fetcher.calls == ["http://img/red.png"]
+    assert store.has_variant(IMDB_ID, "http://img/red.png", "card", webp=False)
+
+
+def test_new_source_url_is_refetched(store, fetcher):
+    old_path, _ = store.get(IMDB_ID, "http://img/red.png", "card", webp=False)
+    new_path, _ = store.get(IMDB_ID, "http://img/blue.png", "card", webp=False)
+
+    assert fetcher.calls == ["http://img/red.png", "http://img/blue.png"]
+    assert not os.path.exists(old_path)
+    with Image.open(new_path) as image:
+        assert image.getpixel((10, 10))[2] > 200  # blue
+    assert os.listdir(os.path.join(store.root, IMDB_ID)) == [source_key("http://img/blue.png")]
+
+
+def test_invalid_ids_and_images(store, fetcher):
+    with pytest.raises(ValueError):
+        store.get("../etc", "http://img/red.png", "card", webp=False)
+    fetcher.images["http://img/broken"] = b"not an image"
+    with pytest.raises(PosterError):
+        store.get(IMDB_ID, "http://img/broken", "card", webp=False)
+    with pytest.raises(PosterError):
+        store.get(IMDB_ID, None, "card", webp=False)
+
+
+def test_poster_route_follows_refreshed_url(app, services, client, fetcher):
+    services.poster_store.fetcher = fetcher
+    user = services.dm.create_user("a")
+    movie = services.dm.add_movie(make_movie("Red", IMDB_ID, poster_url="http://img/red.png"), user.id)
+
+    first = client.get(f"/posters/{IMDB_ID}?size=card")
+    assert first.status_code == 200
+    services.dm.refresh_movie(movie.id, {"poster_url": "http://img/blue.png"})
+    db.session.expire_all()
+    second = client.get(f"/posters/{IMDB_ID}?size=card")
+    assert second.status_code == 200 and second.data != first.data
+    assert fetcher.calls == ["http://img/red.png", "http://img/blue.png"]
+
+    page = client.get(f"/users/{user.id}/movies").data.decode()
+    assert f"v={source_key('http://img/blue.png')}" in page
+    assert client.get("/posters/tt9999999").status_code == 404
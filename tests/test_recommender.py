@@ -0,0 +1,23 @@
+from conftest import make_movie
+
+
+def test_neighbours_of_liked_movies_are_recommended(services):
+    dm = services.dm
+    movies = [
+        dm.add_movie(make_movie(f"M{i}", f"tt000010{i}"), dm.create_user(f"seed{i}").id).id
+        for i in range(3)
+    ]
+    fans = [dm.create_user(f"fan{i}").id for i in range(2)]
+    for user_id in fans:
+        for movie_id in movies[:2]:
+            dm.add_movie(dm.get_movie(movie_id), user_id)
+            dm.rate_movie(user_id, movie_id, 9)
+    newcomer = dm.create_user("new").id
+    dm.add_movie(dm.get_movie(movies[0]), newcomer)
+    dm.rate_movie(newcomer, movies[0], 9)
+
+    recommender = services.recommender
+    assert recommender.build_similarity() == 2  # M2 shares no collection or person
+    suggested = recommender.refresh_user(newcomer)
+    assert suggested[0] == movies[1]
+    assert movies[0] not in suggested
@@ -0,0 +1,22 @@
+from sqlalchemy import text
+
+from conftest import make_movie
+from models import db
+
+
+def test_search_without_the_fts_migration(services, client):
+    # As after db.create_all() alone: migration 3's table and triggers are missing
+    for name in ("movie_fts_ai", "movie_fts_ad", "movie_fts_au"):
+        db.session.execute(text(f"DROP TRIGGER {name}"))
+    db.session.execute(text("DROP TABLE movie_fts"))
+    db.session.commit()
+
+    user = services.dm.create_user("a")
+    services.dm.add_movie(make_movie("Night Train", "tt0000001", plot="A slow ride."), user.id)
+    services.dm.add_movie(make_movie("Day Trip", "tt0000002", plot="Nothing happens at night."), user.id)
+
+    assert client.get(f"/users/{user.id}/search?q=night").status_code == 200
+    response = client.get(f"/api/v1/users/{user.id}/search?q=night")
+    assert response.status_code == 200
+    assert sorted(item["title"] for item in response.json["items"]) == ["Day Trip", "Night Train"]
+    assert [m.title for m in services.dm.suggest_movies("night")] == ["Night Train"]
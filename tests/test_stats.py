@@ -0,0 +1,45 @@
+import stats
+from conftest import make_movie
+from models import UserStats, UserGenreStats, UserCountryStats, UserDecadeStats, db
+
+SUMMARIES = (UserStats, UserGenreStats, UserCountryStats, UserDecadeStats)
+
+
+def movie(title, imdb_id, **fields):
+    return make_movie(title, imdb_id, **{"country": "USA", "runtime": 100, "imdb_rating": 7.0, **fields})
+
+
+def snapshot():
+    rows = {}
+    for model in SUMMARIES:
+        columns = model.__table__.columns
+        rows[model.__tablename__] = sorted(
+            tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+            for row in db.session.execute(db.select(*columns))
+        )
+    return rows
+
+
+def test_triggers_match_rebuild(services):
+    dm = services.dm
+    a = dm.create_user("a").id
+    b = dm.create_user("b").id
+    drama = dm.add_movie(movie("Drama", "tt0000201"), a).id
+    comedy = dm.add_movie(movie("Comedy", "tt0000202", genre="Comedy", country="France", year=1995), a).id
+    dm.add_movie(movie("Comedy", "tt0000202"), b)
+    dm.rate_movie(a, drama, 8)
+    dm.rate_movie(b, comedy, 5)
+    dm.toggle_watched(a, comedy)
+    dm.toggle_want_to_watch(b, comedy)
+    dm.refresh_movie(comedy, {"imdb_rating": 6.5})
+    dm.delete_movie(a, comedy)
+    dm.delete_movie(b, comedy)
+
+    maintained = snapshot()
+    stats.rebuild(db.session)
+    db.session.commit()
+
+    assert maintained == snapshot()
+    # Nothing is left for the deleted movie's genre, country or decades
+    assert all(total for (total,) in db.session.execute(db.select(UserGenreStats.total)))
+    assert db.session.get(UserStats, b) is None
@@ -0,0 +1,474 @@
+"""HTML views, the /metrics endpoint and the site-wide 404 page."""
+from collections import Counter
+from functools import partial
+
+from flask import (Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, abort,
+                   send_file, stream_with_context)
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from werkzeug.local import LocalProxy
+
+from api import api, error as api_error
+import export
+from data_manager import SORT_OPTIONS, COLLECTION_FIELDS
+from importer import parse_import, import_movies_async
+from models import db, User
+from page_cache import GLOBAL_SCOPE, cached, user_scope
+from posters import PosterError, SIZES as POSTER_SIZES, source_key
+
+main = Blueprint("main", __name__)
+
+# The current app's services (see services.MovieHub)
+services = LocalProxy(lambda: current_app.extensions["moviehub"])
+dm = LocalProxy(lambda: current_app.extensions["moviehub"].dm)
+
+
+@main.route("/")
+@cached(lambda: GLOBAL_SCOPE)
+def home():
+    cards = dm.get_user_stats()
+    return render_template("home.html", user_cards=cards)
+
+@main.route('/users', methods=["GET"])
+@cached(lambda: GLOBAL_SCOPE)
+def list_users():
+    profiles = dm.get_user_stats()
+    current_app.logger.info("Profiles page loaded count=%s", len(profiles))
+    return render_template("users.html", users=profiles)
+
+# Create a user
+@main.route("/users", methods=["POST"])
+def create_user():
+    name = request.form.get("name", "").strip()
+
+    if not name:
+        current_app.logger.info("Create user failed: empty name")
+        flash("User name is required.", "error")
+        return redirect(url_for(".list_users"))
+
+    if dm.user_exists(name):
+        current_app.logger.info("Create user failed: duplicate name=%r", name)
+        flash(f"A profile named '{name}' already exists.", "error")
+        return redirect(url_for(".list_users"))
+
+    try:
+        dm.create_user(name)
+    except IntegrityError:
+        # Lost a race against another request creating the same name
+        db.session.rollback()
+        current_app.logger.info("Create user failed: duplicate name=%r", name)
+        flash(f"A profile named '{name}' already exists.", "error")
+        return redirect(url_for(".list_users"))
+
+    current_app.logger.info("User created name=%r", name)
+    flash(f"User '{name}' created.", "success")
+    return redirect(url_for(".list_users"))
+
+
+# Delete user (and their movies - cascade)
+@main.route("/users/<int:user_id>/delete", methods=["POST"])
+def delete_user(user_id):
+    user = User.query.get(user_id)
+
+    if not user:
+        current_app.logger.info("Delete profile failed: not found user_id=%s", user_id)
+        flash("DELETE:Profile not found.", "error")
+        return redirect(url_for(".list_users"))
+
+    name = user.name
+
+    try:
+        dm.delete_user(user_id, cleanup_orphans=not current_app.config["ORPHAN_GC_INTERVAL"])
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error deleting profile user_id=%s", user_id)
+        flash("DELETE:Database error while deleting profile.", "error")
+        return redirect(url_for(".list_users"))
+
+    current_app.logger.info("Profile deleted user_id=%s name=%r", user_id, name)
+    flash(f"DELETE:Profile '{name}' deleted.", "success")
+    return redirect(url_for(".list_users"))
+
+
+# List movies for a user
+@main.route("/users/<int:user_id>/movies", methods=["GET"])
+@cached(lambda user_id: user_scope(user_id))
+def list_movies(user_id):
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("List movies: user not found user_id=%s", user_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    sort = request.args.get("sort", "added")
+    if sort not in SORT_OPTIONS:
+        sort = "added"
+    order = "desc" if request.args.get("order") == "desc" else "asc"
+    status = request.args.get("status", "")
+    genre = request.args.get("genre", "").strip()
+    decade = request.args.get("decade", type=int)
+    after = request.args.get("after") or None
+
+    filters = {"sort": sort, "order": order, "status": status, "genre": genre, "decade": decade}
+
+    try:
+        movies, next_cursor = dm.get_movies_page(
+            user_id,
+            sort=sort,
+            descending=order == "desc",
+            watched=True if status == "watched" else None,
+            want_to_watch=True if status == "want" else None,
+            genre=genre or None,
+            decade=decade,
+            after=after,
+            limit=current_app.config["PAGE_SIZE"],
+        )
+    except ValueError:
+        current_app.logger.info("List movies: invalid cursor user_id=%s after=%r", user_id, after)
+        return redirect(url_for(".list_movies", user_id=user_id, **filters))
+
+    stats = dm.get_user_stats(user_id)[0]
+
+    # Status sections only on the first page, capped to a short strip
+    want_list, watched_list, recommended = [], [], []
+    if not after:
+        section_limit = current_app.config["SECTION_LIMIT"]
+        want_list = dm.get_movies(user_id, want_to_watch=True, limit=section_limit)
+        watched_list = dm.get_movies(user_id, watched=True, limit=section_limit)
+        recommended = dm.get_recommendations(user_id, limit=section_limit)
+
+    return render_template(
+        "movies.html",
+        user=user,
+        movies=movies,
+        stats=stats,
+        want_list=want_list,
+        watched_list=watched_list,
+        recommended=recommended,
+        filters=filters,
+        next_cursor=next_cursor,
+        is_first_page=not after,
+    )
+
+
+# Collection statistics for a user
+@main.route("/users/<int:user_id>/stats", methods=["GET"])
+@cached(lambda user_id: user_scope(user_id))
+def user_stats(user_id):
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("Stats failed: user not found user_id=%s", user_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    return render_template("stats.html", user=user, stats=dm.get_collection_stats(user_id))
+
+
+# Download a user's collection; streamed, so any size starts at once
+@main.route("/users/<int:user_id>/export.<fmt>", methods=["GET"])
+def export_movies(user_id, fmt):
+    if fmt not in export.FORMATS:
+        abort(404)
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("Export failed: user not found user_id=%s", user_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    fields = list(COLLECTION_FIELDS)
+    current_app.logger.info("Export started user_id=%s format=%s", user_id, fmt)
+    return Response(
+        stream_with_context(export.chunks(fmt, dm.iter_collection(user_id, fields), fields)),
+        content_type=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="movies-{user_id}.{fmt}"'},
+    )
+
+
+# Add movie for a user via OMDb
+@main.route("/users/<int:user_id>/movies", methods=["POST"])
+def create_movie(user_id):
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("Add movie failed: user not found user_id=%s", user_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    title = request.form.get("title", "").strip()
+    imdb_id = request.form.get("imdb_id", "").strip()
+    if not title and not imdb_id:
+        current_app.logger.info("Add movie failed: empty title user_id=%s", user_id)
+        flash("Movie title is required. Enter a movie title.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    # Offer movies we already have before going to OMDb
+    if title and not imdb_id and not request.form.get("force"):
+        if not dm.get_movie_by_title(title) and dm.suggest_movies(title, limit=1):
+            current_app.logger.info("Add movie: offering local matches user_id=%s title=%r", user_id, title)
+            return redirect(url_for(".search_movies", user_id=user_id, q=title, suggest=1))
+
+    try:
+        pending = services.queue_movie(user_id, title=title, imdb_id=imdb_id)
+    except SQLAlchemyError:
+        current_app.logger.exception("DB error queueing movie user_id=%s title=%r imdb_id=%s", user_id, title, imdb_id)
+        flash("Database error occurred while adding the movie.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+    if pending:
+        flash(f"Adding '{pending.title}' - details will appear shortly.", "success")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    movie = services.fetch_movie(imdb_id=imdb_id) if imdb_id else services.fetch_movie(title)
+    if movie is None:
+        current_app.logger.warning("Add movie failed: OMDb fetch failed user_id=%s title=%r", user_id, title)
+        flash("Movie title not found or OMDB unavailable. Enter another title.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    if dm.movie_exists_for_user(user_id, movie.imdb_id):
+        current_app.logger.info("Add movie skipped: duplicate user_id=%s imdb_id=%s title=%r", user_id,
+                                movie.imdb_id, movie.title)
+        flash("That movie is already in this user’s list.", "warning")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    try:
+        dm.add_movie(movie, user_id)
+        services.queue_details(movie)
+
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error adding movie user_id=%s title=%r imdb_id=%s", user_id, title,
+                                     movie.imdb_id)
+        flash("Database error occurred while adding the movie.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    current_app.logger.info("Movie added user_id=%s movie_id=%s imdb_id=%s title=%r", user_id, movie.id,
+                            movie.imdb_id, movie.title)
+    flash(f"Added '{movie.title}'.", "success")
+    return redirect(url_for(".list_movies", user_id=user_id))
+
+
+def _search_scopes(user_id):
+    # Suggestions come from the shared movie table, which any user's add changes
+    if request.args.get("suggest") == "1":
+        return user_scope(user_id), GLOBAL_SCOPE
+    return user_scope(user_id)
+
+
+# Search a user's collection, or suggest local movies before an OMDb lookup
+@main.route("/users/<int:user_id>/search", methods=["GET"])
+@cached(_search_scopes)
+def search_movies(user_id):
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("Search failed: user not found user_id=%s", user_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    q = request.args.get("q", "").strip()
+    suggest = request.args.get("suggest") == "1"
+
+    if suggest:
+        results = dm.suggest_movies(q)
+        if not results:
+            return redirect(url_for(".list_movies", user_id=user_id))
+    else:
+        results = dm.search_movies(user_id, q)
+
+    return render_template("search.html", user=user, q=q, suggest=suggest, results=results)
+
+
+# Bulk import movies for a user. Async: the OMDb lookups wait together on
+# one event loop (the request still holds its worker thread meanwhile)
+@main.route("/users/<int:user_id>/import", methods=["GET", "POST"])
+async def import_user_movies(user_id):
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("Import failed: user not found user_id=%s", user_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    if request.method == "GET":
+        return render_template("import.html", user=user, results=None)
+
+    upload = request.files.get("file")
+    if upload and upload.filename:
+        text = upload.read().decode("utf-8-sig", errors="replace")
+    else:
+        text = request.form.get("titles", "")
+
+    entries = parse_import(text)
+    if not entries:
+        flash("Nothing to import. Paste titles or upload a CSV file.", "error")
+        return redirect(url_for(".import_user_movies", user_id=user_id))
+
+    try:
+        async with services.async_omdb_client() as client:
+            results = await import_movies_async(dm, user_id, entries, partial(services.alookup_omdb, client),
+                                                concurrency=current_app.config["IMPORT_WORKERS"])
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error importing movies user_id=%s rows=%s", user_id, len(entries))
+        flash("Database error occurred while importing movies.", "error")
+        return redirect(url_for(".import_user_movies", user_id=user_id))
+
+    summary = Counter(r["status"] for r in results)
+    current_app.logger.info("Movies imported user_id=%s rows=%s summary=%s", user_id, len(results), dict(summary))
+    return render_template("import.html", user=user, results=results, summary=summary)
+
+
+# Update movie title
+@main.route("/users/<int:user_id>/movies/<int:movie_id>/update", methods=["POST"])
+def update_movie(user_id, movie_id):
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("Update movie failed: user not found user_id=%s movie_id=%s", user_id, movie_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    new_title = request.form.get("new_title", "").strip()
+    if not new_title:
+        current_app.logger.info("Update movie failed: empty new_title user_id=%s movie_id=%s", user_id, movie_id)
+        flash("New title is required. Enter new movie title.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    movie = dm.get_movie_for_user(user_id, movie_id)
+    if not movie:
+        current_app.logger.info("Update movie failed: movie not found for user user_id=%s movie_id=%s", user_id,
+                                movie_id)
+        flash("Movie not found for this user.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    try:
+        dm.update_movie(movie_id, new_title)
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error updating movie user_id=%s movie_id=%s new_title=%r", user_id,
+                                     movie_id, new_title)
+        flash("Database error occurred while updating the movie.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    current_app.logger.info("Movie updated user_id=%s movie_id=%s new_title=%r", user_id, movie_id, new_title)
+    flash("Movie title updated.", "success")
+    return redirect(url_for(".list_movies", user_id=user_id))
+
+
+# Delete movies for a user
+@main.route("/users/<int:user_id>/movies/<int:movie_id>/delete", methods=["POST"])
+def delete_movie(user_id, movie_id):
+    user = User.query.get(user_id)
+    if not user:
+        current_app.logger.info("Delete movie failed: user not found user_id=%s movie_id=%s", user_id, movie_id)
+        flash("User not found.", "error")
+        return redirect(url_for(".home"))
+
+    try:
+        ok = dm.delete_movie(user_id, movie_id, cleanup_orphans=not current_app.config["ORPHAN_GC_INTERVAL"])
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error deleting movie user_id=%s movie_id=%s", user_id, movie_id)
+        flash("Database error occurred while deleting movie.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    current_app.logger.info("Movie deleted user_id=%s movie_id=%s ok=%s", user_id, movie_id, ok)
+    flash("Movie deleted." if ok else "Movie not found for this user.", "success" if ok else "error")
+    return redirect(url_for(".list_movies", user_id=user_id))
+
+# Mark as Want to Watch
+@main.route("/users/<int:user_id>/movies/<int:movie_id>/want", methods=["POST"])
+def toggle_want_to_watch(user_id, movie_id):
+    try:
+        if not dm.toggle_want_to_watch(user_id, movie_id):
+            flash("Movie not found for this user.", "error")
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error toggling want_to_watch user_id=%s movie_id=%s", user_id, movie_id)
+        flash("Database error.", "error")
+
+    return redirect(url_for(".list_movies", user_id=user_id))
+
+
+# Mark as Watched
+@main.route("/users/<int:user_id>/movies/<int:movie_id>/watched", methods=["POST"])
+def toggle_watched(user_id, movie_id):
+    try:
+        if not dm.toggle_watched(user_id, movie_id):
+            flash("Movie not found for this user.", "error")
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error toggling watched user_id=%s movie_id=%s", user_id, movie_id)
+        flash("Database error.", "error")
+
+    return redirect(url_for(".list_movies", user_id=user_id))
+
+
+# Rate Movie
+@main.route("/users/<int:user_id>/movies/<int:movie_id>/rate", methods=["POST"])
+def rate_movie(user_id, movie_id):
+    rating_str = request.form.get("rating", "").strip()
+    if not rating_str or not rating_str.isdigit():
+        flash("Invalid rating.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    rating = int(rating_str)
+    if not 1 <= rating <= 10:
+        flash("Rating must be between 1 and 10.", "error")
+        return redirect(url_for(".list_movies", user_id=user_id))
+
+    try:
+        if not dm.rate_movie(user_id, movie_id, rating):
+            flash("Movie not found for this user.", "error")
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("DB error rating movie user_id=%s movie_id=%s", user_id, movie_id)
+        flash("Database error.", "error")
+
+    return redirect(url_for(".list_movies", user_id=user_id))
+
+
+# Poster URLs carry v=<source key>, so browsers drop their copy when the poster changes
+@main.app_template_filter("poster_version")
+def poster_version(poster_url):
+    return source_key(poster_url or "")
+
+
+# Resized, locally cached poster images
+@main.route("/posters/<imdb_id>", methods=["GET"])
+def poster(imdb_id):
+    size = request.args.get("size", "card")
+    if size not in POSTER_SIZES:
+        size = "card"
+    webp = "image/webp" in request.accept_mimetypes
+
+    # The current poster URL picks the cached files, so a refreshed URL is re-fetched
+    movie = dm.get_movie_by_imdb_id(imdb_id)
+    if not movie or not movie.poster_url or movie.poster_url == "N/A":
+        abort(404)
+    try:
+        path, mimetype = services.poster_store.get(imdb_id, movie.poster_url, size, webp)
+    except ValueError:
+        abort(404)
+    except PosterError:
+        # Fall back to the upstream image rather than a broken card
+        current_app.logger.warning("Poster fetch failed imdb_id=%s", imdb_id, exc_info=True)
+        return redirect(movie.poster_url)
+
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True,
+                         max_age=current_app.config["POSTER_MAX_AGE"])
+    response.vary.add("Accept")
+    return response
+
+
+# Prometheus scrape endpoint
+@main.route("/metrics")
+def metrics_endpoint():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        abort(403)
+    return Response(services.metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# 404 handling
+@main.app_errorhandler(404)
+def page_not_found(e):
+    current_app.logger.info("404 Not Found path=%s", request.path)
+    # Unmatched /api/ URLs never reach the blueprint's handlers
+    if request.path.startswith(api.url_prefix + "/"):
+        return api_error("Not found.", 404)
+    return render_template("404.html"), 404